@@ -0,0 +1,83 @@
+"""
+Benchmark request matching for `FixtureManager` with many fixtures
+
+Usage: python benchmark/dispatch.py [--iterations 2000]
+"""
+# Load in our dependencies
+import argparse
+import re
+import timeit
+
+from httpretty import HTTPretty
+from httpretty.core import URIInfo
+
+import httpretty_fixtures
+
+
+def generate_fixture_manager(route_count, indexed_dispatch, regex_routes=False):
+    """
+    Generate a `FixtureManager` subclass with `route_count` fixtures
+
+    :param int route_count: Amount of fixtures to define
+    :param bool indexed_dispatch: Whether to route fixtures through `IndexedDispatcher`
+    :param bool regex_routes: Whether half of our routes should use regex URIs
+    :rtype: tuple
+    :return: `FixtureManager` subclass and the names of its fixtures
+    """
+    attrs = {'indexed_dispatch': indexed_dispatch}
+    for i in range(route_count):
+        def fixture(self, request, uri, res_headers):
+            return (200, res_headers, 'world')
+        uri = 'http://localhost:9000/items/{i}'.format(i=i)
+        if regex_routes and i % 2:
+            uri = re.compile(r'http://localhost:9000/regex/{i}/\d+$'.format(i=i))
+        attrs['fixture_{i}'.format(i=i)] = httpretty_fixtures.get(uri)(fixture)
+    manager = type('FakeServer{count}'.format(count=route_count), (httpretty_fixtures.FixtureManager,), attrs)
+    return manager, sorted(attrs.keys())[:-1]
+
+
+def bench_match(route_count, indexed_dispatch, regex_routes, iterations):
+    """Measure matching a request against the last registered route"""
+    manager, fixture_keys = generate_fixture_manager(route_count, indexed_dispatch, regex_routes=regex_routes)
+    last_index = route_count - 1
+    path = '/items/{i}'.format(i=last_index)
+    if regex_routes and last_index % 2:
+        path = '/regex/{i}/1'.format(i=last_index)
+    info = URIInfo(hostname='localhost', port=9000, path=path)
+
+    def match():
+        matcher, _ = HTTPretty.match_uriinfo(info)
+        matcher.get_next_entry('GET', info, None)
+
+    # DEV: We match once before timing so regex alternations are compiled
+    manager.start(fixture_keys)
+    try:
+        match()
+        return timeit.timeit(match, number=iterations) / iterations
+    finally:
+        manager.stop()
+
+
+def main():
+    # Parse our arguments
+    parser = argparse.ArgumentParser(description='Benchmark request matching with many fixtures')
+    parser.add_argument('--iterations', type=int, default=2000, help='Iterations per measurement')
+    args = parser.parse_args()
+
+    # Run our benchmarks and output their results
+    # DEV: HTTPretty only supports regex URIs on Python<3.7 so we only use them with our indexed dispatcher
+    benchmarks = (
+        ('register_uri', False, False),
+        ('indexed', True, False),
+        ('indexed (50% regex)', True, True),
+    )
+    for route_count in (10, 100, 1000):
+        iterations = max(args.iterations * 10 // route_count, 10)
+        for name, indexed_dispatch, regex_routes in benchmarks:
+            seconds = bench_match(route_count, indexed_dispatch, regex_routes, iterations)
+            print('{name:<20} with {count:>4} routes: {seconds:8.1f}us'.format(
+                name=name, count=route_count, seconds=seconds * 1e6))
+
+
+if __name__ == '__main__':
+    main()
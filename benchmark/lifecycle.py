@@ -0,0 +1,83 @@
+"""
+Benchmark the cost of `FixtureManager` start/stop per test
+
+Usage: python benchmark/lifecycle.py [--iterations 2000]
+"""
+# Load in our dependencies
+import argparse
+import timeit
+
+import httpretty_fixtures
+
+
+def generate_fixture_manager(fixture_count):
+    """
+    Generate a `FixtureManager` subclass with `fixture_count` fixtures
+
+    :param int fixture_count: Amount of fixtures to define
+    :rtype: tuple
+    :return: `FixtureManager` subclass and the names of its fixtures
+    """
+    attrs = {}
+    for i in range(fixture_count):
+        def fixture(self, request, uri, res_headers):
+            return (200, res_headers, 'world')
+        attrs['fixture_{i}'.format(i=i)] = httpretty_fixtures.get(
+            'http://localhost:9000/{i}'.format(i=i))(fixture)
+    manager = type('FakeServer{count}'.format(count=fixture_count), (httpretty_fixtures.FixtureManager,), attrs)
+    return manager, sorted(attrs.keys())
+
+
+def bench_start_stop(fixture_count, iterations):
+    """Measure `start()` followed by `stop()`"""
+    manager, fixture_keys = generate_fixture_manager(fixture_count)
+
+    def start_stop():
+        manager.start(fixture_keys)
+        manager.stop()
+    return timeit.timeit(start_stop, number=iterations) / iterations
+
+
+def bench_start_stop_session(fixture_count, iterations):
+    """Measure `start()` followed by `stop()` inside of a session"""
+    manager, fixture_keys = generate_fixture_manager(fixture_count)
+
+    def start_stop():
+        manager.start(fixture_keys)
+        manager.stop()
+    with manager.session():
+        return timeit.timeit(start_stop, number=iterations) / iterations
+
+
+def bench_run(fixture_count, iterations):
+    """Measure calling a function decorated by `run()`"""
+    manager, fixture_keys = generate_fixture_manager(fixture_count)
+
+    class Test(object):
+        @manager.run(fixture_keys)
+        def test(self, server):
+            pass
+    test = Test()
+    return timeit.timeit(test.test, number=iterations) / iterations
+
+
+def main():
+    # Parse our arguments
+    parser = argparse.ArgumentParser(description='Benchmark FixtureManager start/stop cost per test')
+    parser.add_argument('--iterations', type=int, default=2000, help='Iterations per measurement')
+    args = parser.parse_args()
+
+    # Run our benchmarks and output their results
+    benchmarks = (
+        ('start/stop', bench_start_stop),
+        ('start/stop (session)', bench_start_stop_session),
+        ('run()', bench_run),
+    )
+    for fixture_count in (1, 10, 100):
+        iterations = max(args.iterations // fixture_count, 10)
+        for name, bench in benchmarks:
+            print('{name:<20} with {count:>3} fixtures: {seconds:8.1f}us'.format(
+                name=name, count=fixture_count, seconds=bench(fixture_count, iterations) * 1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+Benchmark the `FixtureManager` lifecycle and request path, checking for regressions against a stored baseline
+
+Usage: python benchmark/run.py [--quick] [--save-baseline] [--baseline benchmark/baseline.json] [--tolerance 1.5]
+
+`--quick` runs a tenth of our iterations and compares them to `benchmark/baseline-quick.json` instead.
+Memory per request is measured over `iterations * 10` requests (10k by default) since 100k requests
+through HTTPretty take several minutes per recording mode.
+"""
+# Load in our dependencies
+import argparse
+import http.client as http_client
+import io
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+from httpretty.core import HTTPrettyRequest
+
+import httpretty_fixtures
+from lifecycle import generate_fixture_manager
+
+
+# Define our constants
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# DEV: Quick runs have their own baseline since fewer iterations give different (noisier) results
+DEFAULT_QUICK_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline-quick.json')
+# Calls of our reference workload to time before each measurement
+REFERENCE_ITERATIONS = 200
+# DEV: Bounded recordings retain only a few bytes per request, which allocator noise alone can double,
+#   so memory differences under this many bytes per request are never a regression
+MEMORY_SLACK = 64
+REQUEST = HTTPrettyRequest('GET /0?q=1 HTTP/1.1\r\nHost: localhost:9000\r\nAccept: */*\r\n', '')
+
+
+def reference_workload():
+    """Fixed pure Python workload which our timings are measured relative to"""
+    items = dict((str(i), i) for i in range(100))
+    return sorted(items, key=items.get)
+
+
+def measure(fn, iterations, repeat=15):
+    """
+    Measure the time per call of a function relative to our reference workload
+
+    :param function fn: Function to measure
+    :param int iterations: Amount of calls per measurement
+    :param int repeat: Amount of measurements to take the median of
+    :rtype: float
+    :return: Time per call as a multiple of a call to our reference workload
+    """
+    # DEV: Shared machines (e.g. CI) change speed between and during runs so raw timings can't be compared to
+    #   a baseline. We time our reference workload right before each measurement so both see the same machine
+    #   and take the median of their ratios so outliers on either side are dropped.
+    ratios = []
+    for i in range(repeat):
+        reference_seconds = timeit.timeit(reference_workload, number=REFERENCE_ITERATIONS) / REFERENCE_ITERATIONS
+        seconds = timeit.timeit(fn, number=iterations) / iterations
+        ratios.append(seconds / reference_seconds)
+    ratios.sort()
+    return ratios[len(ratios) // 2]
+
+
+def bench_run(iterations):
+    """Measure calling a function decorated by `run()` with 1 fixture"""
+    manager, fixture_keys = generate_fixture_manager(1)
+
+    class Test(object):
+        @manager.run(fixture_keys)
+        def test(self, server):
+            pass
+    return measure(Test().test, iterations)
+
+
+def generate_bench_start_stop(fixture_count):
+    """Generate a benchmark for `start()` followed by `stop()` with `fixture_count` fixtures"""
+    def bench_start_stop(iterations):
+        manager, fixture_keys = generate_fixture_manager(fixture_count)
+
+        def start_stop():
+            manager.start(fixture_keys)
+            manager.stop()
+        return measure(start_stop, max(iterations // fixture_count, 5))
+    return bench_start_stop
+
+
+def bench_nested(iterations):
+    """Measure starting and stopping a manager inside of another running manager"""
+    outer_manager, outer_keys = generate_fixture_manager(1)
+    inner_manager, inner_keys = generate_fixture_manager(10)
+
+    def start_stop_nested():
+        outer_manager.start(outer_keys)
+        inner_manager.start(inner_keys)
+        inner_manager.stop()
+        outer_manager.stop()
+    return measure(start_stop_nested, iterations)
+
+
+def generate_bench_saving_fixture(record_mode):
+    """Generate a benchmark for the time `saving_fixture` adds to each request in `record_mode`"""
+    def bench_saving_fixture(iterations):
+        def fixture(request, uri, res_headers):
+            return (200, res_headers, 'world')
+        manager = type('RequestServer', (httpretty_fixtures.FixtureManager,), {'record_mode': record_mode})
+        saving_fixture = manager.generate_saving_fixture(fixture)
+
+        # Measure our fixture with and without saving and return the difference
+        # DEV: We call our fixtures directly so we only measure our own overhead, not HTTPretty's sockets
+        # DEV: We bound our requests so long runs don't measure the cost of growing a list
+        saving_fixture.requests = httpretty_fixtures.generate_request_store(1000)
+        # DEV: Our overhead is a small difference between two timings so we always make at least 10k calls
+        uri = 'http://localhost:9000/0?q=1'
+        call_count = max(iterations * 10, 10000)
+        plain_cost = measure(lambda: fixture(REQUEST, uri, {}), call_count)
+        saving_cost = measure(lambda: saving_fixture(REQUEST, uri, {}), call_count)
+        return max(saving_cost - plain_cost, 0)
+    return bench_saving_fixture
+
+
+def generate_bench_memory(record_mode, record_limit=None, warm_up_count=1000):
+    """Generate a benchmark for memory retained per request sent through HTTPretty (over 10k requests by default)"""
+    def bench_memory(iterations):
+        def fixture(self, request, uri, res_headers):
+            return (200, res_headers, 'world')
+        manager = type('MemoryServer', (httpretty_fixtures.FixtureManager,), {
+            'record_mode': record_mode,
+            'record_limit': record_limit,
+            'upload': httpretty_fixtures.post('http://localhost:9000/upload')(fixture),
+        })
+
+        # Send our requests through HTTPretty and measure how much memory we retained
+        # DEV: We use a real client so we count everything HTTPretty keeps as well (e.g. `latest_requests`)
+        # DEV: We warm up first so we measure steady growth (e.g. a full `record_limit` ring buffer)
+        def make_requests(connection, count):
+            for i in range(count):
+                connection.request('POST', '/upload?{i}'.format(i=i), body=b'body')
+                connection.getresponse().read()
+        # DEV: We trace our warm up as well so evicting its requests is counted
+        request_count = iterations * 10
+        with manager.running(['upload']):
+            connection = http_client.HTTPConnection('localhost', 9000)
+            tracemalloc.start()
+            try:
+                make_requests(connection, warm_up_count)
+                start_bytes = tracemalloc.get_traced_memory()[0]
+                make_requests(connection, request_count)
+                end_bytes = tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+                connection.close()
+        return float(end_bytes - start_bytes) / request_count
+    return bench_memory
+
+
+# Define our benchmarks as `(name, unit, function)`
+BENCHMARKS = (
+    ('run() with 1 fixture', 'reference', bench_run),
+    ('start/stop with 1 fixture', 'reference', generate_bench_start_stop(1)),
+    ('start/stop with 10 fixtures', 'reference', generate_bench_start_stop(10)),
+    ('start/stop with 100 fixtures', 'reference', generate_bench_start_stop(100)),
+    ('start/stop with 1000 fixtures', 'reference', generate_bench_start_stop(1000)),
+    ('nested start/stop', 'reference', bench_nested),
+    ('saving_fixture overhead (full)', 'reference', generate_bench_saving_fixture(httpretty_fixtures.RECORD_FULL)),
+    ('saving_fixture overhead (summary)', 'reference', generate_bench_saving_fixture(httpretty_fixtures.RECORD_SUMMARY)),
+    ('saving_fixture overhead (count)', 'reference', generate_bench_saving_fixture(httpretty_fixtures.RECORD_COUNT)),
+    ('memory per request (full)', 'bytes', generate_bench_memory(httpretty_fixtures.RECORD_FULL)),
+    ('memory per request (capture)', 'bytes', generate_bench_memory(httpretty_fixtures.RECORD_CAPTURE)),
+    ('memory per request (summary)', 'bytes', generate_bench_memory(httpretty_fixtures.RECORD_SUMMARY)),
+    ('memory per request (full, limit 1000)', 'bytes', generate_bench_memory(httpretty_fixtures.RECORD_FULL, 1000)),
+)
+
+
+def format_value(unit, value):
+    """Format a benchmark result for humans"""
+    if unit == 'reference':
+        return '{value:10.2f}x'.format(value=value)
+    return '{value:10.1f}B'.format(value=value)
+
+
+def main():
+    # Parse our arguments
+    parser = argparse.ArgumentParser(description='Benchmark FixtureManager and check for regressions')
+    parser.add_argument('--iterations', type=int, default=1000, help='Iterations per measurement')
+    parser.add_argument('--quick', action='store_true', help='Run fewer iterations (e.g. for CI)')
+    parser.add_argument('--baseline', default=None,
+                        help='Path to our baseline results (default: benchmark/baseline.json, '
+                             'benchmark/baseline-quick.json with --quick)')
+    parser.add_argument('--save-baseline', action='store_true', help='Save our results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='Ratio to our baseline above which a result is a regression')
+    args = parser.parse_args()
+    iterations = args.iterations // 10 if args.quick else args.iterations
+    if args.baseline is None:
+        args.baseline = DEFAULT_QUICK_BASELINE if args.quick else DEFAULT_BASELINE
+
+    # Load our baseline
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with io.open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+
+    # Run our benchmarks and compare them to our baseline
+    results = {}
+    regressions = []
+    for name, unit, bench in BENCHMARKS:
+        value = results[name] = bench(iterations)
+        line = '{name:<40} {value}'.format(name=name, value=format_value(unit, value))
+        expected = baseline.get(name)
+        if expected:
+            ratio = value / expected
+            line += '  ({ratio:.2f}x baseline)'.format(ratio=ratio)
+            if ratio > args.tolerance and not (unit == 'bytes' and value - expected < MEMORY_SLACK):
+                line += '  REGRESSION'
+                regressions.append(name)
+        print(line)
+
+    # If we are saving our baseline, then write it out
+    if args.save_baseline:
+        with io.open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            baseline_file.write(u'{results}\n'.format(results=json.dumps(results, indent=2, sort_keys=True)))
+        print('Saved baseline to {path}'.format(path=args.baseline))
+
+    # If we had regressions, then exit with a failure
+    if regressions:
+        print('{count} benchmark(s) regressed more than {tolerance}x from our baseline'.format(
+            count=len(regressions), tolerance=args.tolerance))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
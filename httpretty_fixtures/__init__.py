@@ -1,55 +1,490 @@
 # Load in our dependencies
+import contextlib
+import copy
 import functools
+import importlib
+import os
+import sys
+import threading
+import time
+import timeit
 
-from httpretty import HTTPretty
+try:
+    from threading import get_ident
+except ImportError:  # Python 2
+    from thread import get_ident
+
+# DEV: We create our profile first so it can time the rest of our import
+from .profiling import get_startup_profile
+startup_profile = get_startup_profile()
+import_start = timeit.default_timer()
+
+from .cache import ResponseCache, encode_response, request_cache_key
+from .faults import FaultPolicy, InjectedConnectionReset
+from .latency import LatencyProfile, generate_delayer
+from .lazy import LazyAttribute
+from .metrics import (
+    FixtureMetrics, export_metrics, export_metrics_at_exit, get_aggregate_metrics, metrics_report, reset_metrics)
+from .negotiation import ContentNegotiator
+from .recording import (
+    RECORD_CAPTURE, RECORD_COUNT, RECORD_FULL, RECORD_MODES, RECORD_SUMMARY, CapturedRequest, RequestLog,
+    RequestSummary, bound_latest_requests, generate_request_recorder, generate_request_store,
+    get_latest_requests_limit, reset_latest_requests, restore_latest_requests)
+from .scenarios import Scenario, ScenarioState
+from .snapshots import FixtureSnapshot
+from .streaming import TEXT_TYPE, is_streamed_body, read_streamed_body
+from .tables import generate_table_fixture, load_route_table
+
+# Defer importing HTTPretty until we first use it (e.g. our first `start()`)
+# DEV: HTTPretty loads `http.server`, `socket` patching, and more which dominates our import time
+HTTPretty = LazyAttribute('httpretty', 'HTTPretty')
+# DEV: `dispatch` imports HTTPretty's internals so we defer it as well
+#   We keep our stand-in at module level so `start()` doesn't run an import statement on every call
+build_uri_matcher = LazyAttribute(__name__ + '.dispatch', 'build_uri_matcher')
+
+# Define our exports which are loaded on first access
+# DEV: These modules subclass/import HTTPretty's internals so we don't load them until they are needed
+LAZY_EXPORTS = {
+    'Cassette': 'cassette',
+    'get_cassette': 'cassette',
+    'FixtureServer': 'serving',
+    'IndexedDispatcher': 'dispatch',
+}
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        # If this isn't a lazy export, complain and leave
+        module_name = LAZY_EXPORTS.get(name)
+        if module_name is None:
+            raise AttributeError('module {module!r} has no attribute {name!r}'.format(module=__name__, name=name))
+        return getattr(importlib.import_module('.' + module_name, __name__), name)
+else:
+    # DEV: Module-level `__getattr__` is only supported on Python>=3.7 so we export stand-ins before that
+    #   They can be called like their targets but `isinstance` and subclassing need the real one (e.g. `.load()`)
+    Cassette = LazyAttribute(__name__ + '.cassette', 'Cassette')
+    get_cassette = LazyAttribute(__name__ + '.cassette', 'get_cassette')
+    FixtureServer = LazyAttribute(__name__ + '.serving', 'FixtureServer')
+    IndexedDispatcher = LazyAttribute(__name__ + '.dispatch', 'IndexedDispatcher')
+
+# Load our asyncio support when it's needed
+# DEV: `aio` uses `async`/`await` syntax which is a `SyntaxError` before Python 3.5
+#   We only import it (and `asyncio`) once a fixture returns an awaitable or `run_async()` is used
+if sys.version_info >= (3, 5):
+    def isawaitable(obj):
+        # DEV: This matches `inspect.isawaitable` for coroutines and futures without importing `inspect`
+        return hasattr(obj, '__await__')
+
+    def get_aio():
+        from . import aio
+        return aio
+
+    def run_coroutine(coroutine):
+        return get_aio().run_coroutine(coroutine)
+else:
+    def get_aio():
+        return None
+
+    def isawaitable(obj):
+        return False
+
+
+def call_fixture(fixture, request, uri, res_headers):
+    """
+    Run a fixture, running it to completion on our background event loop if it's `async`
+
+    :param function fixture: Fixture to run
+    :param HTTPrettyRequest request: Request to respond to
+    :param str uri: URI of our request
+    :param dict res_headers: Default headers of our response
+    :rtype: tuple
+    :return: `(status, res_headers, body)` from our fixture
+    """
+    result = fixture(request, uri, res_headers)
+    if isawaitable(result):
+        result = run_coroutine(result)
+    return result
+
+
+# Define our constants
+# Priority added to the matchers of each nested `FixtureManager` instance
+# DEV: HTTPretty sorts matchers by priority and otherwise keeps their registration order, so an inner instance's
+#   fixtures would never override an outer one's for the same URL. This is small enough to only break ties.
+NESTED_PRIORITY_STEP = 0.001
+
+
+# Define our classes
+class FixturePlan(object):
+    """Validated registration information for a fixture, compiled once per `FixtureManager` subclass"""
+    __slots__ = ('key', 'fn', 'register_uri_args', 'register_uri_kwargs', 'options', 'indexed_args')
+
+    def __init__(self, key, fn, register_uri_args, register_uri_kwargs, options):
+        self.key = key
+        self.fn = fn
+        self.register_uri_args = register_uri_args
+        self.register_uri_kwargs = register_uri_kwargs
+        self.options = options
+        # DEV: This is `None` when our fixture can't be routed via `IndexedDispatcher`
+        from .dispatch import split_register_uri_args
+        self.indexed_args = split_register_uri_args(register_uri_args, register_uri_kwargs)
+
+    @classmethod
+    def compile(cls, fixture_key, fixture):
+        """
+        Validate a fixture and compile its plan
+
+        :param str fixture_key: Name of fixture being compiled
+        :param function fixture: Fixture as retrieved from its class
+        :rtype: FixturePlan
+        """
+        # If it is not a function, complain and leave
+        if not fixture or not hasattr(fixture, '__call__'):
+            raise RuntimeError('Expected fixture "{fixture}" to be a function but it was not.'
+                               .format(fixture=fixture_key))
+
+        # If it is not marked as a fixture
+        if getattr(fixture, '_httpretty_fixtures_fixture', None) is not True:
+            raise RuntimeError('Expected fixture "{fixture}" to be marked as a fixture. '
+                               'Please invoke `_httpretty_fixtures.mark_fixture` before using `.run()`/`.start()`'
+                               .format(fixture=fixture_key))
+
+        # Save our information
+        # DEV: We unwrap methods (e.g. Python 2's unbound methods) so we can detect replaced fixtures
+        return cls(
+            key=fixture_key,
+            fn=getattr(fixture, '__func__', fixture),
+            register_uri_args=fixture._httpretty_fixtures_args,
+            register_uri_kwargs=fixture._httpretty_fixtures_kwargs,
+            options=getattr(fixture, '_httpretty_fixtures_options', {}),
+        )
 
 
-# Define our class
 class FixtureManager(object):
+    # Lock for our nesting/session state below across all classes
+    # DEV: This is re-entrant so subclasses can call `start`/`stop` from overridden methods
+    state_lock = threading.RLock()
     # Store a count for HTTPretty across all classes
     nested_count = 0
     # Whether or not we should disable HTTPretty when all FixtureManagers are stopped
     httpretty_enabled_at_start = False
+    # Store a count of running sessions across all classes
+    session_count = 0
+    # Whether or not we should disable HTTPretty when all sessions are stopped
+    httpretty_enabled_at_session_start = False
+    # Stack of `(instance, thread id)` for every running instance across all classes
+    # DEV: `stop()` uses this to remove exactly the matchers its instance registered
+    running_instances = []
+    # How each fixture records its requests (e.g. `RECORD_FULL`, `RECORD_CAPTURE`, `RECORD_SUMMARY`, `RECORD_COUNT`)
+    record_mode = RECORD_FULL
+    # Size in bytes above which `RECORD_CAPTURE` spills request bodies to a temporary file
+    capture_spool_threshold = 64 * 1024
+    # Maximum amount of requests each fixture keeps in `requests` (e.g. `None` for unlimited)
+    # DEV: When set, `requests` becomes a ring buffer of the last `record_limit` requests
+    record_limit = None
+    # Whether to route all of our fixtures through a single indexed HTTPretty matcher
+    # DEV: This keeps request matching flat for managers with hundreds of fixtures
+    indexed_dispatch = False
+    # Path to a cassette to replay responses from (e.g. `fixtures/elasticsearch.cassette`)
+    cassette = None
+    # Base URL of a real server to record responses from when they aren't in our cassette yet
+    #   (e.g. `http://127.0.0.1:9200`). When `None`, we fallback to the fixture function itself.
+    cassette_upstream = None
+    # Size of chunks to read from file-like bodies returned by fixtures
+    stream_chunk_size = 64 * 1024
+    # Maximum amount of responses each instance caches for `static`/`cache_key` fixtures
+    cache_size = 128
+    # `Scenario` with responses and state transitions across our fixtures
+    scenario = None
+    # `FaultPolicy` to inject faults into every fixture's responses (fixtures can override it via `faults`)
+    fault_policy = None
 
     @classmethod
-    def generate_saving_fixture(cls, fixture):
+    def generate_saving_fixture(cls, fixture, request_log=None):
         """
         Wrap a fixture function with saving functionality
 
         :param function fixture: Fixture to add saving to
+        :param RequestLog request_log: Log to add recorded requests onto (e.g. our instance's `request_log`)
         :rtype: function
         :return: `fixture` with wrapped saving (e.g. saves `first_request`)
         """
+        # Resolve how we will record our requests and stream our responses
+        # DEV: We resolve this outside of `saving_fixture` to keep our per-request overhead low
+        record_request = generate_request_recorder(cls.record_mode, spool_threshold=cls.capture_spool_threshold)
+        # DEV: `RECORD_CAPTURE` saves its captures as `first_request`/`last_request` too so we don't hold onto
+        #   full requests (and their bodies) which it spilled to disk
+        save_records = cls.record_mode == RECORD_CAPTURE
+        options = getattr(fixture, '_httpretty_fixtures_options', {})
+        chunked = options.get('chunked', False)
+        delayer = generate_delayer(options.get('latency'))
+        stream_chunk_size = cls.stream_chunk_size
+        lock = threading.Lock()
+        fixture_name = fixture.__name__
+        metrics = FixtureMetrics()
+        # DEV: We key aggregate metrics by our class' module and qualified name so classes sharing a name
+        #   (e.g. a `from_route_table` class and its parent) don't collide. Python 2 has no `__qualname__`.
+        aggregate_metrics = get_aggregate_metrics('{module}.{cls}.{fixture}'.format(
+            module=cls.__module__, cls=getattr(cls, '__qualname__', cls.__name__), fixture=fixture_name))
+
         # Wrap our fixture to save request information
         @functools.wraps(fixture)
         def saving_fixture(request, *args, **kwargs):
-            # If this is the first request, save it
-            if saving_fixture.first_request is None:
-                saving_fixture.first_request = request
+            # Record our request atomically
+            # DEV: Fixtures can be hit from multiple threads at once (e.g. a `ThreadPoolExecutor` in tested code)
+            with lock:
+                # Add our request onto the stack and our log (unless we are only counting)
+                saved_request = request
+                if record_request is not None:
+                    record = record_request(request)
+                    saving_fixture.requests.append(record)
+                    if request_log is not None:
+                        request_log.append(fixture_name, record)
+                    if save_records:
+                        saved_request = record
+
+                # If this is the first request, save it
+                if saving_fixture.first_request is None:
+                    saving_fixture.first_request = saved_request
 
-            # Save the last request
-            saving_fixture.last_request = request
+                # Save the last request and count it
+                saving_fixture.last_request = saved_request
+                saving_fixture.request_count += 1
 
-            # Add our request onto the stack
-            saving_fixture.requests.append(request)
+            # Run our normal function
+            # DEV: `async def` fixtures are run to completion on a shared background event loop
+            start = timeit.default_timer()
+            status, res_headers, body = call_fixture(fixture, request, *args, **kwargs)
 
-            # Return our normal function
-            return fixture(request, *args, **kwargs)
+            # If our body is a generator or file-like object, then stream it and only save its size
+            if is_streamed_body(body):
+                if chunked:
+                    res_headers['transfer-encoding'] = 'chunked'
+                body, byte_count = read_streamed_body(body, stream_chunk_size, chunked=chunked)
+                with lock:
+                    saving_fixture.streamed_bytes += byte_count
+
+            # Save our metrics
+            # DEV: We exclude simulated latency as it's not time spent in our handler
+            #   We encode text bodies here so we count their bytes. HTTPretty sends bytes as-is.
+            seconds = timeit.default_timer() - start
+            if isinstance(body, TEXT_TYPE):
+                body = body.encode('utf-8')
+            response_bytes = len(body or b'')
+            metrics.record(seconds, response_bytes)
+            aggregate_metrics.record(seconds, response_bytes)
+
+            # If we have latency, then wait before responding
+            # DEV: We are run in HTTPretty's thread for this response so we delay it there
+            #   This allows clients' timeouts to trigger as they would against a slow server
+            if delayer is not None:
+                delay = delayer(response_bytes)
+                time.sleep(delay)
+                with lock:
+                    saving_fixture.delayed_seconds += delay
+            return (status, res_headers, body)
 
         # Define default information
         saving_fixture.first_request = None
         saving_fixture.last_request = None
-        saving_fixture.requests = []
+        saving_fixture.request_count = 0
+        saving_fixture.streamed_bytes = 0
+        saving_fixture.delayed_seconds = 0
+        saving_fixture.requests = generate_request_store(cls.record_limit)
+        saving_fixture.lock = lock
+        saving_fixture.metrics = metrics
+        saving_fixture.spool = getattr(record_request, 'spool', None)
 
         # Return our saving fixture
         return saving_fixture
 
+    @classmethod
+    def generate_cassette_fixture(cls, fixture):
+        """
+        Wrap a fixture function with record/replay via our `cassette`
+
+        :param function fixture: Fixture to add record/replay to
+        :rtype: function
+        :return: `fixture` which replays responses from our cassette, recording them from `cassette_upstream`
+        """
+        # Load our cassette
+        # DEV: Cassettes are shared per path so we only parse their index once per process
+        from .cassette import fetch_upstream, generate_cassette_key, get_cassette
+        cassette = get_cassette(cls.cassette)
+        upstream = cls.cassette_upstream
+
+        # Wrap our fixture to replay/record responses
+        @functools.wraps(fixture)
+        def cassette_fixture(request, uri, res_headers):
+            # If we haven't recorded a response yet, record it (or fallback to our fixture)
+            key = generate_cassette_key(request.method, uri)
+            response = cassette.get(key)
+            if response is None:
+                if upstream is None:
+                    return fixture(request, uri, res_headers)
+                response = cassette.record(key, *fetch_upstream(upstream, request, uri))
+
+            # Replay our response
+            # DEV: The body is only read from our memory-mapped cassette at this point
+            res_headers.update(response.headers)
+            return (response.status, res_headers, response.body)
+
+        # Return our cassette fixture
+        return cassette_fixture
+
+    def generate_caching_fixture(self, fixture_key, fixture, cache_key=None):
+        """
+        Wrap a fixture function with response caching on this instance
+
+        :param str fixture_key: Name of fixture being wrapped
+        :param function fixture: Fixture to add caching to
+        :param function cache_key: Function which takes `(request, uri)` and returns a key to cache responses by
+            When `None`, every request receives the first response (i.e. a `static` fixture)
+        :rtype: function
+        :return: `fixture` which replays its encoded responses from our cache
+        """
+        # Retrieve our cache
+        # DEV: Our cache is shared by all fixtures on this instance so `cache_size` bounds it as a whole
+        cache = self.get_response_cache()
+
+        # Wrap our fixture to replay cached responses
+        @functools.wraps(fixture)
+        def caching_fixture(request, uri, res_headers):
+            # If we have a cached response, then replay it
+            key = (fixture_key,) if cache_key is None else (fixture_key, cache_key(request, uri))
+            response = cache.get(key)
+            if response is not None:
+                status, headers, body = response
+                res_headers.update(headers)
+                return (status, res_headers, body)
+
+            # Otherwise, run our fixture
+            status, res_headers, body = call_fixture(fixture, request, uri, res_headers)
+
+            # If our body is streamed, then don't cache it
+            # DEV: Streams can only be consumed once and are meant for bodies we don't want to hold onto
+            if is_streamed_body(body):
+                return (status, res_headers, body)
+
+            # Encode and save our response
+            response = encode_response(status, res_headers, body)
+            cache.set(key, response)
+            return (status, res_headers, response[2])
+
+        # Return our caching fixture
+        return caching_fixture
+
+    @classmethod
+    def from_route_table(cls, path, name=None):
+        """
+        Create a subclass with a fixture for each route in a route table
+
+        Route metadata is parsed immediately but bodies aren't read until their route is first requested.
+
+        :param str path: Path to a `.json`, `.jsonl`, `.yaml`, or `.yml` file with a list of routes
+        :param str name: Name for our new class (e.g. `FakeElasticsearch`). Defaults to our class' name.
+        :rtype: type
+        :return: Subclass of our class with the route table's fixtures
+        """
+        # Generate and mark a fixture for each of our routes
+        base_dir = os.path.dirname(os.path.abspath(path))
+        attrs = {}
+        for route in load_route_table(path):
+            fixture, register_uri_args, register_uri_kwargs = generate_table_fixture(route, base_dir)
+
+            # If our route would replace one of our class' attributes (e.g. `start`) or another route, complain
+            fixture_key = fixture.__name__
+            if hasattr(cls, fixture_key):
+                raise RuntimeError('Expected route "{name}" in "{path}" to not be named after an attribute of {cls} '
+                                   'but it was. Please rename the route.'
+                                   .format(name=fixture_key, path=path, cls=cls.__name__))
+            if fixture_key in attrs:
+                raise RuntimeError('Expected route names in "{path}" to be unique but "{name}" was used more than once'
+                                   .format(name=fixture_key, path=path))
+            attrs[fixture_key] = mark_fixture_function(fixture, *register_uri_args, **register_uri_kwargs)
+
+        # Create our new class
+        return type(str(name or cls.__name__), (cls,), attrs)
+
+    def generate_scenario_fixture(self, fixture_key, fixture):
+        """
+        Wrap a fixture function with our scenario's responses and transitions
+
+        :param str fixture_key: Name of fixture being wrapped
+        :param function fixture: Fixture to add our scenario to
+        :rtype: function
+        :return: `fixture` which responds via our scenario when it has a response for the current call
+        """
+        scenario_state = self.scenario_state
+
+        # Wrap our fixture to consult our scenario
+        @functools.wraps(fixture)
+        def scenario_fixture(request, uri, res_headers):
+            # If our scenario has a response, then use it
+            response = scenario_state.advance(fixture_key)
+            if response is not None:
+                status, headers, body = response
+                res_headers.update(headers)
+                return (status, res_headers, body)
+
+            # Otherwise, run our fixture
+            return fixture(request, uri, res_headers)
+
+        # Return our scenario fixture
+        return scenario_fixture
+
+    @classmethod
+    def generate_negotiating_fixture(cls, fixture, compress=False, conditional=False):
+        """
+        Wrap a fixture function with compression and conditional request handling
+
+        :param function fixture: Fixture to negotiate responses for
+        :param bool|list compress: Compress bodies via `Accept-Encoding` (e.g. `True`, `['gzip']`)
+        :param bool conditional: Respond to `If-None-Match`/`If-Modified-Since` with `304 Not Modified`
+        :rtype: function
+        :return: `fixture` which compresses and/or conditionally responds
+        """
+        negotiator = ContentNegotiator(compress=compress, conditional=conditional)
+        run_fixture = functools.partial(call_fixture, fixture)
+
+        # Wrap our fixture to negotiate its responses
+        @functools.wraps(fixture)
+        def negotiating_fixture(request, uri, res_headers):
+            return negotiator.respond(run_fixture, request, uri, res_headers)
+        # DEV: `functools.wraps` copies this onto our saving fixture as well
+        negotiating_fixture.negotiation = negotiator
+
+        # Return our negotiating fixture
+        return negotiating_fixture
+
+    @classmethod
+    def generate_fault_fixture(cls, fixture, policy):
+        """
+        Wrap a fixture function with fault injection
+
+        :param function fixture: Fixture to add faults to
+        :param FaultPolicy policy: Policy with the faults to inject
+        :rtype: function
+        :return: `fixture` which injects faults from `policy`'s schedule
+        """
+        # Resolve our injector
+        # DEV: Each injector starts at the beginning of our schedule so every run gets the same faults
+        injector = policy.generate_injector()
+        run_fixture = functools.partial(call_fixture, fixture)
+
+        # Wrap our fixture to inject faults
+        @functools.wraps(fixture)
+        def fault_fixture(request, uri, res_headers):
+            return injector.inject(run_fixture, request, uri, res_headers)
+        # DEV: `functools.wraps` copies this onto our saving fixture as well
+        fault_fixture.faults = injector
+
+        # Return our fault fixture
+        return fault_fixture
+
     @classmethod
     def run(cls, fixtures):
         """
         Decorator to start up `httpretty` with a set of fixtures
 
-        :param list fixtures: Names of fixtures to load onto `httpretty`
+        :param list|FixtureSnapshot fixtures: Names of fixtures to load onto `httpretty` or a snapshot to restore
         """
         # For helping with logic, here is an example of what every part is
         # @FakeElasticsearch.run(['hello'])
@@ -88,90 +523,514 @@ class FixtureManager(object):
         #  i.e. `decorator_fn` to process `test_request_hello`
         return decorate_fn
 
+    @classmethod
+    def run_async(cls, fixtures):
+        """
+        Decorator to start up `httpretty` with a set of fixtures around an `async def` function
+
+        :param list fixtures: Names of fixtures to load onto `httpretty`
+        """
+        # If we don't support asyncio, complain and leave
+        aio = get_aio()
+        if aio is None:
+            raise RuntimeError('`run_async()` requires Python 3.5 or newer')
+        return aio.run_async(cls, fixtures)
+
+    @classmethod
+    @contextlib.contextmanager
+    def running(cls, fixtures):
+        """
+        Context manager to start up `httpretty` with a set of fixtures
+
+        :param list|FixtureSnapshot fixtures: Names of fixtures to load onto `httpretty` or a snapshot to restore
+        :return: Running instance of our class (same as `.start()`)
+        """
+        server = cls.start(fixtures)
+        try:
+            yield server
+        finally:
+            cls.stop()
+
+    @classmethod
+    def running_async(cls, fixtures):
+        """
+        Asynchronous context manager to start up `httpretty` with a set of fixtures
+
+        :param list fixtures: Names of fixtures to load onto `httpretty`
+        :rtype: aio.AsyncFixtureContext
+        """
+        # If we don't support asyncio, complain and leave
+        aio = get_aio()
+        if aio is None:
+            raise RuntimeError('`running_async()` requires Python 3.5 or newer')
+        return aio.AsyncFixtureContext(cls, fixtures)
+
     # https://github.com/gabrielfalcao/HTTPretty/blob/0.8.3/httpretty/core.py#L1023-L1032
     # https://github.com/spulec/moto/blob/0.4.2/moto/core/models.py#L32-L65
     @classmethod
     def start(cls, fixtures):
-        """Start running this class' fixtures"""
+        """
+        Start running this class' fixtures
+
+        :param list|FixtureSnapshot fixtures: Names of fixtures to start or a snapshot to restore
+        """
         # If we can't iterate over our fixtures, complain and leave
-        if not hasattr(fixtures, '__iter__'):
+        snapshot = fixtures if isinstance(fixtures, FixtureSnapshot) else None
+        if snapshot is None and not hasattr(fixtures, '__iter__'):
             raise TypeError('Expected `fixtures` to be an iterable sequence but it was not. '
                             'Please make it a list or a tuple.')
 
-        # Keep track if HTTPretty was started outside of FixtureManager
-        #   This means that we should not auto-disable HTTPretty when nested_count returns to 0
-        if FixtureManager.nested_count == 0:
-            FixtureManager.httpretty_enabled_at_start = HTTPretty.is_enabled()
+        # Update our nesting state atomically
+        # DEV: We resolve HTTPretty once since every lookup through our `LazyAttribute` costs a call
+        httpretty = HTTPretty.load()
+        with FixtureManager.state_lock:
+            # Keep track if HTTPretty was started outside of FixtureManager
+            #   This means that we should not auto-disable HTTPretty when nested_count returns to 0
+            if FixtureManager.nested_count == 0:
+                FixtureManager.httpretty_enabled_at_start = httpretty.is_enabled()
 
-        # Increase our internal counter
-        # DEV: Keep count on our base class so the `nested_count` is "global" for all subclasses
-        FixtureManager.nested_count += 1
+            # Increase our internal counter
+            # DEV: Keep count on our base class so the `nested_count` is "global" for all subclasses
+            FixtureManager.nested_count += 1
 
-        # If HTTPretty hasn't been started yet, then reset its info and start it
-        if not HTTPretty.is_enabled():
-            HTTPretty.reset()
-            HTTPretty.enable()
+            # If we are in a session, then only swap out the previous requests
+            # DEV: HTTPretty is kept enabled by our session so we avoid patching/unpatching sockets per test
+            #   Previous fixtures were removed by their `stop()` so we leave URIs registered outside of us alone
+            #   We still enable HTTPretty in case it was disabled outside of our session (e.g. `httpretty.disable()`)
+            if FixtureManager.session_count and FixtureManager.nested_count == 1:
+                reset_latest_requests(httpretty)
+                if not httpretty.is_enabled():
+                    httpretty.enable()
+            # Otherwise, if HTTPretty hasn't been started yet, then reset its info and start it
+            elif not httpretty.is_enabled():
+                httpretty.reset()
+                httpretty.enable()
 
-        # Initialize our class
-        instance = cls()
+            # Initialize our class and save it so `stop()` removes exactly its fixtures
+            # DEV: We save our nesting priority so our fixtures take precedence over the ones we are nested in
+            instance = cls()
+            instance._httpretty_fixtures_priority = (FixtureManager.nested_count - 1) * NESTED_PRIORITY_STEP
 
-        # Start each of our fixtures
-        # DEV: We must use a separate function to closure `fixture` to prevent reuse in loops
-        for fixture_key in fixtures:
-            instance.start_fixture(fixture_key)
+            # If we are bounding our recorded requests, then bound HTTPretty's global history as well
+            # DEV: Otherwise `HTTPretty.latest_requests` keeps every full request and grows forever
+            #   When we are nested, we keep as many requests as our outer instances so we never shrink their history
+            latest_requests_limit = get_latest_requests_limit(cls.record_mode, cls.record_limit)
+            if FixtureManager.nested_count > 1 and latest_requests_limit is not None:
+                outer_limit = getattr(httpretty.latest_requests, 'maxlen', None)
+                latest_requests_limit = None if outer_limit is None else max(latest_requests_limit, outer_limit)
+            instance._httpretty_fixtures_latest_requests = bound_latest_requests(httpretty, latest_requests_limit)
+            FixtureManager.running_instances.append((instance, get_ident()))
+
+        # If we are restoring a snapshot, then copy its state onto our instance and start its fixtures
+        if snapshot is not None:
+            snapshot.restore(instance)
+            instance.start_fixtures(snapshot.fixtures)
+            for fixture_key in snapshot.fixtures:
+                snapshot.restore_fixture(fixture_key, getattr(instance, fixture_key))
+        # Otherwise, start our fixtures in a single batch
+        else:
+            instance.start_fixtures(fixtures)
 
         # Return our generated server
         return instance
 
+    @classmethod
+    def serve(cls, fixtures, host='127.0.0.1', port=0, origin=None):
+        """
+        Serve a set of fixtures from a real HTTP server on a background thread
+
+        This allows other processes (e.g. subprocesses, `pytest-xdist` workers) to use our fixtures
+        while their requests are recorded on the returned server's `manager`.
+
+        :param list fixtures: Names of fixtures to serve
+        :param str host: Host to listen on
+        :param int port: Port to listen on, `0` picks a free port
+        :param str origin: Base URL to resolve requests with relative paths against (e.g. `http://localhost:9000`)
+        :rtype: FixtureServer
+        """
+        # If we can't iterate over our fixtures, complain and leave
+        if not hasattr(fixtures, '__iter__'):
+            raise TypeError('Expected `fixtures` to be an iterable sequence but it was not. '
+                            'Please make it a list or a tuple.')
+        from .serving import FixtureServer
+        return FixtureServer(cls(), fixtures, host=host, port=port, origin=origin).start()
+
+    @classmethod
+    def get_fixture_plan(cls, fixture_key):
+        """
+        Retrieve the validated registration plan for a fixture on this class
+
+        Plans are compiled once per class on first use and cached on the class itself.
+
+        :param str fixture_key: Name of fixture to retrieve a plan for
+        :rtype: FixturePlan
+        """
+        # Retrieve the plans for this exact class
+        # DEV: We look at `__dict__` rather than `getattr` so subclasses don't reuse their parent's plans
+        plans = cls.__dict__.get('_httpretty_fixtures_plans')
+        if plans is None:
+            plans = {}
+            setattr(cls, '_httpretty_fixtures_plans', plans)
+
+        # If we haven't compiled a plan yet or our fixture was replaced, then (re)compile it
+        plan = plans.get(fixture_key)
+        fixture = getattr(cls, fixture_key, None)
+        if plan is None or plan.fn is not getattr(fixture, '__func__', fixture):
+            plan = plans[fixture_key] = FixturePlan.compile(fixture_key, fixture)
+        return plan
+
     def start_fixture(self, fixture_key):
         """
         Begin an instance-bound fixture on this instance on HTTPretty
 
         :param str fixture_key: Name of fixture to start
         """
-        # Retrieve our fixture
+        self.start_fixtures([fixture_key])
+
+    def start_fixtures(self, fixture_keys):
+        """
+        Begin a batch of instance-bound fixtures on this instance on HTTPretty
+
+        Every fixture is bound and its matcher built before any are registered, then they are
+        registered in a single locked pass.
+
+        :param list fixture_keys: Names of fixtures to start
+        """
+        # Bind our fixtures and build their matchers
+        # DEV: Fixtures which can't be indexed (e.g. use `responses`) fallback to their own matcher
+        nested_priority = self.__dict__.get('_httpretty_fixtures_priority', 0)
+        routes = []
+        matchers = []
+        for fixture_key in fixture_keys:
+            plan, saving_fixture = self.bind_fixture(fixture_key)
+            indexed_args = plan.indexed_args if self.indexed_dispatch else None
+            if indexed_args is not None:
+                routes.append((indexed_args, saving_fixture))
+            else:
+                matcher = build_uri_matcher(*plan.register_uri_args, body=saving_fixture, **plan.register_uri_kwargs)
+                matcher.priority += nested_priority
+                matchers.append(matcher)
+
+        # Register our fixtures
+        # DEV: HTTPretty's registry is global so we lock it against other threads' `start`/`stop`
+        with FixtureManager.state_lock:
+            for (method, uri, kwargs), saving_fixture in routes:
+                self.get_dispatcher().add_route(method, uri, body=saving_fixture, **kwargs)
+            self.register_matchers(matchers)
+
+    def register_matchers(self, matchers):
+        """
+        Register matchers onto HTTPretty, keeping track of them so `stop_fixtures` can remove them
+
+        :param list matchers: `URIMatcher` instances to register
+        """
+        registrations = self.__dict__.setdefault('_httpretty_fixtures_registrations', [])
+        with FixtureManager.state_lock:
+            table = HTTPretty._entries
+            for matcher in matchers:
+                # If another matcher is registered for the same URI, then merge its entries after ours
+                # DEV: This mirrors `HTTPretty.register_uri`. We save the matcher we displaced to restore it on stop.
+                own_entries = tuple(matcher.entries)
+                displaced = None
+                if matcher in table:
+                    displaced_matcher = next(key for key in table if key == matcher)
+                    displaced_entries = table.pop(displaced_matcher)
+                    matcher.entries.extend(displaced_entries)
+                    displaced = (displaced_matcher, displaced_entries)
+                table[matcher] = matcher.entries
+                registrations.append((matcher, own_entries, displaced))
+
+    def stop_fixtures(self):
+        """
+        Remove every matcher this instance registered onto HTTPretty in a single locked pass
+
+        Matchers we displaced (e.g. an outer instance's fixture for the same URI) are restored,
+        as is HTTPretty's history of requests if we bounded it. Spools of spilled request bodies are closed.
+        """
+        with FixtureManager.state_lock:
+            # If we bounded HTTPretty's history, then restore its previous one
+            latest_requests = self.__dict__.pop('_httpretty_fixtures_latest_requests', None)
+            if latest_requests is not None:
+                restore_latest_requests(HTTPretty.load(), latest_requests)
+
+            # Close the spools of our fixtures
+            for fixture_key in self.__dict__.get('_httpretty_fixtures_keys', []):
+                spool = getattr(self.__dict__.get(fixture_key), 'spool', None)
+                if spool is not None:
+                    spool.close()
+
+            # If we have no matchers, then leave
+            registrations = self.__dict__.get('_httpretty_fixtures_registrations')
+            if not registrations:
+                return
+            table = HTTPretty._entries
+            # DEV: We unwind in reverse so URIs registered more than once by us restore in order
+            for matcher, own_entries, displaced in reversed(registrations):
+                current_entries = table.get(matcher)
+                # If we are still registered, then remove ourselves and restore who we displaced
+                # DEV: A displaced matcher which was stopped out of order has emptied its entries so we skip it
+                if current_entries is matcher.entries:
+                    del table[matcher]
+                    if displaced is not None and displaced[1]:
+                        table[displaced[0]] = displaced[1]
+                # Otherwise, if another instance registered over us, then only remove our own entries
+                elif current_entries is not None:
+                    own_ids = set(id(entry) for entry in own_entries)
+                    current_entries[:] = [entry for entry in current_entries if id(entry) not in own_ids]
+                    if not current_entries:
+                        del table[matcher]
+                del matcher.entries[:]
+            del registrations[:]
+
+    def bind_fixture(self, fixture_key):
+        """
+        Replace a fixture on this instance with its saving version without registering it
+
+        :param str fixture_key: Name of fixture to bind
+        :rtype: tuple
+        :return: `(plan, saving_fixture)` where `plan` is our `FixturePlan`
+        """
+        # Retrieve our validated plan and our instance-bound fixture
+        plan = self.get_fixture_plan(fixture_key)
         fixture = getattr(self, fixture_key)
 
-        # If it is not a function, complain and leave
-        if not fixture or not hasattr(fixture, '__call__'):
-            raise RuntimeError('Expected fixture "{fixture}" to be a function but it was not.'
-                               .format(fixture=fixture_key))
+        # If we are recording/replaying responses, then add our cassette
+        if self.cassette is not None:
+            fixture = self.generate_cassette_fixture(fixture)
 
-        # If it is not marked as a fixture
-        if fixture._httpretty_fixtures_fixture is not True:
-            raise RuntimeError('Expected fixture "{fixture}" to be marked as a fixture. '
-                               'Please invoke `_httpretty_fixtures.mark_fixture` before using `.run()`/`.start()`'
-                               .format(fixture=fixture_key))
+        # If our responses are cacheable, then add our cache
+        options = plan.options
+        if options.get('static') or options.get('cache_key') is not None:
+            fixture = self.generate_caching_fixture(fixture_key, fixture, cache_key=options.get('cache_key'))
+
+        # If we are part of our scenario, then add it
+        # DEV: We add this after our cache so cached responses still advance our scenario
+        if self.scenario is not None and fixture_key in self.scenario.fixtures:
+            fixture = self.generate_scenario_fixture(fixture_key, fixture)
+
+        # If we are compressing or answering conditional requests, then add our negotiation
+        # DEV: We add this before our faults so truncated responses are truncated after compression
+        if options.get('compress') or options.get('conditional'):
+            fixture = self.generate_negotiating_fixture(
+                fixture, compress=options.get('compress', False), conditional=options.get('conditional', False))
+
+        # If we have a fault policy, then add it
+        fault_policy = options.get('faults', self.fault_policy)
+        if fault_policy is not None:
+            fixture = self.generate_fault_fixture(fixture, fault_policy)
 
         # Generate our saving fixture
-        saving_fixture = self.generate_saving_fixture(fixture)
+        saving_fixture = self.generate_saving_fixture(fixture, request_log=self.request_log)
 
         # Save our new fixture on the instance itself
         # DEV: This prevents leaking out to the class' methods
         setattr(self, fixture_key, saving_fixture)
+        self.__dict__.setdefault('_httpretty_fixtures_keys', []).append(fixture_key)
+        return plan, saving_fixture
+
+    def snapshot(self):
+        """
+        Capture the state and recordings of this started instance
 
-        # Bind our fixture
-        HTTPretty.register_uri(*fixture._httpretty_fixtures_args, body=saving_fixture,
-                               **fixture._httpretty_fixtures_kwargs)
+        The snapshot can be passed to `.run()`/`.running()`/`.start()` in place of a list of fixtures
+        to start a new instance from it (e.g. to run an expensive warm-up once per test case).
+
+        :rtype: FixtureSnapshot
+        """
+        return FixtureSnapshot(self)
+
+    def __getattr__(self, name):
+        # If this is state restored from a snapshot that we haven't copied yet, then copy it now
+        # DEV: This is only called when normal lookups fail so it doesn't slow down other attributes
+        # DEV: We check again under our lock in case another thread copied it after our lookup failed
+        pending_state = self.__dict__.get('_httpretty_fixtures_pending_state')
+        if pending_state is not None:
+            with FixtureManager.state_lock:
+                if name in pending_state:
+                    self.__dict__[name] = copy.deepcopy(pending_state.pop(name))
+                if name in self.__dict__:
+                    return self.__dict__[name]
+        raise AttributeError('{cls!r} object has no attribute {name!r}'.format(cls=type(self).__name__, name=name))
+
+    @property
+    def request_log(self):
+        """
+        Queryable log of requests recorded by each fixture started on this instance
+
+        :rtype: RequestLog
+        """
+        # DEV: We create our log lazily since subclasses aren't required to invoke our `__init__`
+        request_log = self.__dict__.get('_httpretty_fixtures_request_log')
+        if request_log is None:
+            request_log = self._httpretty_fixtures_request_log = RequestLog(self.record_limit)
+        return request_log
+
+    @property
+    def scenario_state(self):
+        """
+        Running state of our `scenario` on this instance (e.g. `server.scenario_state.state`)
+
+        :rtype: ScenarioState|None
+        """
+        if self.scenario is None:
+            return None
+        scenario_state = self.__dict__.get('_httpretty_fixtures_scenario_state')
+        if scenario_state is None:
+            scenario_state = self._httpretty_fixtures_scenario_state = ScenarioState(self.scenario)
+        return scenario_state
+
+    def metrics_report(self):
+        """
+        Summarize metrics for each fixture started on this instance
+
+        :rtype: dict
+        :return: Summaries from `FixtureMetrics.to_dict` keyed by fixture name
+        """
+        return dict((fixture_key, getattr(self, fixture_key).metrics.to_dict())
+                    for fixture_key in self.__dict__.get('_httpretty_fixtures_keys', []))
+
+    def get_response_cache(self):
+        """
+        Retrieve the response cache for this instance, creating it if it's new
+
+        :rtype: ResponseCache
+        """
+        cache = self.__dict__.get('_httpretty_fixtures_cache')
+        if cache is None:
+            cache = self._httpretty_fixtures_cache = ResponseCache(self.cache_size)
+        return cache
+
+    def get_dispatcher(self):
+        """
+        Retrieve the indexed dispatcher for this instance, registering it onto HTTPretty if it's new
+
+        :rtype: IndexedDispatcher
+        """
+        dispatcher = self.__dict__.get('_httpretty_fixtures_dispatcher')
+        if dispatcher is None:
+            from .dispatch import IndexedDispatcher
+            dispatcher = self._httpretty_fixtures_dispatcher = IndexedDispatcher(
+                priority=self.__dict__.get('_httpretty_fixtures_priority', 0))
+            self.register_matchers([dispatcher])
+        return dispatcher
 
     @classmethod
     def stop(cls):
         """Stop running this class' fixtures"""
-        # Decrease our counter
-        FixtureManager.nested_count -= 1
+        with FixtureManager.state_lock:
+            # Decrease our counter
+            FixtureManager.nested_count -= 1
 
-        # If we have stopped running too many times, complain and leave
-        if FixtureManager.nested_count < 0:
-            raise RuntimeError('When running `httpretty-fixtures`, `stop()`'
-                               'was run more times than (or before) `start()`')
+            # If we have stopped running too many times, complain and leave
+            if FixtureManager.nested_count < 0:
+                raise RuntimeError('When running `httpretty-fixtures`, `stop()`'
+                                   'was run more times than (or before) `start()`')
 
-        # If we have gotten out of nesting, then stop HTTPretty and
-        # DEV: Only disable HTTPretty if it was started outside of FixtureManager
-        if FixtureManager.nested_count == 0 and not FixtureManager.httpretty_enabled_at_start:
-            HTTPretty.disable()
+            # Remove the fixtures of our most recently started instance
+            instance = cls.pop_running_instance()
+            if instance is not None:
+                instance.stop_fixtures()
+
+            # If we have gotten out of nesting, then stop HTTPretty and
+            # DEV: Only disable HTTPretty if it was started outside of FixtureManager
+            #   If a session was started while we were running, then it keeps HTTPretty enabled until it stops
+            if (FixtureManager.nested_count == 0 and not FixtureManager.httpretty_enabled_at_start and
+                    not FixtureManager.session_count):
+                HTTPretty.disable()
+
+    @classmethod
+    def pop_running_instance(cls):
+        """
+        Remove the instance that `stop()` should stop from our running instances
+
+        This is the most recently started instance of our class, preferring ones started by the current thread.
+
+        :rtype: FixtureManager|None
+        """
+        running_instances = FixtureManager.running_instances
+        thread_id = get_ident()
+        with FixtureManager.state_lock:
+            for same_thread in (True, False):
+                for i in range(len(running_instances) - 1, -1, -1):
+                    instance, instance_thread_id = running_instances[i]
+                    if isinstance(instance, cls) and (not same_thread or instance_thread_id == thread_id):
+                        del running_instances[i]
+                        return instance
+            # DEV: We fallback to any instance so a `stop()` from an unrelated class still unwinds our stack
+            if running_instances:
+                return running_instances.pop()[0]
+        return None
+
+    @classmethod
+    def start_session(cls):
+        """
+        Keep HTTPretty enabled across multiple `.run()`/`.start()` calls
+
+        While a session is running, `.start()` only clears HTTPretty's history of requests
+        rather than enabling/disabling HTTPretty for every test (e.g. for `setUpModule`)
+        """
+        with FixtureManager.state_lock:
+            # If this is our first session, then keep track of if HTTPretty was started outside of FixtureManager
+            if FixtureManager.session_count == 0:
+                if FixtureManager.nested_count == 0:
+                    FixtureManager.httpretty_enabled_at_session_start = HTTPretty.is_enabled()
+                else:
+                    FixtureManager.httpretty_enabled_at_session_start = FixtureManager.httpretty_enabled_at_start
+
+            # Increase our internal counter
+            FixtureManager.session_count += 1
+
+            # If HTTPretty hasn't been started yet, then reset its info and start it
+            if not HTTPretty.is_enabled():
+                HTTPretty.reset()
+                HTTPretty.enable()
+
+    @classmethod
+    def stop_session(cls):
+        """Stop a session started via `.start_session()`"""
+        with FixtureManager.state_lock:
+            # Decrease our counter
+            FixtureManager.session_count -= 1
+
+            # If we have stopped running too many times, complain and leave
+            if FixtureManager.session_count < 0:
+                raise RuntimeError('When running `httpretty-fixtures`, `stop_session()`'
+                                   'was run more times than (or before) `start_session()`')
+
+            # If we have more sessions, then do nothing
+            if FixtureManager.session_count:
+                return
+
+            # If there are still running fixtures, then hand off disabling HTTPretty to them
+            # Otherwise, disable HTTPretty if it was started by our session
+            if FixtureManager.nested_count:
+                FixtureManager.httpretty_enabled_at_start = FixtureManager.httpretty_enabled_at_session_start
+            elif not FixtureManager.httpretty_enabled_at_session_start:
+                HTTPretty.disable()
+
+    @classmethod
+    @contextlib.contextmanager
+    def session(cls):
+        """Context manager to run `.start_session()` and `.stop_session()`"""
+        cls.start_session()
+        try:
+            yield
+        finally:
+            cls.stop_session()
 
 
 # Define our registration methods
+# Keyword arguments for `mark_fixture` that are options for `httpretty_fixtures` rather than `httpretty.register_uri`
+#   chunked: Send streamed bodies with `Transfer-Encoding: chunked`
+#   latency: Delay responses by a fixed amount of seconds or via a `LatencyProfile`
+#   static: Run our fixture once per instance and replay its encoded response for every request
+#   cache_key: Function which takes `(request, uri)` and returns a key to cache encoded responses by
+#   faults: `FaultPolicy` to inject faults into our responses (overrides `fault_policy`, `None` disables faults)
+#   compress: Compress bodies via `Accept-Encoding`, `True` for every supported coding or a list (e.g. `['gzip']`)
+#   conditional: Tag responses with an `ETag` and answer `If-None-Match`/`If-Modified-Since` with 304s
+FIXTURE_OPTIONS = ('chunked', 'latency', 'static', 'cache_key', 'faults', 'compress', 'conditional')
+
+
 # https://github.com/gabrielfalcao/HTTPretty/blob/0.8.3/httpretty/http.py#L112-L121
 def mark_fixture_function(fn, *register_uri_args, **register_uri_kwargs):
     """
@@ -180,11 +1039,16 @@ def mark_fixture_function(fn, *register_uri_args, **register_uri_kwargs):
     :param function fn: Function to use as our fixture
     :param *args register_uri_args: Arguments to pass through to `httpretty.register_uri`
     :param **kwargs register_uri_kwargs: Keyword arguments to pass through to `httpretty.register_uri`
+        Keys in `FIXTURE_OPTIONS` are saved as options for `httpretty_fixtures` instead
     """
-    # Mark the fixture with our key and save its args/kwargs
+    # Separate our options from our `register_uri` keyword arguments
+    options = dict((key, register_uri_kwargs.pop(key)) for key in FIXTURE_OPTIONS if key in register_uri_kwargs)
+
+    # Mark the fixture with our key and save its args/kwargs/options
     fn._httpretty_fixtures_fixture = True
     fn._httpretty_fixtures_args = register_uri_args
     fn._httpretty_fixtures_kwargs = register_uri_kwargs
+    fn._httpretty_fixtures_options = options
 
     # Return our function
     return fn
@@ -204,14 +1068,15 @@ def mark_fixture(*register_uri_args, **register_uri_kwargs):
 
 
 # Define helper registration methods for each HTTP verb
-get = functools.partial(mark_fixture, HTTPretty.GET)
-put = functools.partial(mark_fixture, HTTPretty.PUT)
-post = functools.partial(mark_fixture, HTTPretty.POST)
-delete = functools.partial(mark_fixture, HTTPretty.DELETE)
-head = functools.partial(mark_fixture, HTTPretty.HEAD)
-patch = functools.partial(mark_fixture, HTTPretty.PATCH)
-options = functools.partial(mark_fixture, HTTPretty.OPTIONS)
-connect = functools.partial(mark_fixture, HTTPretty.CONNECT)
+# DEV: These match `HTTPretty.GET`/etc but we use strings so defining fixtures doesn't import HTTPretty
+get = functools.partial(mark_fixture, 'GET')
+put = functools.partial(mark_fixture, 'PUT')
+post = functools.partial(mark_fixture, 'POST')
+delete = functools.partial(mark_fixture, 'DELETE')
+head = functools.partial(mark_fixture, 'HEAD')
+patch = functools.partial(mark_fixture, 'PATCH')
+options = functools.partial(mark_fixture, 'OPTIONS')
+connect = functools.partial(mark_fixture, 'CONNECT')
 
 
 # Create aliases for httpretty's requests
@@ -233,3 +1098,29 @@ def last_request():
 def requests():
     """Retrieve all requests encountered by HTTPretty"""
     return HTTPretty.latest_requests
+
+
+# If we are profiling our startup, then time each of our phases
+# DEV: We only wrap our functions when profiling so there's no overhead otherwise
+if startup_profile is not None:
+    startup_profile.wrap_lazy_attribute('import_httpretty', HTTPretty)
+    mark_fixture_function = startup_profile.wrap('mark_fixture', mark_fixture_function)
+    FixtureManager.start_fixtures = startup_profile.wrap(
+        'start_fixtures', FixtureManager.__dict__['start_fixtures'])
+    FixtureManager.stop = classmethod(startup_profile.wrap('teardown', FixtureManager.__dict__['stop'].__func__))
+    FixtureManager.stop_session = classmethod(
+        startup_profile.wrap('teardown', FixtureManager.__dict__['stop_session'].__func__))
+
+    startup_profile.record('import', timeit.default_timer() - import_start)
+
+
+def startup_profile_report():
+    """
+    Retrieve our startup profile when `HTTPRETTY_FIXTURES_PROFILE` is set
+
+    :rtype: dict|None
+    :return: `{'count': int, 'seconds': float}` for each phase or `None` if we aren't profiling
+    """
+    if startup_profile is None:
+        return None
+    return startup_profile.report()
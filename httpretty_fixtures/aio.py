@@ -0,0 +1,96 @@
+# Load in our dependencies
+# DEV: This module uses `async`/`await` syntax so it's only imported on Python>=3.5
+import asyncio
+import functools
+import inspect
+import threading
+
+from httpretty import HTTPretty
+
+
+# Re-export our awaitable check for `saving_fixture`
+isawaitable = inspect.isawaitable
+
+# Define our background event loop for `async def` fixtures
+# DEV: HTTPretty invokes fixtures synchronously from a thread per response
+#   so we run their coroutines on a shared loop rather than blocking on a new loop per request
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_fixture_loop():
+    """
+    Retrieve the background event loop that runs `async def` fixtures, starting it if need be
+
+    :rtype: asyncio.AbstractEventLoop
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            # DEV: Event loops create a real socket pair to wake themselves up
+            #   so we create ours with HTTPretty's socket patching temporarily removed
+            httpretty_enabled = HTTPretty.is_enabled()
+            if httpretty_enabled:
+                HTTPretty.disable()
+            try:
+                loop = asyncio.new_event_loop()
+            finally:
+                if httpretty_enabled:
+                    HTTPretty.enable()
+            thread = threading.Thread(target=loop.run_forever, name='httpretty-fixtures-loop')
+            thread.daemon = True
+            thread.start()
+            _loop = loop
+    return _loop
+
+
+def run_coroutine(awaitable):
+    """
+    Run an awaitable returned by a fixture to completion on our background event loop
+
+    :param awaitable awaitable: Coroutine or future returned by a fixture
+    :return: Result of `awaitable` (e.g. `(status, headers, body)`)
+    """
+    # DEV: `run_coroutine_threadsafe` only accepts coroutines so we wrap futures and other awaitables
+    if not asyncio.iscoroutine(awaitable):
+        awaitable = _await(awaitable)
+    return asyncio.run_coroutine_threadsafe(awaitable, get_fixture_loop()).result()
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+def run_async(manager_cls, fixtures):
+    """
+    Decorator to start up `httpretty` with a set of fixtures around an `async def` function
+
+    :param type manager_cls: `FixtureManager` subclass to start
+    :param list fixtures: Names of fixtures to load onto `httpretty`
+    """
+    def decorate_fn(fn):
+        @functools.wraps(fn)
+        async def wrapper(that_self, *args, **kwargs):
+            # Start our class, run our fn, and always cleanup
+            # DEV: We use the same signature as `FixtureManager.run` meaning we append to `args`
+            server = manager_cls.start(fixtures)
+            args += (server,)
+            try:
+                return await fn(that_self, *args, **kwargs)
+            finally:
+                manager_cls.stop()
+        return wrapper
+    return decorate_fn
+
+
+class AsyncFixtureContext(object):
+    """Asynchronous context manager to run a set of fixtures (e.g. `async with FakeServer.running_async([...])`)"""
+    def __init__(self, manager_cls, fixtures):
+        self.manager_cls = manager_cls
+        self.fixtures = fixtures
+
+    async def __aenter__(self):
+        return self.manager_cls.start(self.fixtures)
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.manager_cls.stop()
@@ -0,0 +1,89 @@
+# Load in our dependencies
+import collections
+import threading
+
+
+# Define our constants
+# DEV: These headers change per response so we don't replay them from our cache
+UNCACHED_HEADERS = frozenset(['date'])
+
+
+def request_cache_key(request, uri):
+    """
+    Cache key function which caches responses by method, path, and query string
+
+    :param HTTPrettyRequest request: Incoming request
+    :param str uri: Full URI of request including its query string
+    :rtype: tuple
+    """
+    return (request.method, uri)
+
+
+class ResponseCache(object):
+    """
+    Least recently used cache of encoded responses
+
+    :param int maxsize: Maximum amount of responses to keep
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.responses = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.responses)
+
+    def copy(self):
+        """
+        Create an independent copy of our cache, sharing our encoded responses
+
+        :rtype: ResponseCache
+        """
+        with self.lock:
+            cache = ResponseCache(self.maxsize)
+            cache.responses = self.responses.copy()
+        return cache
+
+    def get(self, key):
+        """
+        Retrieve a response and mark it as recently used
+
+        :param object key: Key response was saved under
+        :rtype: tuple|None
+        :return: `(status, headers, body)` or `None` if it's not cached
+        """
+        with self.lock:
+            # DEV: We pop and re-insert rather than `move_to_end` to support Python 2
+            response = self.responses.pop(key, None)
+            if response is not None:
+                self.responses[key] = response
+            return response
+
+    def set(self, key, response):
+        """
+        Save a response, evicting the least recently used response if we are full
+
+        :param object key: Key to save response under
+        :param tuple response: `(status, headers, body)` to save
+        """
+        with self.lock:
+            self.responses.pop(key, None)
+            self.responses[key] = response
+            while len(self.responses) > self.maxsize:
+                self.responses.popitem(last=False)
+
+
+def encode_response(status, headers, body):
+    """
+    Prepare a response for caching
+
+    :param int status: Status code of response
+    :param dict headers: Headers of response
+    :param str|bytes body: Body of response
+    :rtype: tuple
+    :return: `(status, headers, body)` with headers copied and body encoded to bytes
+    """
+    if not isinstance(body, bytes):
+        body = body.encode('utf-8')
+    headers = dict((key, value) for key, value in headers.items() if key.lower() not in UNCACHED_HEADERS)
+    return (status, headers, body)
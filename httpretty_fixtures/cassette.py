@@ -0,0 +1,212 @@
+# Load in our dependencies
+import io
+import json
+import mmap
+import os
+import threading
+
+from httpretty import HTTPretty
+
+try:
+    from http.client import HTTPConnection, HTTPSConnection
+    from urllib.parse import urlsplit
+except ImportError:  # Python 2
+    from httplib import HTTPConnection, HTTPSConnection
+    from urlparse import urlsplit
+
+
+# Define our constants
+# DEV: These headers describe the upstream connection rather than our response so we don't replay them
+#   https://tools.ietf.org/html/rfc2616#section-13.5.1
+UNREPLAYED_HEADERS = frozenset([
+    'connection', 'content-length', 'date', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'server', 'te', 'trailers', 'transfer-encoding', 'upgrade',
+])
+
+
+def generate_cassette_key(method, uri):
+    """
+    Generate the key a response is saved under in a cassette
+
+    :param str method: HTTP method of request (e.g. `GET`)
+    :param str uri: Full URI of request including its query string
+    :rtype: str
+    """
+    return '{method} {uri}'.format(method=method, uri=uri)
+
+
+class CassetteResponse(object):
+    """Response saved in a `Cassette`. Its body is only read from disk when accessed."""
+    __slots__ = ('cassette', 'status', 'headers', 'offset', 'length')
+
+    def __init__(self, cassette, status, headers, offset, length):
+        self.cassette = cassette
+        self.status = status
+        self.headers = headers
+        self.offset = offset
+        self.length = length
+
+    @property
+    def body(self):
+        """Body of our response, read from our cassette's memory map"""
+        return self.cassette.read(self.offset, self.length)
+
+
+class Cassette(object):
+    """
+    On-disk store of recorded responses
+
+    Bodies are appended to `path` and read back via a memory map.
+    Response metadata (status, headers, body offset/length) is stored in a JSON lines index at `path + '.index'`.
+    Loading a cassette only parses its index, bodies aren't read until they are replayed.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + '.index'
+        self.responses = {}
+        self.lock = threading.Lock()
+        self._file = None
+        self._mmap = None
+        self.load()
+
+    def load(self):
+        """Load our index from disk"""
+        # If we have no index, then there's nothing to load
+        if not os.path.exists(self.index_path):
+            return
+
+        # Load each of our responses, preferring the latest recording for a key
+        with io.open(self.index_path, 'r', encoding='utf-8') as index_file:
+            for line in index_file:
+                if not line.strip():
+                    continue
+                info = json.loads(line)
+                self.responses[info['key']] = CassetteResponse(
+                    self, info['status'], info['headers'], info['offset'], info['length'])
+
+    def get(self, key):
+        """
+        Retrieve a recorded response
+
+        :param str key: Key of response (e.g. via `generate_cassette_key`)
+        :rtype: CassetteResponse|None
+        """
+        return self.responses.get(key)
+
+    def read(self, offset, length):
+        """
+        Read a body from our memory map
+
+        :param int offset: Byte offset of body in our data file
+        :param int length: Length of body in bytes
+        :rtype: bytes
+        """
+        # If our body is empty, then return early (we can't memory map empty files)
+        if not length:
+            return b''
+
+        # Lazily open our memory map
+        # DEV: We re-open our memory map when new responses have been recorded
+        with self.lock:
+            if self._mmap is None:
+                self._file = io.open(self.path, 'rb')
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._mmap[offset:offset + length]
+
+    def record(self, key, status, headers, body):
+        """
+        Save a response to disk
+
+        :param str key: Key to save response under (e.g. via `generate_cassette_key`)
+        :param int status: Status code of response
+        :param dict headers: Headers of response
+        :param bytes body: Body of response
+        :rtype: CassetteResponse
+        """
+        with self.lock:
+            # Append our body to our data file
+            with io.open(self.path, 'ab') as data_file:
+                data_file.seek(0, os.SEEK_END)
+                offset = data_file.tell()
+                data_file.write(body)
+
+            # Append our metadata to our index
+            with io.open(self.index_path, 'a', encoding='utf-8') as index_file:
+                line = json.dumps({
+                    'key': key, 'status': status, 'headers': headers, 'offset': offset, 'length': len(body),
+                }, sort_keys=True)
+                index_file.write(u'{line}\n'.format(line=line))
+
+            # Invalidate our memory map and save our response
+            self._close_mmap()
+            response = self.responses[key] = CassetteResponse(self, status, headers, offset, len(body))
+        return response
+
+    def close(self):
+        """Close our memory map"""
+        with self.lock:
+            self._close_mmap()
+
+    def _close_mmap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+
+# Define a cache so each cassette is only loaded once per process
+cassettes = {}
+cassettes_lock = threading.Lock()
+
+
+def get_cassette(path):
+    """
+    Retrieve the shared `Cassette` for a path
+
+    :param str path: Path to cassette data file
+    :rtype: Cassette
+    """
+    path = os.path.abspath(path)
+    with cassettes_lock:
+        cassette = cassettes.get(path)
+        if cassette is None:
+            cassette = cassettes[path] = Cassette(path)
+    return cassette
+
+
+def fetch_upstream(upstream, request, uri):
+    """
+    Forward a request to a real server, bypassing HTTPretty
+
+    :param str upstream: Base URL of server to forward requests to (e.g. `http://127.0.0.1:8000`)
+    :param HTTPrettyRequest request: Request to forward
+    :param str uri: Full URI of request including its query string
+    :rtype: tuple
+    :return: `(status, headers, body)` of upstream's response
+    """
+    # Determine our connection and path
+    upstream_info = urlsplit(upstream)
+    uri_info = urlsplit(uri)
+    path = uri_info.path or '/'
+    if uri_info.query:
+        path += '?' + uri_info.query
+    connection_cls = HTTPSConnection if upstream_info.scheme == 'https' else HTTPConnection
+
+    # Forward our request with HTTPretty disabled
+    # DEV: This mirrors `HTTPretty.record` which disables HTTPretty while talking to the real server
+    headers = dict((key, value) for key, value in request.headers.items() if key.lower() != 'host')
+    HTTPretty.disable()
+    try:
+        connection = connection_cls(upstream_info.hostname, upstream_info.port)
+        try:
+            connection.request(request.method, path, body=request.body or None, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+            res_headers = dict((key.lower(), value) for key, value in response.getheaders()
+                               if key.lower() not in UNREPLAYED_HEADERS)
+            return response.status, res_headers, body
+        finally:
+            connection.close()
+    finally:
+        HTTPretty.enable()
@@ -0,0 +1,368 @@
+# Load in our dependencies
+import re
+
+from httpretty import HTTPretty
+from httpretty.core import POTENTIAL_HTTP_PORTS, POTENTIAL_HTTPS_PORTS, Entry, URIInfo, URIMatcher, url_fix
+from httpretty.utils import decode_utf8
+
+from .faults import InjectedConnectionReset
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:  # Python 2
+    from urlparse import urlsplit
+
+
+# Define our constants
+PATTERN_TYPE = type(re.compile(''))
+# Matchers and ports parsed for each `(uri, match_querystring)` by `FixtureURIMatcher.from_template`
+URI_MATCHER_TEMPLATES = {}
+
+
+def is_regex(uri):
+    """Determine if a URI is a compiled regular expression"""
+    return isinstance(uri, PATTERN_TYPE)
+
+
+class FixtureEntry(Entry):
+    """HTTPretty entry which drops its connection quietly when its fixture raises `InjectedConnectionReset`"""
+    def fill_filekind(self, fk):
+        # DEV: HTTPretty fills our socket from a worker thread so an escaping error is printed by `threading.excepthook`
+        #   Our fixture runs before anything is written so an empty `fk` reads as a closed connection to clients
+        try:
+            return super(FixtureEntry, self).fill_filekind(fk)
+        except InjectedConnectionReset:
+            pass
+
+
+def get_exact_key(hostname, port, path):
+    """
+    Generate the key used to look up exact (non-regex) routes
+
+    :param str hostname: Hostname of route (e.g. `localhost`)
+    :param int port: Port of route (e.g. `9000`)
+    :param str path: Path of route without its query string (e.g. `/hello`)
+    :rtype: tuple
+    """
+    # DEV: This mirrors the normalization in `httpretty.core.URIInfo.__eq__`
+    return (decode_utf8(hostname or '').lower(), port, url_fix(decode_utf8(path or '/')))
+
+
+class Route(object):
+    """Registration information for a single route inside of an `IndexedDispatcher`"""
+    __slots__ = ('method', 'uri', 'entry', 'match_querystring', 'priority')
+
+    def __init__(self, method, uri, entry, match_querystring=False, priority=0):
+        self.method = method
+        self.uri = uri
+        self.entry = entry
+        self.match_querystring = match_querystring
+        self.priority = priority
+
+
+class RegexIndex(object):
+    """Set of regex routes for a single method, compiled into alternations"""
+    def __init__(self):
+        self.routes = []
+        self.compiled = None
+
+    def add(self, route):
+        """Add a regex route to our set and invalidate our compiled alternations"""
+        self.routes.append(route)
+        self.compiled = None
+
+    def compile(self):
+        """
+        Compile our routes into as few alternations as possible
+
+        Routes are grouped by flags and `match_querystring` since they are searched against different strings.
+        Routes with their own capturing groups are searched individually to preserve their group numbering.
+
+        :rtype: list
+        :return: List of `(match_querystring, pattern, routes)` in priority order
+        """
+        # Group our routes in priority order
+        # DEV: `sorted` is stable so routes of equal priority keep their registration order
+        groups = []
+        groups_by_key = {}
+        for route in sorted(self.routes, key=lambda route: route.priority, reverse=True):
+            pattern = route.uri
+            group_key = route if pattern.groups else (pattern.flags, route.match_querystring)
+            group = groups_by_key.get(group_key)
+            if group is None:
+                group = groups_by_key[group_key] = []
+                groups.append(group)
+            group.append(route)
+
+        # Compile each of our groups into a single alternation
+        # DEV: We append an empty named group to each alternative so `match.lastgroup` tells us which route matched
+        self.compiled = []
+        for routes in groups:
+            pattern = routes[0].uri
+            if len(routes) > 1:
+                alternation = '|'.join('(?:{pattern})(?P<_r{i}>)'.format(pattern=route.uri.pattern, i=i)
+                                       for i, route in enumerate(routes))
+                pattern = re.compile(alternation, pattern.flags)
+            self.compiled.append((routes[0].match_querystring, pattern, routes))
+        return self.compiled
+
+    def search(self, info):
+        """
+        Find the route which matches a request
+
+        :param URIInfo info: Information about incoming request
+        :rtype: Route|None
+        """
+        compiled = self.compiled
+        if compiled is None:
+            compiled = self.compile()
+
+        # Search each of our alternations
+        # DEV: We cache our URLs since `full_url` is relatively expensive
+        urls = {}
+        for match_querystring, pattern, routes in compiled:
+            url = urls.get(match_querystring)
+            if url is None:
+                url = urls[match_querystring] = info.full_url(use_querystring=match_querystring)
+            match = pattern.search(url)
+            if match:
+                if len(routes) == 1:
+                    return routes[0]
+                return routes[int(match.lastgroup[2:])]
+        return None
+
+
+class IndexedDispatcher(URIMatcher):
+    """
+    Single HTTPretty matcher which routes requests through an index
+
+    Lookups go through a hash map of exact routes first, then through per-method regex alternations.
+    This keeps lookup cost flat as the amount of routes grows.
+    """
+    def __init__(self, priority=0):
+        # DEV: We don't invoke `URIMatcher.__init__` since we have no single URI
+        #   `priority` is added onto the priority of our routes (e.g. to break ties between nested instances)
+        self.entries = []
+        self.base_priority = priority
+        self.priority = priority
+        self.exact_routes = {}
+        self.regex_indexes = {}
+        self.any_regex_index = RegexIndex()
+
+    def add_route(self, method, uri, body, match_querystring=False, priority=0, **response_kwargs):
+        """
+        Add a route to our index
+
+        :param str method: HTTP method of route (e.g. `GET`)
+        :param str|regex uri: URI or compiled regex to match against
+        :param function body: Response body or callback for our route
+        :param bool match_querystring: Whether regex URIs are matched against the query string as well
+        :param int priority: Priority of route relative to other regex routes
+        :param **kwargs response_kwargs: Keyword arguments to pass through to `HTTPretty.Response`
+        """
+        entry = FixtureEntry(method, uri, body, **response_kwargs)
+        route = Route(method, uri, entry, match_querystring=match_querystring, priority=priority)
+        self.entries.append(entry)
+
+        # If our route is a regex, add it to our regex indexes
+        if is_regex(uri):
+            # Save our port so HTTPretty intercepts its connections
+            # DEV: This mirrors `URIMatcher.__init__` but ignores ports that are regex syntax
+            try:
+                result = urlsplit(uri.pattern)
+                if result.scheme == 'https':
+                    POTENTIAL_HTTPS_PORTS.add(int(result.port or 443))
+                else:
+                    POTENTIAL_HTTP_PORTS.add(int(result.port or 80))
+            except ValueError:
+                pass
+
+            regex_index = self.regex_indexes.get(method)
+            if regex_index is None:
+                regex_index = self.regex_indexes[method] = RegexIndex()
+            regex_index.add(route)
+            self.any_regex_index.add(route)
+        # Otherwise, add it to our exact routes
+        else:
+            # DEV: HTTPretty appends a trailing slash to bare domains in `register_uri`
+            if re.search(r'^\w+://[^/]+[.]\w{2,}$', uri):
+                uri += '/'
+            info = URIInfo.from_uri(uri, entry)
+            key = get_exact_key(info.hostname, info.port, info.path)
+            # DEV: Like HTTPretty, the latest registration for a URI and method is served first
+            self.exact_routes.setdefault(key, {})[method] = route
+
+        # Keep our priority in line with our highest priority route
+        self.priority = max(self.priority, self.base_priority + priority)
+        return route
+
+    def lookup(self, method, info):
+        """
+        Find the route for a request
+
+        :param str|None method: HTTP method of request (e.g. `GET`), `None` matches any method
+        :param URIInfo info: Information about incoming request
+        :rtype: Route|None
+        """
+        # Check our exact routes first
+        exact_routes = self.exact_routes.get(get_exact_key(info.hostname, info.port, info.path))
+        if exact_routes:
+            if method is None:
+                return next(iter(exact_routes.values()))
+            route = exact_routes.get(method)
+            if route is not None:
+                return route
+
+        # Fallback to our regex routes
+        regex_index = self.any_regex_index if method is None else self.regex_indexes.get(method)
+        if regex_index is not None:
+            return regex_index.search(info)
+        return None
+
+    def matches(self, info):
+        return self.lookup(None, info) is not None
+
+    def get_fallback_matcher(self, info):
+        """
+        Find the matcher HTTPretty would have tried after us for a request
+
+        :param URIInfo info: Information about incoming request
+        :rtype: URIMatcher|None
+        """
+        # DEV: This mirrors the order of `HTTPretty.match_uriinfo`
+        matchers = sorted(HTTPretty._entries, key=lambda matcher: matcher.priority, reverse=True)
+        after_us = False
+        for matcher in matchers:
+            if matcher is self:
+                after_us = True
+            elif after_us and matcher.matches(info):
+                return matcher
+        return None
+
+    def get_next_entry(self, method, info, request):
+        # Find our route
+        route = self.lookup(method, info)
+
+        # If we only have routes for other methods, then fallback to the next matcher (e.g. an outer instance's)
+        #   and complain like HTTPretty if there is none
+        # DEV: `matches` ignores methods since HTTPretty doesn't pass them so we can be picked for any method
+        if route is None:
+            fallback_matcher = self.get_fallback_matcher(info)
+            if fallback_matcher is None:
+                raise ValueError('I have no entries for method %s: %s' % (method, self))
+            return fallback_matcher.get_next_entry(method, info, request)
+
+        # Attach request info to our entry like `URIMatcher.get_next_entry`
+        entry = route.entry
+        entry.info = info
+        entry.request = request
+        return entry
+
+    def __str__(self):
+        return 'IndexedDispatcher({id})'.format(id=id(self))
+
+    def __hash__(self):
+        return id(self)
+
+    def __eq__(self, other):
+        return self is other
+
+    def __ne__(self, other):
+        return self is not other
+
+
+def split_register_uri_args(register_uri_args, register_uri_kwargs):
+    """
+    Split `register_uri` arguments into the pieces needed by `IndexedDispatcher.add_route`
+
+    :param tuple register_uri_args: Arguments for `httpretty.register_uri`
+    :param dict register_uri_kwargs: Keyword arguments for `httpretty.register_uri`
+    :rtype: tuple|None
+    :return: `(method, uri, kwargs)` or `None` if the route can't be indexed (e.g. uses `responses`)
+    """
+    # If we have more than a method and URI or are using rotating responses, then we can't be indexed
+    if len(register_uri_args) != 2 or register_uri_kwargs.get('responses'):
+        return None
+    method, uri = register_uri_args
+    kwargs = dict(register_uri_kwargs)
+    kwargs.pop('responses', None)
+    return method, uri, kwargs
+
+
+class FixtureURIMatcher(URIMatcher):
+    """`URIMatcher` which caches its hash since HTTPretty rebuilds its string for every hash"""
+    # DEV: Our URI never changes after we are created so our hash doesn't either
+    _hash = None
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = URIMatcher.__hash__(self)
+        return self._hash
+
+    @classmethod
+    def from_template(cls, uri, entries, match_querystring=False, priority=0):
+        """
+        Create a matcher, reusing the parsed URI and hash of the last matcher we created for its URI
+
+        :param str|regex uri: URI or compiled regex to match against
+        :param list entries: Entries to respond with
+        :rtype: FixtureURIMatcher
+        """
+        # If we haven't created a matcher for this URI yet, then parse it into our template
+        # DEV: Parsing our URI (`URIInfo.from_uri`) and hashing it are most of the cost of a matcher
+        #   Neither is modified by HTTPretty after creation so every matcher for a URI can share them
+        key = (uri, match_querystring)
+        cached = URI_MATCHER_TEMPLATES.get(key)
+        if cached is None:
+            template = cls(uri, [], match_querystring)
+            hash(template)
+            # DEV: This mirrors the ports that `URIMatcher.__init__` saves for HTTPretty to intercept
+            result = urlsplit(uri.pattern if is_regex(uri) else uri)
+            if result.scheme == 'https':
+                port = (POTENTIAL_HTTPS_PORTS, int(result.port or 443))
+            else:
+                port = (POTENTIAL_HTTP_PORTS, int(result.port or 80))
+            cached = URI_MATCHER_TEMPLATES[key] = (template, port)
+        template, (potential_ports, port) = cached
+
+        # Save our port so HTTPretty intercepts its connections
+        # DEV: `HTTPretty.reset()` forgets every port it was given so we save ours each time
+        potential_ports.add(port)
+
+        # Copy our template without `URIMatcher.__init__` and give it our own state
+        matcher = cls.__new__(cls)
+        matcher.__dict__.update(template.__dict__)
+        matcher.entries = entries
+        matcher.priority = priority
+        matcher.current_entries = {}
+        return matcher
+
+
+def build_uri_matcher(method, uri, body='HTTPretty :)', adding_headers=None, forcing_headers=None, status=200,
+                      responses=None, match_querystring=False, priority=0, **headers):
+    """
+    Create the matcher that `httpretty.register_uri` would register, without registering it
+
+    This lets us build every matcher for a `FixtureManager` up front and register them in a single batch.
+
+    :param str method: HTTP method of route (e.g. `GET`)
+    :param str|regex uri: URI or compiled regex to match against
+    :rtype: FixtureURIMatcher
+    """
+    # DEV: This mirrors `httpretty.core.httpretty.register_uri`
+    if not is_regex(uri) and re.search(r'^\w+://[^/]+[.]\w{2,}$', uri):
+        uri += '/'
+
+    if isinstance(responses, list) and len(responses) > 0:
+        for response in responses:
+            response.uri = uri
+            response.method = method
+        # DEV: We copy our responses since registering merges other entries for the same URI into our list
+        entries = list(responses)
+    else:
+        headers[str('body')] = body
+        headers[str('adding_headers')] = adding_headers
+        headers[str('forcing_headers')] = forcing_headers
+        headers[str('status')] = status
+        entries = [FixtureEntry(method, uri, **headers)]
+    return FixtureURIMatcher.from_template(uri, entries, match_querystring, priority)
@@ -0,0 +1,166 @@
+# Load in our dependencies
+import array
+import random
+import threading
+import time
+
+from .streaming import TEXT_TYPE, is_streamed_body, read_streamed_body
+
+
+# Define our fault kinds
+# DEV: Each request's fault is stored as its index in `FAULTS` (0 is no fault) so schedules stay compact
+FAULT_NONE = None
+FAULT_ERROR = 'error'
+FAULT_RESET = 'reset'
+FAULT_TRUNCATE = 'truncate'
+FAULT_SLOW_FIRST_BYTE = 'slow_first_byte'
+FAULT_THROTTLE = 'throttle'
+FAULTS = (FAULT_NONE, FAULT_ERROR, FAULT_RESET, FAULT_TRUNCATE, FAULT_SLOW_FIRST_BYTE, FAULT_THROTTLE)
+
+
+class InjectedConnectionReset(Exception):
+    """Error raised inside of a fixture to drop its connection without a response"""
+
+
+class FaultPolicy(object):
+    """
+    Description of faults to inject into a fixture's responses
+
+    Each rate is the probability of a request receiving that fault. Their total must be at most 1.
+
+    :param float error_rate: Rate of responding with `error_status`
+    :param int error_status: Status code for errors (e.g. `500`)
+    :param float reset_rate: Rate of dropping the connection without a response
+    :param float truncate_rate: Rate of cutting off the response body halfway (sent as an unterminated chunked body)
+    :param float slow_first_byte_rate: Rate of waiting `slow_first_byte` seconds before responding
+    :param float slow_first_byte: Seconds to wait before a slow response
+    :param float throttle_rate: Rate of responding with `throttle_status` and a `Retry-After` header
+    :param int throttle_status: Status code for throttled responses (e.g. `429`, `503`)
+    :param int retry_after: Seconds for our `Retry-After` header
+    :param int seed: Seed for our schedule so every run of a fixture gets the same faults
+    :param int schedule_size: Amount of requests to precompute faults for, our schedule repeats after this
+    """
+    def __init__(self, error_rate=0, error_status=500, reset_rate=0, truncate_rate=0, slow_first_byte_rate=0,
+                 slow_first_byte=1, throttle_rate=0, throttle_status=429, retry_after=1, seed=None,
+                 schedule_size=10000):
+        # Save our rates in the same order as `FAULTS`
+        self.rates = (error_rate, reset_rate, truncate_rate, slow_first_byte_rate, throttle_rate)
+
+        # If our rates are invalid, complain and leave
+        if any(rate < 0 for rate in self.rates) or sum(self.rates) > 1:
+            raise RuntimeError('Expected fault rates to be positive and add up to at most 1 but they were {rates}'
+                               .format(rates=self.rates))
+
+        self.error_status = error_status
+        self.slow_first_byte = slow_first_byte
+        self.throttle_status = throttle_status
+        self.retry_after = retry_after
+        self.seed = seed
+        self.schedule_size = schedule_size
+        self.schedule = None
+
+    def get_schedule(self):
+        """
+        Retrieve our precomputed schedule of faults, computing it if need be
+
+        :rtype: array.array
+        :return: Index in `FAULTS` for each of our next `schedule_size` requests
+        """
+        # DEV: We compute our schedule once per policy in a single pass and share it (read-only) across fixtures
+        if self.schedule is None:
+            thresholds = []
+            total = 0
+            for rate in self.rates:
+                total += rate
+                thresholds.append(total)
+            rng = random.Random(self.seed)
+            schedule = array.array('B', bytes(bytearray(self.schedule_size)))
+            for i in range(self.schedule_size):
+                sample = rng.random()
+                for kind, threshold in enumerate(thresholds):
+                    if sample < threshold:
+                        schedule[i] = kind + 1
+                        break
+            self.schedule = schedule
+        return self.schedule
+
+    def generate_injector(self):
+        """
+        Create a function which resolves the fault for each request to a fixture
+
+        Each injector walks our schedule from the start so separate `.run()`'s get identical faults.
+
+        :rtype: FaultInjector
+        """
+        return FaultInjector(self)
+
+
+class FaultInjector(object):
+    """
+    Running position in a `FaultPolicy` schedule for a fixture
+
+    :param FaultPolicy policy: Policy to inject faults from
+    """
+    def __init__(self, policy):
+        self.policy = policy
+        self.schedule = policy.get_schedule()
+        self.position = 0
+        self.counts = dict((fault, 0) for fault in FAULTS if fault is not None)
+        self.lock = threading.Lock()
+
+    def next_fault(self):
+        """
+        Resolve the fault for our next request
+
+        :rtype: str|None
+        :return: Fault kind (e.g. `FAULT_RESET`) or `None` if our request shouldn't be faulted
+        """
+        with self.lock:
+            fault = FAULTS[self.schedule[self.position]]
+            self.position = (self.position + 1) % len(self.schedule)
+            if fault is not None:
+                self.counts[fault] += 1
+        return fault
+
+    def inject(self, fixture, request, uri, res_headers):
+        """
+        Run a fixture with our next fault
+
+        :param function fixture: Fixture to run
+        :rtype: tuple
+        :return: `(status, headers, body)` to respond with
+        """
+        policy = self.policy
+        fault = self.next_fault()
+
+        # If we are responding with an error or throttling, then don't run our fixture
+        if fault == FAULT_ERROR:
+            return (policy.error_status, res_headers, 'Injected fault')
+        elif fault == FAULT_THROTTLE:
+            res_headers['retry-after'] = str(policy.retry_after)
+            return (policy.throttle_status, res_headers, 'Injected throttle')
+        # Otherwise, if we are resetting our connection, then error out without a response
+        # DEV: `FixtureEntry` and `FixtureServer` both close the connection quietly when this is raised
+        elif fault == FAULT_RESET:
+            raise InjectedConnectionReset('Injected connection reset for {uri}'.format(uri=uri))
+        # Otherwise, if we are slow, then wait before running our fixture
+        elif fault == FAULT_SLOW_FIRST_BYTE:
+            time.sleep(policy.slow_first_byte)
+
+        # Run our fixture
+        status, res_headers, body = fixture(request, uri, res_headers)
+
+        # If we are truncating our body, then send its first half as an unterminated chunked body
+        # DEV: HTTPretty always sets `Content-Length` to our body's length so chunked framing is the only
+        #   way to make clients see a response that ended prematurely
+        if fault == FAULT_TRUNCATE:
+            if is_streamed_body(body):
+                body = read_streamed_body(body, 64 * 1024)[0]
+            elif isinstance(body, TEXT_TYPE):
+                body = body.encode('utf-8')
+            body = body or b''
+            half = body[:len(body) // 2]
+            res_headers['transfer-encoding'] = 'chunked'
+            res_headers['connection'] = 'close'
+            body = '{size:x}\r\n'.format(size=len(half)).encode('ascii') + half + b'\r\n'
+        return (status, res_headers, body)
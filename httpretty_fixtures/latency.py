@@ -0,0 +1,74 @@
+# Load in our dependencies
+import numbers
+import random
+import threading
+
+
+class LatencyProfile(object):
+    """
+    Description of how slow a fixture should respond
+
+    :param float delay: Fixed delay in seconds before every response
+    :param tuple distribution: Random delay in seconds added to `delay`, as a `random.Random` method name and its args
+        (e.g. `('uniform', 0.1, 0.3)`, `('gauss', 0.2, 0.05)`, `('expovariate', 10)`)
+    :param int seed: Seed for our random delays so every run of a fixture gets the same sequence of delays
+    :param int bytes_per_second: Bandwidth to throttle response bodies to (e.g. `1024 * 1024` for 1MB/s)
+    """
+    def __init__(self, delay=0, distribution=None, seed=None, bytes_per_second=None):
+        # If our distribution is unknown, complain and leave
+        if distribution is not None and not hasattr(random.Random, distribution[0]):
+            raise RuntimeError('Expected `distribution` to start with a `random.Random` method name (e.g. "uniform") '
+                               'but it was "{name}"'.format(name=distribution[0]))
+
+        self.delay = delay
+        self.distribution = distribution
+        self.seed = seed
+        self.bytes_per_second = bytes_per_second
+
+    def generate_delayer(self):
+        """
+        Create a function which calculates delays for a fixture
+
+        Each delayer has its own seeded random generator so separate `.run()`'s get identical delays.
+
+        :rtype: function
+        :return: Function which takes a response's body length and returns its delay in seconds
+        """
+        delay = self.delay
+        bytes_per_second = self.bytes_per_second
+        sample = None
+        if self.distribution is not None:
+            rng = random.Random(self.seed)
+            method = getattr(rng, self.distribution[0])
+            args = self.distribution[1:]
+            lock = threading.Lock()
+
+            # DEV: We lock our generator so concurrent requests still receive a deterministic sequence
+            def sample():
+                with lock:
+                    return method(*args)
+
+        def delayer(body_length):
+            seconds = delay
+            if sample is not None:
+                seconds += sample()
+            if bytes_per_second:
+                seconds += float(body_length) / bytes_per_second
+            # DEV: Distributions like `gauss` can go negative, we can't respond before a request
+            return max(seconds, 0)
+        return delayer
+
+
+def generate_delayer(latency):
+    """
+    Create a delay calculator for a fixture's `latency` option
+
+    :param number|LatencyProfile|None latency: Fixed delay in seconds or a `LatencyProfile`
+    :rtype: function|None
+    :return: Function from `LatencyProfile.generate_delayer` or `None` if there's no latency
+    """
+    if latency is None:
+        return None
+    if isinstance(latency, numbers.Number):
+        latency = LatencyProfile(delay=latency)
+    return latency.generate_delayer()
@@ -0,0 +1,42 @@
+# Load in our dependencies
+import importlib
+
+
+class LazyAttribute(object):
+    """
+    Stand-in for an attribute of a module (e.g. `httpretty.HTTPretty`) which imports that module on first use
+
+    Every attribute lookup and call on our stand-in is forwarded to the real attribute.
+
+    :param str module_name: Name of module to import (e.g. `httpretty`)
+    :param str name: Name of attribute to retrieve from our module (e.g. `HTTPretty`)
+    """
+    def __init__(self, module_name, name):
+        self._module_name = module_name
+        self._name = name
+        self._target = None
+
+    def is_loaded(self):
+        """Whether our module has been imported by us yet"""
+        return self._target is not None
+
+    def load(self):
+        """
+        Import our module and retrieve our attribute from it
+
+        :rtype: object
+        """
+        # DEV: Python's import lock makes concurrent first imports safe so we don't need our own lock
+        target = self._target
+        if target is None:
+            target = self._target = getattr(importlib.import_module(self._module_name), self._name)
+        return target
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self):
+        return '<LazyAttribute {module_name}.{name}>'.format(module_name=self._module_name, name=self._name)
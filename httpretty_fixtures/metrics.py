@@ -0,0 +1,162 @@
+# Load in our dependencies
+import atexit
+import io
+import json
+import math
+import threading
+
+# Define our constants
+# DEV: Durations are counted in logarithmic buckets so our memory doesn't grow with our amount of calls
+#   Each bucket is 1% wider than the last so our percentiles are within 1% of the exact duration
+BUCKET_MIN_SECONDS = 1e-7
+BUCKET_GROWTH = 1.01
+LOG_BUCKET_GROWTH = math.log(BUCKET_GROWTH)
+
+
+def get_bucket(seconds):
+    """
+    Retrieve the histogram bucket for a duration
+
+    :param float seconds: Duration to bucket
+    :rtype: int
+    """
+    if seconds <= BUCKET_MIN_SECONDS:
+        return 0
+    return int(math.log(seconds / BUCKET_MIN_SECONDS) / LOG_BUCKET_GROWTH)
+
+
+class FixtureMetrics(object):
+    """Call count, handler time, and response size for a fixture"""
+    __slots__ = ('call_count', 'total_seconds', 'response_bytes', 'buckets', 'min_seconds', 'max_seconds', 'lock')
+
+    def __init__(self):
+        self.call_count = 0
+        self.total_seconds = 0.0
+        self.response_bytes = 0
+        # DEV: We keep a histogram of durations rather than every duration so we can report percentiles
+        #   with constant memory (e.g. for soak tests with millions of requests)
+        self.buckets = {}
+        self.min_seconds = None
+        self.max_seconds = None
+        self.lock = threading.Lock()
+
+    def record(self, seconds, response_bytes):
+        """
+        Save information about a call
+
+        :param float seconds: Time spent in our fixture's handler
+        :param int response_bytes: Size of our response body
+        """
+        bucket = get_bucket(seconds)
+        with self.lock:
+            self.call_count += 1
+            self.total_seconds += seconds
+            self.response_bytes += response_bytes
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+            if self.min_seconds is None or seconds < self.min_seconds:
+                self.min_seconds = seconds
+            if self.max_seconds is None or seconds > self.max_seconds:
+                self.max_seconds = seconds
+
+    @property
+    def mean_seconds(self):
+        """Mean time spent in our handler"""
+        if not self.call_count:
+            return 0.0
+        return self.total_seconds / self.call_count
+
+    def percentile(self, percent):
+        """
+        Calculate a percentile of time spent in our handler (nearest-rank, within 1%)
+
+        :param float percent: Percentile to calculate (e.g. `99`)
+        :rtype: float
+        """
+        with self.lock:
+            if not self.call_count:
+                return 0.0
+            buckets = sorted(self.buckets.items())
+            call_count, min_seconds, max_seconds = self.call_count, self.min_seconds, self.max_seconds
+
+        # Find the bucket with our rank and use its upper bound
+        # DEV: We clamp our bound to our observed durations so a single duration is reported exactly
+        rank = max(int(math.ceil(percent / 100.0 * call_count)), 1)
+        seen = 0
+        for bucket, count in buckets:
+            seen += count
+            if seen >= rank:
+                break
+        seconds = BUCKET_MIN_SECONDS * BUCKET_GROWTH ** (bucket + 1)
+        return min(max(seconds, min_seconds), max_seconds)
+
+    def to_dict(self):
+        """
+        Summarize our metrics
+
+        :rtype: dict
+        """
+        return {
+            'call_count': self.call_count,
+            'total_seconds': self.total_seconds,
+            'mean_seconds': self.mean_seconds,
+            'p99_seconds': self.percentile(99),
+            'response_bytes': self.response_bytes,
+        }
+
+
+# Define our registry of metrics across all `FixtureManager` instances
+# DEV: Keys are `{module}.{class}.{fixture}` (e.g. `tests.utils.FakeElasticsearch.es_index`)
+registry = {}
+registry_lock = threading.Lock()
+
+
+def get_aggregate_metrics(key):
+    """
+    Retrieve the metrics for a fixture across all instances, creating them if need be
+
+    :param str key: Name of fixture in our registry (e.g. `tests.utils.FakeElasticsearch.es_index`)
+    :rtype: FixtureMetrics
+    """
+    with registry_lock:
+        metrics = registry.get(key)
+        if metrics is None:
+            metrics = registry[key] = FixtureMetrics()
+    return metrics
+
+
+def metrics_report():
+    """
+    Summarize metrics for every fixture across all `FixtureManager` instances
+
+    :rtype: dict
+    :return: Summaries from `FixtureMetrics.to_dict` keyed by `{class}.{fixture}`
+    """
+    with registry_lock:
+        items = list(registry.items())
+    return dict((key, metrics.to_dict()) for key, metrics in items)
+
+
+def reset_metrics():
+    """Clear metrics for every fixture across all `FixtureManager` instances"""
+    with registry_lock:
+        registry.clear()
+
+
+def export_metrics(path):
+    """
+    Write our metrics report to a JSON file
+
+    :param str path: Path to write our report to
+    """
+    with io.open(path, 'w', encoding='utf-8') as report_file:
+        report = json.dumps(metrics_report(), indent=2, sort_keys=True)
+        report_file.write(u'{report}\n'.format(report=report))
+
+
+def export_metrics_at_exit(path):
+    """
+    Write our metrics report to a JSON file when our process exits
+
+    :param str path: Path to write our report to
+    """
+    atexit.register(export_metrics, path)
@@ -0,0 +1,271 @@
+# Load in our dependencies
+import email.utils
+import hashlib
+import threading
+import zlib
+
+from .cache import ResponseCache
+from .streaming import TEXT_TYPE, is_streamed_body
+
+# Define our constants
+ENCODING_BR = 'br'
+ENCODING_GZIP = 'gzip'
+ENCODING_DEFLATE = 'deflate'
+ENCODING_IDENTITY = 'identity'
+# DEV: In order of preference when a client accepts multiple encodings equally
+ENCODINGS = (ENCODING_BR, ENCODING_GZIP, ENCODING_DEFLATE)
+# Statuses which never have a body to compress
+BODILESS_STATUSES = frozenset([204, 304])
+
+# Amount of compressed bodies each fixture keeps
+COMPRESSION_CACHE_SIZE = 16
+
+
+def get_brotli():
+    """
+    Retrieve the `brotli` module when it's available
+
+    :rtype: module|None
+    """
+    # DEV: Brotli support is optional so we don't require it for everyone
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def compress_body(body, encoding):
+    """
+    Compress a body via a content coding
+
+    :param bytes body: Body to compress
+    :param str encoding: Content coding to use (e.g. `gzip`)
+    :rtype: bytes
+    """
+    if encoding == ENCODING_BR:
+        return get_brotli().compress(body)
+    elif encoding == ENCODING_GZIP:
+        # DEV: We use `zlib` with a gzip header rather than `gzip` so our output is identical across runs
+        #   (i.e. no timestamp) and Python versions
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(body) + compressor.flush()
+    # DEV: HTTP's `deflate` is zlib wrapped DEFLATE data
+    return zlib.compress(body)
+
+
+def parse_accept_encoding(header):
+    """
+    Parse the codings and their quality values from an `Accept-Encoding` header
+
+    :param str header: Header value (e.g. `gzip, deflate;q=0.5`)
+    :rtype: dict
+    :return: Quality for each coding keyed by its lowercase name (e.g. `{'gzip': 1.0, 'deflate': 0.5}`)
+    """
+    qualities = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def choose_encoding(header, encodings):
+    """
+    Choose the content coding to respond with for an `Accept-Encoding` header
+
+    :param str header: Header value or `None` when the client didn't send one
+    :param tuple encodings: Codings we support, in order of preference
+    :rtype: str|None
+    :return: Coding to use or `None` to respond uncompressed
+    """
+    if not header:
+        return None
+    qualities = parse_accept_encoding(header)
+    default_quality = qualities.get('*', 0.0)
+    best_encoding, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, default_quality)
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+    return best_encoding
+
+
+def get_header(headers, name):
+    """
+    Retrieve a header regardless of its casing
+
+    :param object headers: Mapping-like headers (e.g. `dict`, `mimetools.Message`)
+    :param str name: Lowercase name of header
+    :rtype: str|None
+    """
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def parse_http_date(value):
+    """
+    Parse an HTTP date (e.g. `Last-Modified`) into a timestamp
+
+    :param str value: Header value
+    :rtype: int|None
+    :return: Seconds since the epoch or `None` if our date is invalid
+    """
+    parsed = email.utils.parsedate_tz(value) if value else None
+    if parsed is None:
+        return None
+    return email.utils.mktime_tz(parsed)
+
+
+def etag_matches(header, etag):
+    """
+    Determine if an `If-None-Match` header matches an entity tag
+
+    :param str header: Header value (e.g. `"abc", W/"def"`)
+    :param str etag: Entity tag of our response (e.g. `"abc"`)
+    :rtype: bool
+    """
+    # DEV: `If-None-Match` uses weak comparison so we ignore `W/` prefixes
+    if header.strip() == '*':
+        return True
+    etag = etag[2:] if etag.startswith('W/') else etag
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ContentNegotiator(object):
+    """
+    Compression and conditional request handling for a fixture's responses
+
+    :param bool|list compress: Compress bodies via `Accept-Encoding`, `True` for every supported coding
+        or a list of codings (e.g. `['gzip']`)
+    :param bool conditional: Respond to `If-None-Match`/`If-Modified-Since` with `304 Not Modified`
+    """
+    def __init__(self, compress=False, conditional=False):
+        # Resolve our encodings
+        if compress is True:
+            encodings = tuple(encoding for encoding in ENCODINGS
+                              if encoding != ENCODING_BR or get_brotli() is not None)
+        else:
+            encodings = tuple(compress or ())
+
+        # If any of our encodings are unsupported, complain and leave
+        for encoding in encodings:
+            if encoding not in ENCODINGS:
+                raise RuntimeError('Expected `compress` encodings to be in {encodings} but received "{encoding}"'
+                                   .format(encodings=', '.join(ENCODINGS), encoding=encoding))
+            if encoding == ENCODING_BR and get_brotli() is None:
+                raise RuntimeError('Expected `brotli` to be installed to compress with "br". '
+                                   'Please run `pip install brotli`')
+        self.encodings = encodings
+        self.conditional = conditional
+
+        # Track our responses
+        # DEV: `body_bytes` vs `sent_bytes` is the bandwidth our compression and 304s saved
+        self.counts = dict((key, 0) for key in encodings + (ENCODING_IDENTITY, 'not_modified'))
+        self.body_bytes = 0
+        self.sent_bytes = 0
+        self.lock = threading.Lock()
+
+        # Cache our compressed bodies
+        # DEV: Our cache lives on our fixture so it's freed along with its `FixtureManager` instance
+        self.compression_cache = ResponseCache(COMPRESSION_CACHE_SIZE)
+
+    def record(self, kind, body_bytes, sent_bytes):
+        with self.lock:
+            self.counts[kind] += 1
+            self.body_bytes += body_bytes
+            self.sent_bytes += sent_bytes
+
+    def get_compressed_body(self, body, encoding):
+        """
+        Retrieve a compressed body from our cache, compressing it if need be
+
+        :param bytes body: Body to compress
+        :param str encoding: Content coding to use (e.g. `gzip`)
+        :rtype: bytes
+        """
+        # DEV: We key by digest so we don't keep raw bodies around nor compare them in full on every lookup
+        key = (encoding, hashlib.sha1(body).digest())
+        compressed_body = self.compression_cache.get(key)
+        if compressed_body is None:
+            compressed_body = compress_body(body, encoding)
+            self.compression_cache.set(key, compressed_body)
+        return compressed_body
+
+    def respond(self, fixture, request, uri, res_headers):
+        """
+        Run a fixture and negotiate its response
+
+        :param function fixture: Fixture to run
+        :rtype: tuple
+        :return: `(status, headers, body)` to respond with
+        """
+        # Run our fixture
+        status, res_headers, body = fixture(request, uri, res_headers)
+
+        # If our response can't be negotiated (e.g. streamed, already encoded, no body), then leave it alone
+        if (is_streamed_body(body) or status in BODILESS_STATUSES or
+                get_header(res_headers, 'content-encoding') is not None):
+            return (status, res_headers, body)
+        if isinstance(body, TEXT_TYPE):
+            body = body.encode('utf-8')
+        body = body or b''
+
+        # Choose our encoding
+        # DEV: We always send `Vary` so caches don't serve one encoding to clients asking for another
+        encoding = None
+        if self.encodings:
+            encoding = choose_encoding(request.headers.get('Accept-Encoding'), self.encodings)
+            res_headers['vary'] = 'Accept-Encoding'
+
+        # If we are answering conditional requests for a successful response, then tag it
+        # DEV: Each encoding is a separate representation so it gets its own entity tag
+        if self.conditional and status == 200:
+            etag = get_header(res_headers, 'etag')
+            if etag is None:
+                etag = '"{digest}{suffix}"'.format(digest=hashlib.sha1(body).hexdigest()[:16],
+                                                   suffix='-' + encoding if encoding else '')
+                res_headers['etag'] = etag
+
+            # If our client already has our response, then tell them it's not modified
+            # DEV: `If-Modified-Since` is ignored when `If-None-Match` is present (RFC 7232 section 6)
+            if_none_match = request.headers.get('If-None-Match')
+            if if_none_match is not None:
+                not_modified = etag_matches(if_none_match, etag)
+            else:
+                last_modified = parse_http_date(get_header(res_headers, 'last-modified'))
+                if_modified_since = parse_http_date(request.headers.get('If-Modified-Since'))
+                not_modified = (last_modified is not None and if_modified_since is not None and
+                                last_modified <= if_modified_since)
+            if not_modified:
+                self.record('not_modified', len(body), 0)
+                return (304, res_headers, b'')
+
+        # If we aren't compressing, then send our body as-is
+        if encoding is None:
+            self.record(ENCODING_IDENTITY, len(body), len(body))
+            return (status, res_headers, body)
+
+        # Compress our body (reusing past compressions of it)
+        compressed_body = self.get_compressed_body(body, encoding)
+        res_headers['content-encoding'] = encoding
+        self.record(encoding, len(body), len(compressed_body))
+        return (status, res_headers, compressed_body)
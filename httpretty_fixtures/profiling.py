@@ -0,0 +1,130 @@
+# Load in our dependencies
+import atexit
+import collections
+import functools
+import io
+import json
+import os
+import sys
+import threading
+import timeit
+
+# Define our constants
+# DEV: Set to `1` to print our profile to stderr on exit or to a path ending in `.json` to write it there
+PROFILE_ENV = 'HTTPRETTY_FIXTURES_PROFILE'
+# Phases we time, in the order they happen
+#   import: Importing `httpretty_fixtures` itself
+#   import_httpretty: Importing HTTPretty's internals (deferred until our first `start()`)
+#   mark_fixture: Marking fixtures via `get`/`post`/etc while defining a `FixtureManager` subclass
+#     This is the bulk of a class body's cost so we don't time class creation separately
+#   start_fixtures: Registering each batch of fixtures onto HTTPretty during `start()`
+#   teardown: Running `stop()`/`stop_session()`
+PHASES = ('import', 'import_httpretty', 'mark_fixture', 'start_fixtures', 'teardown')
+
+
+class StartupProfile(object):
+    """Cumulative call counts and time spent in each of our startup phases"""
+    def __init__(self):
+        self.phases = collections.OrderedDict((phase, [0, 0.0]) for phase in PHASES)
+        self.lock = threading.Lock()
+
+    def record(self, phase, seconds):
+        """
+        Add a call to a phase
+
+        :param str phase: Name of phase (e.g. `start_fixtures`)
+        :param float seconds: Time spent in our call
+        """
+        with self.lock:
+            counts = self.phases[phase]
+            counts[0] += 1
+            counts[1] += seconds
+
+    def wrap(self, phase, fn):
+        """
+        Wrap a function so every call to it is recorded under a phase
+
+        :param str phase: Name of phase to record calls under
+        :param function fn: Function to time
+        :rtype: function
+        """
+        @functools.wraps(fn)
+        def profiled_fn(*args, **kwargs):
+            start = timeit.default_timer()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(phase, timeit.default_timer() - start)
+        return profiled_fn
+
+    def wrap_lazy_attribute(self, phase, lazy_attribute):
+        """
+        Record the import made by a `LazyAttribute` under a phase
+
+        :param str phase: Name of phase to record our import under
+        :param LazyAttribute lazy_attribute: Stand-in whose first load should be timed
+        """
+        load = lazy_attribute.load
+
+        @functools.wraps(load)
+        def profiled_load():
+            # DEV: Only our first load imports anything so we don't count the rest
+            if lazy_attribute.is_loaded():
+                return load()
+            start = timeit.default_timer()
+            target = load()
+            self.record(phase, timeit.default_timer() - start)
+            return target
+        lazy_attribute.load = profiled_load
+
+    def report(self):
+        """
+        Retrieve our phases as a dictionary
+
+        :rtype: dict
+        :return: `{'count': int, 'seconds': float}` for each phase
+        """
+        with self.lock:
+            return collections.OrderedDict(
+                (phase, {'count': count, 'seconds': seconds}) for phase, (count, seconds) in self.phases.items())
+
+    def format_report(self):
+        """
+        Format our phases for humans
+
+        :rtype: str
+        """
+        lines = ['httpretty_fixtures startup profile:']
+        for phase, counts in self.report().items():
+            lines.append('  {phase:<18} {count:>6} calls {ms:>10.2f}ms'.format(
+                phase=phase, count=counts['count'], ms=counts['seconds'] * 1e3))
+        return '\n'.join(lines) + '\n'
+
+    def export(self, destination):
+        """
+        Output our report to stderr or a JSON file
+
+        :param str destination: Path to write our report to as JSON, anything else prints it to stderr
+        """
+        if destination.lower().endswith('.json'):
+            with io.open(destination, 'w', encoding='utf-8') as report_file:
+                report = json.dumps(self.report(), indent=2)
+                report_file.write(u'{report}\n'.format(report=report))
+        else:
+            sys.stderr.write(self.format_report())
+
+
+def get_startup_profile():
+    """
+    Create our startup profile if it's been requested via `HTTPRETTY_FIXTURES_PROFILE`
+
+    Our report is output when our process exits.
+
+    :rtype: StartupProfile|None
+    """
+    destination = os.environ.get(PROFILE_ENV, '')
+    if destination in ('', '0'):
+        return None
+    profile = StartupProfile()
+    atexit.register(profile.export, destination)
+    return profile
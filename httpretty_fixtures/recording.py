@@ -0,0 +1,628 @@
+# Load in our dependencies
+import collections
+import hashlib
+import itertools
+import threading
+
+
+# Define our recording modes
+# DEV: `full` keeps every request object, `capture` keeps a `CapturedRequest` with a lazily read body,
+#   `summary` keeps a `RequestSummary`, `count` only keeps `request_count` (and `first_request`/`last_request`)
+RECORD_FULL = 'full'
+RECORD_CAPTURE = 'capture'
+RECORD_SUMMARY = 'summary'
+RECORD_COUNT = 'count'
+RECORD_MODES = (RECORD_FULL, RECORD_CAPTURE, RECORD_SUMMARY, RECORD_COUNT)
+# Size in bytes after which a `BodySpool` starts a new temporary file
+SPOOL_SEGMENT_SIZE = 64 * 1024 * 1024
+
+
+class RequestSummary(object):
+    """Compact record of a request (method, path, headers digest, body length)"""
+    __slots__ = ('method', 'path', 'headers_digest', 'body_length')
+
+    def __init__(self, method, path, headers_digest, body_length):
+        self.method = method
+        self.path = path
+        self.headers_digest = headers_digest
+        self.body_length = body_length
+
+    @classmethod
+    def from_request(cls, request):
+        """
+        Summarize an HTTPretty request
+
+        :param HTTPrettyRequest request: Request to summarize
+        :rtype: RequestSummary
+        """
+        return cls(
+            method=request.method,
+            path=request.path,
+            headers_digest=digest_headers(request.headers),
+            body_length=len(request.body or b''),
+        )
+
+    def __repr__(self):
+        return '<RequestSummary {method} {path} ({body_length} bytes)>'.format(
+            method=self.method, path=self.path, body_length=self.body_length)
+
+
+class BodySpool(object):
+    """
+    Temporary files which request bodies are appended to and read back from by offset
+
+    Bodies are appended onto our latest file until it reaches `segment_size`, then we start a new one.
+    Once every body in a file has been released (e.g. its capture was evicted via `record_limit`),
+    we truncate the file if it's our latest or close it otherwise so its disk space is reclaimed.
+
+    :param int segment_size: Size in bytes after which we start a new file
+    """
+    def __init__(self, segment_size=SPOOL_SEGMENT_SIZE):
+        # DEV: We share files between bodies rather than a file per body to keep our file descriptors low
+        self.segment_size = segment_size
+        self.file = None
+        self.size = 0
+        # DEV: Amount of unreleased bodies in each of our open files
+        self.live_counts = {}
+        self.closed = False
+        # DEV: We use an `RLock` since garbage collection can `release` a body while we hold our lock
+        self.lock = threading.RLock()
+
+    def write(self, body):
+        """
+        Append a body to our spool
+
+        :param bytes body: Body to save
+        :rtype: tuple
+        :return: `(file, offset)` of our body in our spool
+        """
+        with self.lock:
+            # If we were closed, complain and leave
+            if self.closed:
+                raise RuntimeError('Expected `BodySpool` to be open to spill a request body but it was closed')
+
+            # If we have no file or our latest one is full, then start a new one
+            # DEV: We import `tempfile` here since most runs never spill a body
+            #   Our previous file is closed by `release` once its last body is released
+            if self.file is None or (self.size and self.size + len(body) > self.segment_size):
+                import tempfile
+                self.file = tempfile.TemporaryFile()
+                self.size = 0
+                self.live_counts[self.file] = 0
+
+            # DEV: We count our body before writing it so a `release` during our write can't truncate our file
+            segment = self.file
+            self.live_counts[segment] += 1
+            offset = self.size
+            self.size += len(body)
+            segment.seek(offset)
+            segment.write(body)
+        return segment, offset
+
+    def read(self, segment, offset, length):
+        """
+        Read a body from our spool
+
+        :param file segment: File of body from `write`
+        :param int offset: Offset of body from `write`
+        :param int length: Length of body
+        :rtype: bytes
+        """
+        with self.lock:
+            if self.closed:
+                raise RuntimeError('Expected `BodySpool` to be open to read a spilled request body but it was '
+                                   'closed. Spilled bodies can only be read until their instance is stopped')
+            segment.seek(offset)
+            return segment.read(length)
+
+    def release(self, segment):
+        """
+        Mark a body as no longer needed and reclaim its file once all of its bodies are released
+
+        :param file segment: File of body from `write`
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.live_counts[segment] -= 1
+            if self.live_counts[segment]:
+                return
+            if segment is self.file:
+                segment.seek(0)
+                segment.truncate()
+                self.size = 0
+            else:
+                del self.live_counts[segment]
+                segment.close()
+
+    def close(self):
+        """Close and remove all of our files"""
+        with self.lock:
+            self.closed = True
+            for segment in self.live_counts:
+                segment.close()
+            self.live_counts.clear()
+            self.file = None
+            self.size = 0
+
+
+class CapturedRequest(object):
+    """
+    Record of a request which only reads and parses its body when it is accessed
+
+    Small bodies are kept as the same bytes HTTPretty received, larger bodies are spilled to a `BodySpool`.
+    Unlike `HTTPrettyRequest`, we don't keep a second copy of our body or its parsed form.
+    Spilled bodies are released from their spool when we are garbage collected.
+    """
+    __slots__ = ('method', 'path', 'headers', 'querystring', 'body_length', '_body', '_spool', '_segment', '_offset')
+
+    def __init__(self, method, path, headers, querystring, body, spool=None, spool_threshold=None):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.querystring = querystring
+        self.body_length = len(body)
+        self._spool = None
+        self._segment = None
+        self._offset = None
+        self._body = body
+
+        # If our body is too large, then spill it to our spool
+        if spool is not None and spool_threshold is not None and self.body_length > spool_threshold:
+            self._segment, self._offset = spool.write(body)
+            self._spool = spool
+            self._body = None
+
+    def __del__(self):
+        # If our body was spilled, then release it so our spool can reclaim its file
+        if self._spool is not None:
+            self._spool.release(self._segment)
+
+    @classmethod
+    def from_request(cls, request, spool=None, spool_threshold=None):
+        """
+        Capture an HTTPretty request
+
+        :param HTTPrettyRequest request: Request to capture
+        :param BodySpool spool: Spool to spill large bodies to
+        :param int spool_threshold: Size in bytes above which bodies are spilled to `spool`
+        :rtype: CapturedRequest
+        """
+        return cls(
+            method=request.method,
+            path=request.path,
+            headers=request.headers,
+            querystring=request.querystring,
+            body=request.body or b'',
+            spool=spool,
+            spool_threshold=spool_threshold,
+        )
+
+    @property
+    def body(self):
+        """Body of our request as bytes, read from our spool if it was spilled"""
+        if self._spool is not None:
+            return self._spool.read(self._segment, self._offset, self.body_length)
+        return self._body
+
+    def unspooled(self):
+        """
+        Retrieve a copy of our request which keeps its body in memory (e.g. to outlive our spool)
+
+        :rtype: CapturedRequest
+        :return: Our request itself if our body wasn't spilled
+        """
+        if self._spool is None:
+            return self
+        return type(self)(method=self.method, path=self.path, headers=self.headers,
+                          querystring=self.querystring, body=self.body)
+
+    @property
+    def parsed_body(self):
+        """Body of our request parsed as JSON or a form (based on its `Content-Type`) like `HTTPrettyRequest`"""
+        # DEV: We reuse HTTPretty's parsing so `parsed_body` is the same as with `RECORD_FULL`
+        #   We retrieve the plain function so Python 2 doesn't require an `HTTPrettyRequest` as `self`
+        #   We import HTTPretty here so importing `httpretty_fixtures` doesn't load its internals
+        from httpretty.core import HTTPrettyRequest
+        return HTTPrettyRequest.__dict__['parse_request_body'](self, self.body)
+
+    def parse_querystring(self, qs):
+        from httpretty.core import HTTPrettyRequest
+        return HTTPrettyRequest.__dict__['parse_querystring'](self, qs)
+
+    def __repr__(self):
+        return '<CapturedRequest {method} {path} ({body_length} bytes)>'.format(
+            method=self.method, path=self.path, body_length=self.body_length)
+
+
+def digest_headers(headers):
+    """
+    Generate a stable digest for a set of headers
+
+    :param object headers: Mapping-like headers (e.g. `mimetools.Message`, `dict`)
+    :rtype: str
+    :return: Hex digest of headers that is independent of header order/casing
+    """
+    # DEV: Header names are case insensitive so we normalize them before digesting
+    lines = sorted('{key}: {value}'.format(key=key.lower(), value=value)
+                   for key, value in headers.items())
+    return hashlib.sha1('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+def generate_request_store(record_limit=None):
+    """
+    Create a container for recorded requests
+
+    :param int record_limit: Maximum amount of requests to keep (e.g. `None` for unlimited)
+    :rtype: list|collections.deque
+    :return: `list` when unlimited, otherwise a ring buffer of the last `record_limit` requests
+    """
+    if record_limit is None:
+        return []
+    return collections.deque(maxlen=record_limit)
+
+
+def get_latest_requests_limit(record_mode, record_limit=None):
+    """
+    Retrieve how many requests HTTPretty should keep in its global `latest_requests` for a recording setup
+
+    :param str record_mode: Recording mode (e.g. `RECORD_FULL`)
+    :param int record_limit: Maximum amount of requests each fixture keeps (e.g. `None` for unlimited)
+    :rtype: int|None
+    :return: Maximum amount of requests or `None` to leave HTTPretty unbounded
+    """
+    # DEV: Compact modes exist so full requests aren't kept around, so HTTPretty only keeps its latest one
+    if record_mode != RECORD_FULL:
+        return 1
+    return record_limit
+
+
+class SentData(list):
+    """
+    Stand-in for HTTPretty's `fakesock.socket._sent_data` which drops data sent before the latest request line
+
+    HTTPretty appends everything sent through any of its sockets onto this single class-level list and never
+    clears it, so it holds onto every request body. HTTPretty only reads the latest request line and the data
+    after it (via `last_requestline` and `[-1]`) so dropping the rest doesn't change its behavior.
+    """
+    def append(self, data):
+        # If our data starts a new request, then drop everything before it
+        # DEV: This mirrors how `fakesock.socket.sendall` detects request lines. We only split the start of our
+        #   data since request lines are short and bodies can be large.
+        from httpretty.http import parse_requestline
+        from httpretty.utils import decode_utf8
+        try:
+            parse_requestline(decode_utf8(data[:8192].split(b'\r\n', 1)[0]))
+        except ValueError:
+            pass
+        else:
+            del self[:]
+        list.append(self, data)
+
+
+class RequestHistory(collections.deque):
+    """Stand-in for HTTPretty's global `latest_requests` which counts the requests appended onto it"""
+    def __init__(self, requests=(), maxlen=None):
+        super(RequestHistory, self).__init__(requests, maxlen)
+        self.appended_count = 0
+
+    def append(self, request):
+        self.appended_count += 1
+        super(RequestHistory, self).append(request)
+
+
+def bound_latest_requests(httpretty, maxlen):
+    """
+    Replace HTTPretty's global `latest_requests` with one that keeps its last `maxlen` requests
+
+    HTTPretty appends every request it receives onto `latest_requests` so it grows forever otherwise.
+    When we are bounded, we also replace the list of data sent through its sockets with a `SentData`.
+
+    :param type httpretty: HTTPretty's class (i.e. `httpretty.HTTPretty`)
+    :param int|None maxlen: Maximum amount of requests to keep, `None` keeps every request
+    :rtype: tuple|None
+    :return: State to pass to `restore_latest_requests` or `None` if we didn't change anything
+    """
+    # If HTTPretty's history is already bounded the same way, then leave
+    latest_requests = httpretty.latest_requests
+    if getattr(latest_requests, 'maxlen', None) == maxlen:
+        return None
+
+    # Replace our history
+    # DEV: HTTPretty only appends and replaces `latest_requests[-1]` which a deque supports
+    bounded_requests = httpretty.latest_requests = RequestHistory(latest_requests, maxlen=maxlen)
+
+    # If we are bounded and HTTPretty's sockets are keeping everything sent through them, then stop them
+    # DEV: This is shared by every socket and never cleared by HTTPretty
+    from httpretty.core import fakesock
+    sent_data = None
+    if maxlen is not None and not isinstance(fakesock.socket._sent_data, SentData):
+        sent_data = fakesock.socket._sent_data
+        fakesock.socket._sent_data = SentData()
+    return (bounded_requests, latest_requests, sent_data)
+
+
+def reset_latest_requests(httpretty):
+    """
+    Clear HTTPretty's history of requests without removing its registered URIs (unlike `HTTPretty.reset()`)
+
+    :param type httpretty: HTTPretty's class (i.e. `httpretty.HTTPretty`)
+    """
+    from httpretty.core import HTTPrettyRequestEmpty
+    httpretty.latest_requests = []
+    httpretty.last_request = HTTPrettyRequestEmpty()
+
+
+def restore_latest_requests(httpretty, state):
+    """
+    Undo `bound_latest_requests`, carrying over the requests we kept in the meantime
+
+    :param type httpretty: HTTPretty's class (i.e. `httpretty.HTTPretty`)
+    :param tuple state: State returned by `bound_latest_requests`
+    """
+    # If our history is still in place, then restore the one we replaced with our new requests added onto it
+    # DEV: If it was replaced since (e.g. `HTTPretty.reset()`), then we leave the new one alone
+    bounded_requests, latest_requests, sent_data = state
+    if httpretty.latest_requests is bounded_requests:
+        new_start = max(len(bounded_requests) - bounded_requests.appended_count, 0)
+        latest_requests.extend(itertools.islice(bounded_requests, new_start, None))
+        httpretty.latest_requests = latest_requests
+
+    # If we replaced HTTPretty's sent data, then restore it
+    if sent_data is not None:
+        from httpretty.core import fakesock
+        fakesock.socket._sent_data = sent_data
+
+
+def generate_request_recorder(record_mode, spool_threshold=None):
+    """
+    Retrieve the function that converts a request into its recorded form
+
+    :param str record_mode: Recording mode (e.g. `RECORD_FULL`)
+    :param int spool_threshold: Size in bytes above which `RECORD_CAPTURE` spills bodies to a temporary file
+    :rtype: function|None
+    :return: Function to convert a request or `None` if requests shouldn't be recorded
+    """
+    # If our mode is unknown, complain and leave
+    if record_mode not in RECORD_MODES:
+        raise RuntimeError('Expected `record_mode` to be one of {modes} but it was "{record_mode}"'
+                           .format(modes=', '.join(RECORD_MODES), record_mode=record_mode))
+
+    if record_mode == RECORD_FULL:
+        return lambda request: request
+    elif record_mode == RECORD_CAPTURE:
+        # DEV: Each recorder gets its own spool so it's closed along with its fixture (via `recorder.spool`)
+        spool = BodySpool()
+
+        def recorder(request):
+            return CapturedRequest.from_request(request, spool=spool, spool_threshold=spool_threshold)
+        recorder.spool = spool
+        return recorder
+    elif record_mode == RECORD_SUMMARY:
+        return RequestSummary.from_request
+    return None
+
+
+class RingList(object):
+    """
+    List which drops items from its front in amortized constant time and keeps constant time indexing
+
+    Unlike `collections.deque`, looking up an item in the middle doesn't walk our items.
+
+    :param iterable items: Items to start with
+    """
+    __slots__ = ('items', 'head')
+
+    def __init__(self, items=()):
+        # DEV: `items[:head]` are dropped items which we remove in batches
+        self.items = list(items)
+        self.head = 0
+
+    def __len__(self):
+        return len(self.items) - self.head
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('RingList index out of range')
+        return self.items[self.head + index]
+
+    def __iter__(self):
+        return itertools.islice(self.items, self.head, None)
+
+    def append(self, item):
+        self.items.append(item)
+
+    def popleft(self):
+        """
+        Remove and return our first item
+
+        :rtype: object
+        """
+        item = self.items[self.head]
+        self.items[self.head] = None
+        self.head += 1
+
+        # If at least half of our list is dropped items, then remove them
+        # DEV: This is linear but only happens once per `len(self)` drops so it's constant time on average
+        if self.head * 2 >= len(self.items):
+            del self.items[:self.head]
+            self.head = 0
+        return item
+
+
+class RequestLog(object):
+    """
+    Queryable log of recorded requests across the fixtures of a `FixtureManager` instance
+
+    Requests are indexed by method, path (without query string), and fixture name as they are recorded.
+    Queries start from the smallest matching index so they don't scan unrelated requests.
+
+    :param int maxlen: Maximum amount of requests to keep (e.g. `None` for unlimited)
+    """
+    def __init__(self, maxlen=None):
+        self.maxlen = maxlen
+        # DEV: `entries[0]` has the sequence number `offset`, indexes hold sequence numbers in ascending order
+        #   We only need a `RingList` when we evict requests, otherwise a list gives us constant time lookups
+        self.entries = RingList() if maxlen is not None else []
+        self.offset = 0
+        self.indexes = {'method': {}, 'path': {}, 'fixture': {}}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter([request for fixture, request in list(self.entries)])
+
+    def copy(self, convert=None):
+        """
+        Create an independent copy of our log (e.g. for `FixtureManager.snapshot()`)
+
+        Our recorded requests are shared, only our containers are copied.
+
+        :param function convert: Optional function to replace each recorded request in our copy
+            (e.g. `CapturedRequest.unspooled`)
+        :rtype: RequestLog
+        """
+        with self.lock:
+            request_log = RequestLog(self.maxlen)
+            entries = self.entries
+            if convert is not None:
+                entries = [(fixture, convert(request)) for fixture, request in entries]
+            request_log.entries = type(self.entries)(entries)
+            request_log.offset = self.offset
+            for name, index in self.indexes.items():
+                request_log.indexes[name] = dict(
+                    (value, type(positions)(positions)) for value, positions in index.items())
+        return request_log
+
+    def append(self, fixture, request):
+        """
+        Record a request
+
+        :param str fixture: Name of fixture which received our request
+        :param object request: Recorded request (e.g. `HTTPrettyRequest`, `RequestSummary`)
+        """
+        with self.lock:
+            sequence = self.offset + len(self.entries)
+            self.entries.append((fixture, request))
+            for name, value in self.get_index_values(fixture, request):
+                index = self.indexes[name]
+                positions = index.get(value)
+                if positions is None:
+                    positions = index[value] = RingList() if self.maxlen is not None else []
+                positions.append(sequence)
+
+            # If we are over our limit, then evict our oldest request from each of its indexes
+            # DEV: Our oldest request is always at the front of its index entries
+            if self.maxlen is not None and len(self.entries) > self.maxlen:
+                fixture, request = self.entries.popleft()
+                for name, value in self.get_index_values(fixture, request):
+                    index = self.indexes[name]
+                    positions = index[value]
+                    positions.popleft()
+                    if not positions:
+                        del index[value]
+                self.offset += 1
+
+    @staticmethod
+    def get_index_values(fixture, request):
+        """Retrieve the values a request is indexed under"""
+        return (
+            ('method', request.method),
+            ('path', request.path.split('?', 1)[0]),
+            ('fixture', fixture),
+        )
+
+    def get_candidates(self, method, path, fixture):
+        """
+        Retrieve the sequence numbers of our smallest index for a set of criteria
+
+        :rtype: list|RingList|None
+        :return: Sequence numbers from our smallest matching index or `None` if no index criteria were given
+        """
+        # DEV: This must be called with our lock held
+        criteria = [(name, value) for name, value in (('method', method), ('path', path), ('fixture', fixture))
+                    if value is not None]
+        if not criteria:
+            return None
+        return min((self.indexes[name].get(value, ()) for name, value in criteria), key=len)
+
+    @staticmethod
+    def matches(entry, method, path, fixture, headers):
+        """Determine if an entry matches a set of criteria"""
+        entry_fixture, request = entry
+        return ((method is None or request.method == method) and
+                (fixture is None or entry_fixture == fixture) and
+                (path is None or request.path.split('?', 1)[0] == path) and
+                (headers is None or matches_headers(request, headers)))
+
+    def filter(self, method=None, path=None, fixture=None, headers=None):
+        """
+        Retrieve requests matching a set of criteria, oldest first
+
+        :param str method: HTTP method to match (e.g. `POST`)
+        :param str path: Path to match without its query string (e.g. `/orders`)
+        :param str fixture: Name of fixture to match (e.g. `es_index`)
+        :param dict headers: Headers and their values to match (e.g. `{'X-Request-Id': 'abc'}`)
+        :rtype: list
+        """
+        # Only look at the entries in our smallest index
+        with self.lock:
+            candidates = self.get_candidates(method, path, fixture)
+            if candidates is None:
+                entries = list(self.entries)
+            else:
+                entries = [self.entries[sequence - self.offset] for sequence in candidates]
+        return [entry[1] for entry in entries if self.matches(entry, method, path, fixture, headers)]
+
+    def count(self, method=None, path=None, fixture=None, headers=None):
+        """
+        Count requests matching a set of criteria (see `filter`)
+
+        :rtype: int
+        """
+        # If we are only matching a single index (or nothing), then use its length
+        with self.lock:
+            candidates = self.get_candidates(method, path, fixture)
+            criteria_count = sum(1 for value in (method, path, fixture, headers) if value is not None)
+            if criteria_count == 0:
+                return len(self.entries)
+            if candidates is not None and criteria_count == 1:
+                return len(candidates)
+        return len(self.filter(method=method, path=path, fixture=fixture, headers=headers))
+
+    def last_matching(self, method=None, path=None, fixture=None, headers=None):
+        """
+        Retrieve the newest request matching a set of criteria (see `filter`)
+
+        :return: Matching request or `None` if there is none
+        """
+        # Walk backwards from the newest entry in our smallest index
+        # DEV: Our indexes and entries have constant time lookups so the newest match is found without a copy
+        with self.lock:
+            candidates = self.get_candidates(method, path, fixture)
+            if candidates is None:
+                candidates = range(self.offset, self.offset + len(self.entries))
+            for i in range(len(candidates) - 1, -1, -1):
+                entry = self.entries[candidates[i] - self.offset]
+                if self.matches(entry, method, path, fixture, headers):
+                    return entry[1]
+        return None
+
+
+def matches_headers(request, headers):
+    """
+    Determine if a request has a set of headers
+
+    :param object request: Recorded request (e.g. `HTTPrettyRequest`)
+    :param dict headers: Headers and their values to match, names are case insensitive
+    :rtype: bool
+    """
+    # DEV: Summaries only keep a digest of their headers so they can't be matched
+    request_headers = getattr(request, 'headers', None)
+    if request_headers is None:
+        return False
+    return all(request_headers.get(key) == value for key, value in headers.items())
@@ -0,0 +1,181 @@
+# Load in our dependencies
+import threading
+
+
+class Outcome(object):
+    """Response and state transition for a call to a fixture in a scenario"""
+    __slots__ = ('response', 'then')
+
+    def __init__(self, response, then):
+        # DEV: `response` is `None` when our fixture function should respond
+        self.response = response
+        self.then = then
+
+
+class Rule(object):
+    """Outcomes for calls to a fixture in a given state, compiled from a `Scenario`"""
+    __slots__ = ('calls', 'default')
+
+    def __init__(self):
+        # DEV: `calls` maps a call number (1-indexed) to an `Outcome`, `default` is used for every other call
+        self.calls = {}
+        self.default = None
+
+
+def normalize_response(response):
+    """
+    Convert a scenario response into a `(status, headers, body)` tuple
+
+    :param tuple|int|None response: `(status, headers, body)`, `(status, body)`, a status code, or `None`
+    :rtype: tuple|None
+    """
+    if response is None:
+        return None
+    if isinstance(response, int):
+        return (response, {}, '')
+    if len(response) == 2:
+        return (response[0], {}, response[1])
+    if len(response) == 3:
+        return (response[0], response[1] or {}, response[2])
+    raise RuntimeError('Expected scenario response to be a status code, `(status, body)`, or '
+                       '`(status, headers, body)` but it was {response!r}'.format(response=response))
+
+
+class Scenario(object):
+    """
+    Declarative set of responses and state transitions across a `FixtureManager`'s fixtures
+
+    Every method returns our scenario so calls can be chained. Responses can be a status code,
+    `(status, body)`, `(status, headers, body)`, or `None` to respond via the fixture function itself.
+
+    :param str initial: State our scenario starts in
+    """
+    def __init__(self, initial='initial'):
+        self.initial = initial
+        self.rules = {}
+        self.fixtures = set()
+        self.table = None
+
+    def get_rule(self, fixture, state):
+        # DEV: Any change invalidates our compiled table
+        self.table = None
+        key = (state, fixture)
+        rule = self.rules.get(key)
+        if rule is None:
+            rule = self.rules[key] = Rule()
+            self.fixtures.add(fixture)
+        return rule
+
+    def on(self, fixture, response=None, state=None, then=None):
+        """
+        Respond to every call of a fixture (that isn't matched by `nth`/`sequence`)
+
+        :param str fixture: Name of fixture
+        :param tuple response: Response to send, `None` responds via the fixture function
+        :param str state: State this applies in, `None` applies in every state without its own rule
+        :param str then: State to transition to after responding
+        :rtype: Scenario
+        """
+        self.get_rule(fixture, state).default = Outcome(normalize_response(response), then)
+        return self
+
+    def nth(self, fixture, n, response=None, state=None, then=None):
+        """
+        Respond to the `n`th call of a fixture (1-indexed)
+
+        Calls are counted per fixture and per state for rules with a `state`.
+
+        :param str fixture: Name of fixture
+        :param int n: Call to respond to (e.g. `3` for the third call)
+        :param tuple response: Response to send, `None` responds via the fixture function
+        :param str state: State this applies in, `None` applies in every state without its own rule
+        :param str then: State to transition to after responding
+        :rtype: Scenario
+        """
+        self.get_rule(fixture, state).calls[n] = Outcome(normalize_response(response), then)
+        return self
+
+    def sequence(self, fixture, responses, state=None, then=None):
+        """
+        Respond to successive calls of a fixture with a sequence of responses
+
+        :param str fixture: Name of fixture
+        :param list responses: Responses for the first `len(responses)` calls
+        :param str state: State this applies in, `None` applies in every state without its own rule
+        :param str then: State to transition to after responding with our last response
+        :rtype: Scenario
+        """
+        for i, response in enumerate(responses):
+            self.nth(fixture, i + 1, response, state=state, then=then if i == len(responses) - 1 else None)
+        return self
+
+    def compile(self):
+        """
+        Compile our rules into a transition table
+
+        :rtype: dict
+        :return: `Rule` instances keyed by `(state, fixture)` where `state` is `None` for rules in every state
+        """
+        # DEV: We copy our rules so changes to our scenario don't leak into running instances
+        if self.table is None:
+            table = {}
+            for key, rule in self.rules.items():
+                compiled_rule = table[key] = Rule()
+                compiled_rule.calls = dict(rule.calls)
+                compiled_rule.default = rule.default
+            self.table = table
+        return self.table
+
+
+class ScenarioState(object):
+    """
+    Running state of a `Scenario` for a `FixtureManager` instance
+
+    :param Scenario scenario: Scenario to run
+    """
+    def __init__(self, scenario):
+        self.table = scenario.compile()
+        self.state = scenario.initial
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def copy(self):
+        """
+        Create an independent copy of our state and call counts
+
+        :rtype: ScenarioState
+        """
+        with self.lock:
+            scenario_state = ScenarioState.__new__(ScenarioState)
+            scenario_state.table = self.table
+            scenario_state.state = self.state
+            scenario_state.counts = dict(self.counts)
+        scenario_state.lock = threading.Lock()
+        return scenario_state
+
+    def advance(self, fixture):
+        """
+        Count a call to a fixture and resolve its response, transitioning our state if need be
+
+        :param str fixture: Name of fixture being called
+        :rtype: tuple|None
+        :return: `(status, headers, body)` to respond with or `None` to respond via the fixture function
+        """
+        # DEV: Each step is a constant amount of dictionary lookups
+        with self.lock:
+            key = (self.state, fixture)
+            rule = self.table.get(key)
+            if rule is None:
+                key = (None, fixture)
+                rule = self.table.get(key)
+                if rule is None:
+                    return None
+
+            # Count our call and find our outcome
+            n = self.counts[key] = self.counts.get(key, 0) + 1
+            outcome = rule.calls.get(n, rule.default)
+            if outcome is None:
+                return None
+            if outcome.then is not None:
+                self.state = outcome.then
+            return outcome.response
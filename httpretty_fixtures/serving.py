@@ -0,0 +1,209 @@
+# Load in our dependencies
+import threading
+
+from httpretty import HTTPretty
+from httpretty.core import HTTPrettyRequest, URIInfo
+from httpretty.utils import utf8
+
+from .dispatch import IndexedDispatcher
+from .faults import InjectedConnectionReset
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlsplit, urlunsplit
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlsplit, urlunsplit
+
+
+# Define our constants
+# DEV: These headers are written by our server itself rather than copied from our fixture's response
+UNFORWARDED_HEADERS = frozenset(['status', 'content-length', 'connection', 'date', 'server'])
+
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    """Request handler which responds to every method via our server's fixtures"""
+    # DEV: HTTP/1.1 keeps connections alive between requests unless a client asks otherwise
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.fixture_server.count_connection()
+
+    def __getattr__(self, name):
+        # DEV: `BaseHTTPRequestHandler` looks up `do_{method}` so we handle every method the same way
+        if name.startswith('do_'):
+            return self.do_fixture
+        raise AttributeError(name)
+
+    def do_fixture(self):
+        # Read our request body
+        body = b''
+        content_length = self.headers.get('content-length')
+        if content_length:
+            body = self.rfile.read(int(content_length))
+        elif self.headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = self.read_chunked_body()
+
+        # Respond via our fixtures
+        # DEV: When a fault policy resets our connection, we close it without a response like HTTPretty
+        try:
+            status, headers, body = self.server.fixture_server.respond(
+                self.command, self.path, self.request_version, str(self.headers), body)
+        except InjectedConnectionReset:
+            self.close_connection = True
+            return
+        self.send_response(status)
+        for key, value in headers.items():
+            if key.lower() not in UNFORWARDED_HEADERS:
+                self.send_header(key, value)
+        # DEV: Fixtures can close their connection (e.g. to end a truncated chunked body)
+        if headers.get('connection', '').lower() == 'close':
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        # DEV: Chunked bodies are already framed by our fixture so their length is implied
+        if headers.get('transfer-encoding', '').lower() != 'chunked':
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_chunked_body(self):
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b';', 1)[0], 16)
+            if size == 0:
+                # DEV: Consume our trailers and final blank line
+                while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingFixtureHTTPServer(ThreadingMixIn, HTTPServer):
+    """HTTP server which handles each connection on its own thread"""
+    daemon_threads = True
+    # DEV: We raise our backlog so load tests can open many connections at once
+    request_queue_size = 128
+
+
+class FixtureServer(object):
+    """
+    Real HTTP server which serves a running instance's fixtures (e.g. for subprocesses and other workers)
+
+    :param FixtureManager manager: Instance of our `FixtureManager` to serve fixtures from
+    :param list fixtures: Names of fixtures to serve
+    :param str host: Host to listen on
+    :param int port: Port to listen on, `0` picks a free port
+    :param str origin: Base URL to resolve requests with relative paths against (e.g. `http://localhost:9000`)
+        When `None`, requests are resolved against their `Host` header.
+        Requests with absolute URIs (e.g. via `HTTP_PROXY`) are always matched as is.
+    """
+    def __init__(self, manager, fixtures, host='127.0.0.1', port=0, origin=None):
+        # If HTTPretty is enabled, complain and leave
+        # DEV: HTTPretty replaces `socket.socket` which would intercept our own server's connections
+        if HTTPretty.is_enabled():
+            raise RuntimeError('Expected HTTPretty to be disabled when starting a `FixtureServer` but it was not. '
+                               'Please `.stop()` any running `FixtureManager` first')
+
+        # Bind each of our fixtures onto our dispatcher
+        self.manager = manager
+        self.origin = origin.rstrip('/') if origin else None
+        self.dispatcher = IndexedDispatcher()
+        for fixture_key in fixtures:
+            plan, saving_fixture = manager.bind_fixture(fixture_key)
+            if plan.indexed_args is None:
+                raise RuntimeError('Expected fixture "{fixture}" to be registered with a method and URI '
+                                   'to be served but it was not (e.g. it uses `responses`)'.format(fixture=fixture_key))
+            method, uri, kwargs = plan.indexed_args
+            self.dispatcher.add_route(method, uri, body=saving_fixture, **kwargs)
+
+        # Create our server
+        self.connection_count = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingFixtureHTTPServer((host, port), FixtureRequestHandler)
+        self.httpd.fixture_server = self
+        self.thread = None
+
+    @property
+    def url(self):
+        """Base URL of our server (e.g. `http://127.0.0.1:53124`)"""
+        host, port = self.httpd.server_address[:2]
+        return 'http://{host}:{port}'.format(host=host, port=port)
+
+    def count_connection(self):
+        """Count a new connection to our server"""
+        with self.lock:
+            self.connection_count += 1
+
+    def respond(self, method, path, version, raw_headers, body):
+        """
+        Run the fixture for a request
+
+        :param str method: HTTP method of request (e.g. `GET`)
+        :param str path: Path from request line, either relative (e.g. `/hello`) or absolute (`http://...`)
+        :param str version: HTTP version from request line (e.g. `HTTP/1.1`)
+        :param str raw_headers: Headers of request
+        :param bytes body: Body of request
+        :rtype: tuple
+        :return: `(status, headers, body)` with `body` as bytes
+        """
+        # Resolve our relative path and parse our request
+        # DEV: Fixtures receive a relative `request.path` like they do via HTTPretty
+        uri = None
+        if path.startswith(('http://', 'https://')):
+            uri = path
+            parts = urlsplit(uri)
+            path = urlunsplit(('', '', parts.path or '/', parts.query, ''))
+        request = HTTPrettyRequest('{method} {path} {version}\r\n{headers}'.format(
+            method=method, path=path, version=version, headers=raw_headers), body)
+
+        # Resolve our full URI and find our fixture
+        if uri is None:
+            origin = self.origin or 'http://{host}'.format(host=request.headers.get('host', ''))
+            uri = origin + path
+        info = URIInfo.from_uri(uri, None)
+        route = self.dispatcher.lookup(method, info)
+        if route is None:
+            return (404, {'content-type': 'text/plain; charset=utf-8'},
+                    utf8('No fixture is being served for {method} {uri}'.format(method=method, uri=uri)))
+
+        # Run our fixture with the same default headers as HTTPretty
+        entry = route.entry
+        res_headers = {'status': entry.status, 'content-type': 'text/plain; charset=utf-8'}
+        if entry.forcing_headers:
+            res_headers = entry.normalize_headers(entry.forcing_headers)
+        if entry.adding_headers:
+            res_headers.update(entry.normalize_headers(entry.adding_headers))
+        status, res_headers, res_body = entry.callable_body(request, info.full_url(), res_headers)
+        return (status, res_headers, utf8(res_body or b''))
+
+    def start(self):
+        """
+        Start serving requests on a background thread
+
+        :rtype: FixtureServer
+        """
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='httpretty-fixtures-server')
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving requests and close our socket"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,146 @@
+# Load in our dependencies
+import copy
+
+from .recording import CapturedRequest
+
+# Define our constants
+# DEV: Values of these types can't be mutated so restored instances share them with our snapshot
+try:
+    IMMUTABLE_TYPES = (type(None), bool, int, long, float, complex, str, unicode, frozenset)  # noqa: F821
+except NameError:
+    IMMUTABLE_TYPES = (type(None), bool, int, float, complex, str, bytes, frozenset)
+# Attributes on each saving fixture that we restore as-is
+RECORDING_ATTRIBUTES = ('first_request', 'last_request', 'request_count', 'streamed_bytes', 'delayed_seconds')
+# Prefix for attributes `httpretty_fixtures` saves on each instance (e.g. `_httpretty_fixtures_keys`)
+INTERNAL_PREFIX = '_httpretty_fixtures_'
+
+
+def is_immutable(value):
+    """
+    Determine if a value can be shared between instances without being copied
+
+    :param object value: Value to check
+    :rtype: bool
+    """
+    if isinstance(value, tuple):
+        return all(is_immutable(item) for item in value)
+    return isinstance(value, IMMUTABLE_TYPES)
+
+
+class FixtureSnapshot(object):
+    """
+    Frozen state and recordings of a started `FixtureManager` instance (see `FixtureManager.snapshot()`)
+
+    Restoring a snapshot shares everything immutable. Mutable state (e.g. `self.users = []`) is deep copied
+    on its first access from each restored instance so tests only pay for the state they touch.
+
+    :param FixtureManager manager: Started instance to capture
+    """
+    def __init__(self, manager):
+        self.manager_cls = type(manager)
+        self.fixtures = tuple(manager.__dict__.get(INTERNAL_PREFIX + 'keys', []))
+
+        # Freeze our instance's own state
+        # DEV: We copy mutable values now so later changes to `manager` don't leak into our snapshot
+        self.state = {}
+        for name, value in manager.__dict__.items():
+            if name.startswith(INTERNAL_PREFIX) or name in self.fixtures:
+                continue
+            if is_immutable(value):
+                self.state[name] = value
+                continue
+            try:
+                self.state[name] = copy.deepcopy(value)
+            except (TypeError, copy.Error) as err:
+                raise RuntimeError('Expected attribute "{name}" on {cls} to be copyable via `copy.deepcopy` to '
+                                   'snapshot it but it was not: {err}'
+                                   .format(name=name, cls=self.manager_cls.__name__, err=err))
+
+        # Save the recordings of each fixture
+        # DEV: Recorded requests aren't mutated after they are saved so we share them rather than copying them
+        #   The exception is captures with spilled bodies since their spool is closed when `manager` stops.
+        #   We read those into memory once each, reusing them across our fixtures and request log.
+        unspooled_requests = {}
+
+        def unspool(request):
+            if not isinstance(request, CapturedRequest):
+                return request
+            unspooled_request = unspooled_requests.get(id(request))
+            if unspooled_request is None:
+                unspooled_request = unspooled_requests[id(request)] = request.unspooled()
+            return unspooled_request
+
+        self.recordings = {}
+        for fixture_key in self.fixtures:
+            fixture = getattr(manager, fixture_key)
+            with fixture.lock:
+                attributes = dict((name, unspool(getattr(fixture, name))) for name in RECORDING_ATTRIBUTES)
+                requests = tuple(unspool(request) for request in fixture.requests)
+            faults = getattr(fixture, 'faults', None)
+            if faults is not None:
+                with faults.lock:
+                    faults = (faults.position, dict(faults.counts))
+            negotiation = getattr(fixture, 'negotiation', None)
+            if negotiation is not None:
+                with negotiation.lock:
+                    negotiation = (dict(negotiation.counts), negotiation.body_bytes, negotiation.sent_bytes)
+            self.recordings[fixture_key] = (attributes, requests, faults, negotiation)
+
+        # Copy our request log, scenario state, and response cache
+        # DEV: We read `__dict__` directly so we don't create any of these when they weren't used
+        self.request_log = manager.request_log.copy(convert=unspool)
+        scenario_state = manager.__dict__.get(INTERNAL_PREFIX + 'scenario_state')
+        self.scenario_state = scenario_state.copy() if scenario_state is not None else None
+        cache = manager.__dict__.get(INTERNAL_PREFIX + 'cache')
+        self.cache = cache.copy() if cache is not None else None
+
+    def restore(self, manager):
+        """
+        Copy our state onto a new instance before its fixtures are started
+
+        :param FixtureManager manager: Instance to restore onto
+        """
+        # If our instance isn't from our class, complain and leave
+        if not isinstance(manager, self.manager_cls):
+            raise RuntimeError('Expected snapshot of {snapshot_cls} to be restored onto a {snapshot_cls} '
+                               'but it was restored onto a {cls}'.format(
+                                   snapshot_cls=self.manager_cls.__name__, cls=type(manager).__name__))
+
+        # Restore our immutable state and defer copying the rest until it's accessed
+        # DEV: Values that shadow class attributes would never reach `__getattr__` so we copy them now
+        pending_state = {}
+        for name, value in self.state.items():
+            if is_immutable(value):
+                manager.__dict__[name] = value
+            elif hasattr(type(manager), name):
+                manager.__dict__[name] = copy.deepcopy(value)
+            else:
+                manager.__dict__.pop(name, None)
+                pending_state[name] = value
+        manager.__dict__[INTERNAL_PREFIX + 'pending_state'] = pending_state
+
+        # Restore our shared containers
+        # DEV: We copy these again so our snapshot can be restored any amount of times
+        manager.__dict__[INTERNAL_PREFIX + 'request_log'] = self.request_log.copy()
+        if self.scenario_state is not None:
+            manager.__dict__[INTERNAL_PREFIX + 'scenario_state'] = self.scenario_state.copy()
+        if self.cache is not None:
+            manager.__dict__[INTERNAL_PREFIX + 'cache'] = self.cache.copy()
+
+    def restore_fixture(self, fixture_key, fixture):
+        """
+        Copy a fixture's recordings onto its new saving fixture
+
+        :param str fixture_key: Name of fixture being restored
+        :param function fixture: Saving fixture generated for our new instance
+        """
+        attributes, requests, faults, negotiation = self.recordings[fixture_key]
+        for name, value in attributes.items():
+            setattr(fixture, name, value)
+        fixture.requests.extend(requests)
+        if faults is not None:
+            fixture.faults.position, counts = faults
+            fixture.faults.counts = dict(counts)
+        if negotiation is not None:
+            counts, fixture.negotiation.body_bytes, fixture.negotiation.sent_bytes = negotiation
+            fixture.negotiation.counts = dict(counts)
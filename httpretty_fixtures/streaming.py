@@ -0,0 +1,74 @@
+# Load in our dependencies
+import io
+
+# Define our constants
+# DEV: `type(u'')` is `unicode` in Python 2 and `str` in Python 3
+TEXT_TYPE = type(u'')
+MATERIALIZED_TYPES = (bytes, bytearray, TEXT_TYPE)
+
+
+def is_streamed_body(body):
+    """
+    Determine if a fixture's body should be streamed (e.g. a generator or file-like object)
+
+    :param object body: Body returned by a fixture
+    :rtype: bool
+    """
+    if isinstance(body, MATERIALIZED_TYPES):
+        return False
+    return hasattr(body, 'read') or hasattr(body, '__iter__')
+
+
+def iter_body_chunks(body, chunk_size):
+    """
+    Iterate over a streamed body as byte chunks
+
+    :param object body: Generator/iterable of chunks or file-like object
+    :param int chunk_size: Size of chunks to read from file-like objects
+    :rtype: generator
+    """
+    try:
+        # If we have a file-like object, then read it in chunks
+        if hasattr(body, 'read'):
+            while True:
+                chunk = body.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk.encode('utf-8') if isinstance(chunk, TEXT_TYPE) else chunk
+        # Otherwise, iterate over it
+        else:
+            for chunk in body:
+                if chunk:
+                    yield chunk.encode('utf-8') if isinstance(chunk, TEXT_TYPE) else chunk
+    # Always clean up our body (e.g. close files and generators)
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+
+def read_streamed_body(body, chunk_size, chunked=False):
+    """
+    Consume a streamed body into the bytes HTTPretty will send
+
+    :param object body: Generator/iterable of chunks or file-like object
+    :param int chunk_size: Size of chunks to read from file-like objects
+    :param bool chunked: Whether to frame our body with `Transfer-Encoding: chunked`
+    :rtype: tuple
+    :return: `(body, byte_count)` where `byte_count` is the amount of payload bytes (without chunk framing)
+    """
+    # DEV: We consume chunks one at a time into a single buffer so we never hold a list of chunks
+    #   HTTPretty writes our response into an in-memory socket buffer so it can't be streamed any further
+    #   We use `BytesIO` since `getvalue()` hands over its buffer whereas `bytes(bytearray)` copies all of it
+    buf = io.BytesIO()
+    byte_count = 0
+    for chunk in iter_body_chunks(body, chunk_size):
+        byte_count += len(chunk)
+        if chunked:
+            buf.write('{size:x}\r\n'.format(size=len(chunk)).encode('ascii'))
+            buf.write(chunk)
+            buf.write(b'\r\n')
+        else:
+            buf.write(chunk)
+    if chunked:
+        buf.write(b'0\r\n\r\n')
+    return buf.getvalue(), byte_count
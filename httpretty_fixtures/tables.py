@@ -0,0 +1,100 @@
+# Load in our dependencies
+import io
+import json
+import os
+import threading
+
+from .streaming import TEXT_TYPE
+
+
+# Define our constants
+# DEV: Every other key on a route is passed through to `mark_fixture` (e.g. `match_querystring`, `latency`)
+ROUTE_KEYS = frozenset(['name', 'method', 'uri', 'status', 'headers', 'body', 'body_file'])
+
+
+def load_route_table(path):
+    """
+    Parse the routes from a route table file
+
+    :param str path: Path to a `.json`, `.jsonl`, `.yaml`, or `.yml` file with a list of routes
+    :rtype: list
+    :return: Route dictionaries (e.g. `{'name': 'hello', 'uri': 'http://localhost:9000/', 'body': 'world'}`)
+    """
+    # Parse our file based on its extension
+    extension = os.path.splitext(path)[1].lower()
+    with io.open(path, encoding='utf-8') as table_file:
+        if extension == '.jsonl':
+            routes = [json.loads(line) for line in table_file if line.strip()]
+        elif extension == '.json':
+            routes = json.load(table_file)
+        elif extension in ('.yaml', '.yml'):
+            # Load PyYAML, if we don't have it then complain and leave
+            # DEV: YAML route tables are optional and PyYAML is slow to import so we only load it when we need it
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError('Expected PyYAML to be installed to load route table "{path}". '
+                                   'Please run `pip install PyYAML`'.format(path=path))
+            routes = yaml.safe_load(table_file)
+        else:
+            raise RuntimeError('Expected route table "{path}" to end with ".json", ".jsonl", ".yaml", or ".yml"'
+                               .format(path=path))
+
+    # If our routes aren't a list, complain and leave
+    if not isinstance(routes, list):
+        raise RuntimeError('Expected route table "{path}" to contain a list of routes but it did not'
+                           .format(path=path))
+
+    # Verify each of our routes has the information we need
+    for index, route in enumerate(routes):
+        for key in ('name', 'uri'):
+            if key not in route:
+                raise RuntimeError('Expected route {index} in "{path}" to have a "{key}" but it did not'
+                                   .format(index=index, path=path, key=key))
+        if 'body' in route and 'body_file' in route:
+            raise RuntimeError('Expected route "{name}" in "{path}" to have a "body" or a "body_file" but not both'
+                               .format(name=route['name'], path=path))
+    return routes
+
+
+def generate_table_fixture(route, base_dir):
+    """
+    Create a fixture function for a route from a route table
+
+    :param dict route: Route from `load_route_table`
+    :param str base_dir: Directory to resolve `body_file` against (i.e. our route table's directory)
+    :rtype: tuple
+    :return: `(fixture, register_uri_args, register_uri_kwargs)` for `mark_fixture_function`
+    """
+    # Resolve our response information
+    status = route.get('status', 200)
+    headers = route.get('headers', {})
+    body_file = route.get('body_file')
+    if body_file is not None:
+        body_file = os.path.join(base_dir, body_file)
+    loaded = {}
+    lock = threading.Lock()
+
+    def load_body():
+        # DEV: We read and encode our body on the first request so loading a table only parses its metadata
+        with lock:
+            if 'body' not in loaded:
+                if body_file is not None:
+                    with open(body_file, 'rb') as f:
+                        body = f.read()
+                else:
+                    body = route.get('body', '')
+                    # DEV: YAML/JSON objects are serialized for convenience (e.g. `body: {"hits": []}`)
+                    if not isinstance(body, (bytes, TEXT_TYPE)):
+                        body = json.dumps(body)
+                loaded['body'] = body
+        return loaded['body']
+
+    def table_fixture(self, request, uri, res_headers):
+        res_headers.update(headers)
+        return (status, res_headers, load_body())
+    table_fixture.__name__ = str(route['name'])
+
+    # Return our fixture and its registration info
+    register_uri_kwargs = dict((key, value) for key, value in route.items() if key not in ROUTE_KEYS)
+    return table_fixture, (route.get('method', 'GET').upper(), route['uri']), register_uri_kwargs
@@ -1,4 +1,12 @@
 # Load in our dependencies
+import gc
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import weakref
 from unittest import TestCase
 
 import httpretty
@@ -29,6 +37,156 @@ class CounterServer(httpretty_fixtures.FixtureManager):
         return (200, res_headers, str(self.count))
 
 
+class RingServer(FakeServer):
+    record_limit = 2
+
+
+class SummaryServer(FakeServer):
+    record_mode = httpretty_fixtures.RECORD_SUMMARY
+
+
+class CountingServer(FakeServer):
+    record_mode = httpretty_fixtures.RECORD_COUNT
+
+
+class IndexedServer(FakeServer):
+    indexed_dispatch = True
+
+    @httpretty_fixtures.post('http://localhost:9000/goodbye')
+    def goodbye_post(self, request, uri, res_headers):
+        return (201, res_headers, 'posted')
+
+    @httpretty_fixtures.get(re.compile(r'http://localhost:9000/items/\d+$'))
+    def item(self, request, uri, res_headers):
+        return (200, res_headers, 'item')
+
+    @httpretty_fixtures.get(re.compile(r'http://localhost:9000/items/new$'))
+    def new_item(self, request, uri, res_headers):
+        return (200, res_headers, 'new item')
+
+
+class IndexedCounterServer(CounterServer):
+    indexed_dispatch = True
+
+
+class CaptureServer(IndexedServer):
+    record_mode = httpretty_fixtures.RECORD_CAPTURE
+    capture_spool_threshold = 8
+
+
+class UploadServer(httpretty_fixtures.FixtureManager):
+    record_mode = httpretty_fixtures.RECORD_CAPTURE
+    capture_spool_threshold = 1024
+
+    def __init__(self):
+        self.request_refs = []
+        super(UploadServer, self).__init__()
+
+    @httpretty_fixtures.post('http://localhost:9000/upload')
+    def upload(self, request, uri, res_headers):
+        self.request_refs.append(weakref.ref(request))
+        return (200, res_headers, 'uploaded')
+
+
+class LimitedUploadServer(UploadServer):
+    record_limit = 2
+
+
+class ScenarioServer(FakeServer):
+    scenario = (httpretty_fixtures.Scenario('empty')
+                .sequence('hello', [(200, 'page 1'), (200, 'page 2')])
+                .nth('hello', 4, (200, 'flaky'))
+                .nth('hello', 5, 500)
+                .on('goodbye', 404, state='empty')
+                .on('create', 201, then='created')
+                .sequence('goodbye', [(503, {'Retry-After': '1'}, '')], state='created')
+                .nth('goodbye', 2, state='created', then='indexed'))
+
+    @httpretty_fixtures.post('http://localhost:9000/goodbye')
+    def create(self, request, uri, res_headers):
+        return (500, res_headers, 'unreachable')
+
+
+class AccountServer(httpretty_fixtures.FixtureManager):
+    def __init__(self):
+        self.token = None
+        self.items = []
+        super(AccountServer, self).__init__()
+
+    @httpretty_fixtures.post('http://localhost:9000/login')
+    def login(self, request, uri, res_headers):
+        self.token = 'abc'
+        return (200, res_headers, self.token)
+
+    @httpretty_fixtures.post('http://localhost:9000/items')
+    def create_item(self, request, uri, res_headers):
+        self.items.append(request.body.decode('utf-8'))
+        return (201, res_headers, str(len(self.items)))
+
+
+class NegotiatingServer(httpretty_fixtures.FixtureManager):
+    @httpretty_fixtures.get('http://localhost:9000/', compress=True, conditional=True)
+    def hello(self, request, uri, res_headers):
+        return (200, res_headers, 'hello world ' * 100)
+
+    @httpretty_fixtures.get('http://localhost:9000/goodbye', conditional=True)
+    def goodbye(self, request, uri, res_headers):
+        res_headers['last-modified'] = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        return (200, res_headers, 'moon')
+
+
+class StreamingServer(httpretty_fixtures.FixtureManager):
+    stream_chunk_size = 4
+
+    @httpretty_fixtures.get('http://localhost:9000/generator')
+    def generator(self, request, uri, res_headers):
+        return (200, res_headers, (chunk for chunk in ['hello', ' ', u'world']))
+
+    @httpretty_fixtures.get('http://localhost:9000/file', chunked=True)
+    def file(self, request, uri, res_headers):
+        return (200, res_headers, io.BytesIO(b'hello file'))
+
+
+class SnowmanServer(httpretty_fixtures.FixtureManager):
+    @httpretty_fixtures.get('http://localhost:9000/snowman')
+    def snowman(self, request, uri, res_headers):
+        return (200, res_headers, u'\u2603')
+
+
+class SlowServer(httpretty_fixtures.FixtureManager):
+    @httpretty_fixtures.get('http://localhost:9000/', latency=0.05)
+    def slow(self, request, uri, res_headers):
+        return (200, res_headers, 'slow')
+
+    @httpretty_fixtures.get('http://localhost:9000/timeout', latency=0.5)
+    def timeout(self, request, uri, res_headers):
+        return (200, res_headers, 'too slow')
+
+    @httpretty_fixtures.get('http://localhost:9000/throttled', latency=httpretty_fixtures.LatencyProfile(
+        distribution=('uniform', 0, 0.01), seed=42, bytes_per_second=1000))
+    def throttled(self, request, uri, res_headers):
+        return (200, res_headers, 'x' * 50)
+
+
+class CachingServer(httpretty_fixtures.FixtureManager):
+    cache_size = 2
+
+    def __init__(self):
+        self.count = 0
+        super(CachingServer, self).__init__()
+
+    @httpretty_fixtures.get('http://localhost:9000/static', static=True)
+    def static(self, request, uri, res_headers):
+        self.count += 1
+        res_headers['content-type'] = 'application/json'
+        return (200, res_headers, json.dumps({'count': self.count}))
+
+    @httpretty_fixtures.get('http://localhost:9000/search', cache_key=httpretty_fixtures.request_cache_key)
+    def search(self, request, uri, res_headers):
+        self.count += 1
+        return (200, res_headers, u'{path} \u2603 {count}'.format(path=request.path, count=self.count))
+
+
 # Define our tests
 class TestHttprettyFixtures(TestCase):
     @FakeServer.run(['hello'])
@@ -175,6 +333,54 @@ class TestHttprettyFixtures(TestCase):
         # We finally stop HTTPretty since the last fixture manager is stopped
         self.assertFalse(httpretty.is_enabled())
 
+    def test_nested_teardown(self):
+        """
+        When nesting FixtureManagers
+            each stop removes exactly the matchers its manager registered
+            matchers shadowed by an inner manager are restored
+        """
+        with FakeServer.running(['hello', 'goodbye']):
+            self.assertEqual(len(httpretty.HTTPretty._entries), 2)
+
+            # Shadow our `hello` fixture and verify it's restored afterwards
+            with CounterServer.running(['counter']):
+                self.assertEqual(requests.get('http://localhost:9000/').text, '1')
+                self.assertEqual(len(httpretty.HTTPretty._entries), 2)
+            self.assertEqual(len(httpretty.HTTPretty._entries), 2)
+            self.assertEqual(requests.get('http://localhost:9000/').text, 'world')
+
+            # Verify our indexed dispatcher is removed as a whole
+            with IndexedServer.running(['goodbye_post', 'item']):
+                self.assertEqual(len(httpretty.HTTPretty._entries), 3)
+            self.assertEqual(len(httpretty.HTTPretty._entries), 2)
+        self.assertEqual(len(httpretty.HTTPretty._entries), 0)
+
+    def test_nested_override(self):
+        """
+        When nesting FixtureManagers with the same URL and either uses `indexed_dispatch`
+            the inner manager's fixture responds to every request
+            the outer manager's fixture responds after the inner one stops
+        """
+        # DEV: Without `indexed_dispatch` on either, HTTPretty rotates through both fixtures like `register_uri`
+        for outer_cls, inner_cls in ((IndexedServer, IndexedCounterServer), (FakeServer, IndexedCounterServer),
+                                     (IndexedServer, CounterServer)):
+            with outer_cls.running(['hello']):
+                with inner_cls.running(['counter']):
+                    responses = [requests.get('http://localhost:9000/').text for i in range(3)]
+                    self.assertEqual(responses, ['1', '2', '3'], (outer_cls, inner_cls))
+                self.assertEqual(requests.get('http://localhost:9000/').text, 'world')
+
+    def test_nested_mixed_methods(self):
+        """
+        When nesting an indexed FixtureManager with only another method for a URL
+            the outer manager's fixture still responds to its method
+        """
+        for outer_cls in (FakeServer, IndexedServer):
+            with outer_cls.running(['goodbye']):
+                with IndexedServer.running(['goodbye_post']):
+                    self.assertEqual(requests.get('http://localhost:9000/goodbye').text, 'moon', outer_cls)
+                    self.assertEqual(requests.post('http://localhost:9000/goodbye').text, 'posted', outer_cls)
+
     def test_httpretty_enabled_outside_fixture_manager(self):
         """
         When HTTPretty was started outside of FixtureManager
@@ -197,3 +403,602 @@ class TestHttprettyFixtures(TestCase):
         # Disable HTTPretty manually and ensure it is stopped
         httpretty.disable()
         self.assertEqual(httpretty.is_enabled(), False)
+
+    @RingServer.run(['hello'])
+    def test_record_limit(self, ring_server):
+        """
+        A FixtureManager with a `record_limit`
+            only keeps the last `record_limit` requests
+            preserves `first_request` and the total count
+        """
+        # Make more requests than our limit
+        for query in ('?first', '?second', '?third'):
+            requests.get('http://localhost:9000/' + query)
+
+        # Assert we only kept the latest requests
+        fixture = ring_server.hello
+        self.assertEqual(fixture.request_count, 3)
+        self.assertEqual(len(fixture.requests), 2)
+        self.assertEqual(fixture.requests[0].path, '/?second')
+        self.assertEqual(fixture.requests[1].path, '/?third')
+        self.assertEqual(fixture.first_request.path, '/?first')
+        self.assertEqual(fixture.last_request.path, '/?third')
+
+    def test_record_limit_bounds_httpretty(self):
+        """
+        A FixtureManager with a `record_limit` or compact `record_mode`
+            bounds HTTPretty's global history of requests
+        """
+        # Make more requests than our limit
+        with RingServer.running(['hello']):
+            for i in range(20):
+                requests.get('http://localhost:9000/?{i}'.format(i=i))
+
+            # Assert HTTPretty only kept our latest requests
+            self.assertEqual(len(httpretty.HTTPretty.latest_requests), 2)
+            self.assertEqual(httpretty_fixtures.first_request().path, '/?18')
+            self.assertEqual(httpretty_fixtures.last_request().path, '/?19')
+            self.assertEqual(len(httpretty.core.fakesock.socket._sent_data), 1)
+
+        # Assert compact modes only keep the latest request
+        with SummaryServer.running(['hello']):
+            for i in range(20):
+                requests.get('http://localhost:9000/?{i}'.format(i=i))
+            self.assertEqual(len(httpretty_fixtures.requests()), 1)
+            self.assertEqual(httpretty_fixtures.last_request().path, '/?19')
+
+        # Assert unbounded managers keep every request
+        with FakeServer.running(['hello']):
+            for i in range(3):
+                requests.get('http://localhost:9000/?{i}'.format(i=i))
+            self.assertEqual(len(httpretty_fixtures.requests()), 3)
+
+    def test_nested_bound_history(self):
+        """
+        A compact FixtureManager nested in an unbounded one or started while HTTPretty is enabled
+            doesn't shrink the outer history
+            restores HTTPretty's history and sent data when it stops
+        """
+        # Make requests from our outer and inner managers
+        sent_data = httpretty.core.fakesock.socket._sent_data
+        with FakeServer.running(['hello']):
+            for i in range(2):
+                requests.get('http://localhost:9000/?outer{i}'.format(i=i))
+            with SummaryServer.running(['hello']):
+                requests.get('http://localhost:9000/?inner')
+                self.assertEqual(len(httpretty_fixtures.requests()), 3)
+
+            # Assert our outer history is intact and unbounded
+            self.assertEqual([request.path for request in httpretty_fixtures.requests()],
+                             ['/?outer0', '/?outer1', '/?inner'])
+            self.assertIsInstance(httpretty.HTTPretty.latest_requests, list)
+
+        # Start HTTPretty ourselves and make requests through a compact manager
+        httpretty.HTTPretty.enable()
+        try:
+            latest_requests = httpretty.HTTPretty.latest_requests
+            with SummaryServer.running(['hello']):
+                for i in range(3):
+                    requests.get('http://localhost:9000/?{i}'.format(i=i))
+                self.assertEqual(len(httpretty_fixtures.requests()), 1)
+
+            # Assert our own history is back and has the request that was kept
+            self.assertIs(httpretty.HTTPretty.latest_requests, latest_requests)
+            self.assertEqual(httpretty_fixtures.last_request().path, '/?2')
+            self.assertIs(httpretty.core.fakesock.socket._sent_data, sent_data)
+        finally:
+            httpretty.HTTPretty.disable()
+            httpretty.HTTPretty.reset()
+
+    @SummaryServer.run(['hello'])
+    def test_record_summary(self, summary_server):
+        """
+        A FixtureManager with a `RECORD_SUMMARY` mode
+            records compact summaries of requests
+        """
+        # Make our requests
+        requests.get('http://localhost:9000/?first')
+
+        # Assert our summary is as expected
+        fixture = summary_server.hello
+        self.assertEqual(len(fixture.requests), 1)
+        summary = fixture.requests[0]
+        self.assertTrue(isinstance(summary, httpretty_fixtures.RequestSummary))
+        self.assertEqual(summary.method, 'GET')
+        self.assertEqual(summary.path, '/?first')
+        self.assertEqual(summary.body_length, 0)
+        self.assertEqual(len(summary.headers_digest), 40)
+        self.assertEqual(fixture.last_request.path, '/?first')
+
+    @CountingServer.run(['hello'])
+    def test_record_count(self, counting_server):
+        """
+        A FixtureManager with a `RECORD_COUNT` mode
+            only counts requests
+            preserves `first_request` and `last_request`
+        """
+        requests.get('http://localhost:9000/?first')
+        requests.get('http://localhost:9000/?second')
+
+        fixture = counting_server.hello
+        self.assertEqual(fixture.request_count, 2)
+        self.assertEqual(len(fixture.requests), 0)
+        self.assertEqual(fixture.first_request.path, '/?first')
+        self.assertEqual(fixture.last_request.path, '/?second')
+
+    def test_fixture_plans_cached_per_class(self):
+        """
+        Retrieving fixture plans for a FixtureManager
+            compiles each plan once per class
+            does not share plans between subclasses
+        """
+        # Retrieve our plans multiple times
+        plan = FakeServer.get_fixture_plan('hello')
+        self.assertIs(FakeServer.get_fixture_plan('hello'), plan)
+        self.assertEqual(plan.register_uri_args, ('GET', 'http://localhost:9000/'))
+
+        # Verify subclasses compile their own plans
+        self.assertIsNot(RingServer.get_fixture_plan('hello'), plan)
+
+        # Verify unmarked fixtures are rejected
+        with self.assertRaises(RuntimeError):
+            FakeServer.get_fixture_plan('start')
+
+    def test_session(self):
+        """
+        When running FixtureManagers inside of a session
+            we keep HTTPretty enabled between runs
+            we don't leak fixture state or requests between runs
+            we disable HTTPretty when the session stops
+        """
+        with httpretty_fixtures.FixtureManager.session():
+            # Run a fixture and make a request
+            counter_server = CounterServer.start(['counter'])
+            res = requests.get('http://localhost:9000/')
+            self.assertEqual(res.text, '1')
+            CounterServer.stop()
+            self.assertTrue(httpretty.is_enabled())
+
+            # Run our fixture again and verify it's been swapped out
+            counter_server = CounterServer.start(['counter'])
+            self.assertEqual(len(httpretty_fixtures.requests()), 0)
+            res = requests.get('http://localhost:9000/')
+            self.assertEqual(res.text, '1')
+            self.assertEqual(counter_server.counter.request_count, 1)
+            CounterServer.stop()
+            self.assertTrue(httpretty.is_enabled())
+
+        # Verify we cleaned up
+        self.assertFalse(httpretty.is_enabled())
+        self.assertEqual(httpretty_fixtures.FixtureManager.session_count, 0)
+
+    def test_session_keeps_registered_uris(self):
+        """
+        When running FixtureManagers inside of a session
+            URIs registered directly onto HTTPretty keep responding
+        """
+        with httpretty_fixtures.FixtureManager.session():
+            httpretty.register_uri(httpretty.GET, 'http://localhost:9001/x', body='mine')
+            try:
+                with FakeServer.running(['hello']):
+                    self.assertEqual(requests.get('http://localhost:9001/x').text, 'mine')
+                    self.assertEqual(requests.get('http://localhost:9000/').text, 'world')
+                    self.assertEqual(len(httpretty_fixtures.requests()), 2)
+            finally:
+                httpretty.reset()
+
+    def test_session_started_while_running(self):
+        """
+        When a session is started while a FixtureManager is running
+            we keep HTTPretty enabled after that FixtureManager stops
+            we disable HTTPretty when the session stops
+        """
+        # Start a session inside of a running fixture and stop our fixture
+        CounterServer.start(['counter'])
+        httpretty_fixtures.FixtureManager.start_session()
+        try:
+            CounterServer.stop()
+            self.assertTrue(httpretty.is_enabled())
+
+            # Verify later runs are still intercepted
+            with CounterServer.running(['counter']):
+                res = requests.get('http://localhost:9000/')
+                self.assertEqual(res.text, '1')
+            self.assertTrue(httpretty.is_enabled())
+        finally:
+            httpretty_fixtures.FixtureManager.stop_session()
+
+        # Verify we cleaned up
+        self.assertFalse(httpretty.is_enabled())
+
+    @IndexedServer.run(['hello', 'goodbye', 'goodbye_post', 'item', 'new_item'])
+    def test_indexed_dispatch(self, indexed_server):
+        """
+        A FixtureManager with `indexed_dispatch`
+            routes exact and regex URIs to the appropriate fixture
+            routes the same URI to different fixtures by method
+            collects requests on the appropriate fixture
+        """
+        # Make our requests and verify their responses
+        self.assertEqual(requests.get('http://localhost:9000/?first').text, 'world')
+        self.assertEqual(requests.get('http://localhost:9000/goodbye').text, 'moon')
+        res = requests.post('http://localhost:9000/goodbye', data='bye')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.text, 'posted')
+        self.assertEqual(requests.get('http://localhost:9000/items/1').text, 'item')
+        self.assertEqual(requests.get('http://localhost:9000/items/new').text, 'new item')
+
+        # Assert we have information in our requests from fixture context
+        self.assertEqual(indexed_server.hello.last_request.path, '/?first')
+        self.assertEqual(len(indexed_server.goodbye.requests), 1)
+        self.assertEqual(indexed_server.goodbye_post.last_request.body, b'bye')
+        self.assertEqual(indexed_server.item.last_request.path, '/items/1')
+        self.assertEqual(indexed_server.new_item.last_request.path, '/items/new')
+
+    @StreamingServer.run(['generator', 'file'])
+    def test_streamed_bodies(self, streaming_server):
+        """
+        Fixtures which return generators or file-like bodies
+            stream their content to the client (optionally chunked)
+            record only their byte counts
+        """
+        # Make our requests and verify their content
+        res = requests.get('http://localhost:9000/generator')
+        self.assertEqual(res.text, 'hello world')
+        self.assertNotIn('transfer-encoding', res.headers)
+        res = requests.get('http://localhost:9000/file')
+        self.assertEqual(res.text, 'hello file')
+        self.assertEqual(res.headers['transfer-encoding'], 'chunked')
+
+        # Assert we saved our byte counts
+        self.assertEqual(streaming_server.generator.streamed_bytes, 11)
+        self.assertEqual(streaming_server.file.streamed_bytes, 10)
+
+    @SlowServer.run(['slow', 'timeout', 'throttled'])
+    def test_latency(self, slow_server):
+        """
+        Fixtures with a latency profile
+            delay their responses
+            trigger client timeouts
+        """
+        # Verify a fixed delay is applied
+        start = time.time()
+        res = requests.get('http://localhost:9000/')
+        self.assertEqual(res.text, 'slow')
+        self.assertGreaterEqual(time.time() - start, 0.05)
+        self.assertEqual(slow_server.slow.delayed_seconds, 0.05)
+
+        # Verify our throttle is applied on top of our distribution
+        requests.get('http://localhost:9000/throttled')
+        self.assertGreaterEqual(slow_server.throttled.delayed_seconds, 50 / 1000.0)
+
+        # Verify clients time out
+        with self.assertRaises(requests.exceptions.RequestException):
+            requests.get('http://localhost:9000/timeout', timeout=0.1)
+
+    def test_latency_profile_deterministic(self):
+        """
+        A LatencyProfile with a seed
+            generates the same delays for each run of a fixture
+        """
+        profile = httpretty_fixtures.LatencyProfile(delay=1, distribution=('gauss', 0.2, 0.05), seed=1)
+        delayer1 = profile.generate_delayer()
+        delayer2 = profile.generate_delayer()
+        delays = [delayer1(0) for i in range(5)]
+        self.assertEqual(delays, [delayer2(0) for i in range(5)])
+        self.assertTrue(all(delay > 1 for delay in delays))
+
+    @FakeServer.run(['hello', 'goodbye'])
+    def test_metrics(self, fake_server):
+        """
+        Requests to a running FixtureManager
+            are counted and timed per fixture
+            are aggregated across instances in our metrics report
+            can be exported as JSON
+        """
+        # Make our requests
+        requests.get('http://localhost:9000/')
+        requests.get('http://localhost:9000/')
+        requests.get('http://localhost:9000/goodbye')
+
+        # Assert our per-instance metrics are as expected
+        report = fake_server.metrics_report()
+        self.assertEqual(sorted(report.keys()), ['goodbye', 'hello'])
+        self.assertEqual(report['hello']['call_count'], 2)
+        self.assertEqual(report['hello']['response_bytes'], len('world') * 2)
+        self.assertGreater(report['hello']['total_seconds'], 0)
+        self.assertLessEqual(report['hello']['mean_seconds'], report['hello']['p99_seconds'])
+        self.assertEqual(report['goodbye']['call_count'], 1)
+
+        # Assert our aggregate metrics include our requests
+        aggregate_report = httpretty_fixtures.metrics_report()
+        self.assertGreaterEqual(aggregate_report[__name__ + '.FakeServer.hello']['call_count'], 2)
+
+        # Assert we can export our metrics
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            httpretty_fixtures.export_metrics(path)
+            with open(path) as report_file:
+                self.assertIn(__name__ + '.FakeServer.hello', json.load(report_file))
+        finally:
+            os.remove(path)
+
+    @SnowmanServer.run(['snowman'])
+    def test_metrics_bounded(self, snowman_server):
+        """
+        Fixture metrics
+            count response bytes of text bodies as UTF-8
+            keep constant memory and report percentiles within 1%
+        """
+        # Assert our text body was counted as bytes
+        res = requests.get('http://localhost:9000/snowman')
+        self.assertEqual(res.content, u'\u2603'.encode('utf-8'))
+        self.assertEqual(snowman_server.snowman.metrics.response_bytes, 3)
+
+        # Record many durations and assert our histogram stays small
+        metrics = httpretty_fixtures.metrics.FixtureMetrics()
+        durations = [0.001 * (i % 1000 + 1) for i in range(100000)]
+        for seconds in durations:
+            metrics.record(seconds, 0)
+        self.assertLessEqual(len(metrics.buckets), 1000)
+        self.assertAlmostEqual(metrics.percentile(99), 0.99, delta=0.99 * 0.01)
+        self.assertEqual(metrics.percentile(100), 1.0)
+
+    @CachingServer.run(['static', 'search'])
+    def test_cached_responses(self, caching_server):
+        """
+        Fixtures marked as static or with a cache key
+            run once per key and replay their encoded responses
+            still record every request
+            evict their least recently used responses
+        """
+        # Verify our static fixture only runs once
+        for i in range(3):
+            res = requests.get('http://localhost:9000/static')
+            self.assertEqual(res.json(), {'count': 1})
+            self.assertEqual(res.headers['content-type'], 'application/json')
+        self.assertEqual(caching_server.count, 1)
+        self.assertEqual(caching_server.static.request_count, 3)
+
+        # Verify our keyed fixture caches per query string
+        self.assertEqual(requests.get('http://localhost:9000/search?q=a').text, u'/search?q=a \u2603 2')
+        self.assertEqual(requests.get('http://localhost:9000/search?q=b').text, u'/search?q=b \u2603 3')
+        self.assertEqual(requests.get('http://localhost:9000/search?q=a').text, u'/search?q=a \u2603 2')
+        self.assertEqual(caching_server.count, 3)
+
+        # Verify our least recently used response was evicted (`cache_size = 2`)
+        self.assertEqual(requests.get('http://localhost:9000/static').json(), {'count': 4})
+        self.assertEqual(requests.get('http://localhost:9000/search?q=a').text, u'/search?q=a \u2603 2')
+
+    @IndexedServer.run(['hello', 'goodbye', 'goodbye_post'])
+    def test_request_log(self, indexed_server):
+        """
+        Requests to a running FixtureManager
+            are queryable by method, path, fixture, and headers
+        """
+        # Make our requests
+        requests.get('http://localhost:9000/?first')
+        requests.get('http://localhost:9000/goodbye')
+        requests.post('http://localhost:9000/goodbye', data='bye', headers={'X-Request-Id': 'a'})
+        requests.post('http://localhost:9000/goodbye', data='bye again', headers={'X-Request-Id': 'b'})
+
+        # Assert we can query our requests
+        request_log = indexed_server.request_log
+        self.assertEqual(len(request_log), 4)
+        self.assertEqual(request_log.count(method='POST'), 2)
+        self.assertEqual(request_log.count(path='/goodbye'), 3)
+        self.assertEqual(request_log.count(fixture='hello'), 1)
+        self.assertEqual(request_log.count(method='GET', path='/goodbye'), 1)
+        self.assertEqual([request.body for request in request_log.filter(method='POST', path='/goodbye')],
+                         [b'bye', b'bye again'])
+        self.assertEqual(request_log.last_matching(path='/').path, '/?first')
+        self.assertEqual(request_log.last_matching(fixture='goodbye_post').body, b'bye again')
+        self.assertEqual(request_log.last_matching(headers={'X-Request-Id': 'a'}).body, b'bye')
+        self.assertIsNone(request_log.last_matching(method='DELETE'))
+
+    def test_request_log_limit(self):
+        """
+        A RequestLog with a limit
+            evicts its oldest requests from its indexes
+        """
+        request_log = httpretty_fixtures.RequestLog(maxlen=2)
+        for method, path in (('GET', '/a'), ('POST', '/b'), ('GET', '/c')):
+            request_log.append('fixture', httpretty_fixtures.RequestSummary(method, path, '', 0))
+        self.assertEqual([request.path for request in request_log], ['/b', '/c'])
+        self.assertEqual(request_log.count(method='GET'), 1)
+        self.assertEqual(request_log.count(path='/a'), 0)
+        self.assertEqual(request_log.last_matching(fixture='fixture').path, '/c')
+        self.assertEqual(request_log.filter(method='POST')[0].path, '/b')
+
+        # Assert lookups stay correct after evicting many requests
+        request_log = httpretty_fixtures.RequestLog(maxlen=3)
+        for i in range(20):
+            request_log.append('fixture_{i}'.format(i=i % 2), httpretty_fixtures.RequestSummary('GET', str(i), '', 0))
+        self.assertEqual([request.path for request in request_log], ['17', '18', '19'])
+        self.assertEqual([request.path for request in request_log.filter(fixture='fixture_1')], ['17', '19'])
+        self.assertEqual(request_log.last_matching(fixture='fixture_0').path, '18')
+        self.assertEqual(request_log.copy().filter(method='GET')[0].path, '17')
+
+    @CaptureServer.run(['goodbye_post'])
+    def test_record_capture(self, capture_server):
+        """
+        A FixtureManager with a `RECORD_CAPTURE` mode
+            keeps small bodies in memory
+            spills large bodies to a temporary file
+            parses bodies when they are accessed
+        """
+        # Make our requests
+        requests.post('http://localhost:9000/goodbye', data={'a': '1'})
+        requests.post('http://localhost:9000/goodbye?large', json={'message': 'goodbye moon'})
+
+        # Assert our small body was kept as is
+        small, large = capture_server.goodbye_post.requests
+        self.assertTrue(isinstance(small, httpretty_fixtures.CapturedRequest))
+        self.assertEqual(small.method, 'POST')
+        self.assertEqual(small.body, b'a=1')
+        self.assertEqual(small.parsed_body, {'a': ['1']})
+
+        # Assert our large body was spilled and can be read back and parsed
+        self.assertEqual(large.path, '/goodbye?large')
+        self.assertIsNone(large._body)
+        self.assertEqual(large.body_length, len(large.body))
+        self.assertEqual(large.parsed_body, {'message': 'goodbye moon'})
+        self.assertEqual(capture_server.request_log.count(method='POST'), 2)
+
+    @UploadServer.run(['upload'])
+    def test_record_capture_releases_requests(self, upload_server):
+        """
+        A FixtureManager with a `RECORD_CAPTURE` mode
+            doesn't hold onto the requests whose bodies it spilled
+            reads spilled bodies back from its spool
+        """
+        # Upload large bodies through HTTPretty
+        bodies = [str(i).encode('utf-8') * 10240 for i in range(5)]
+        for body in bodies:
+            requests.post('http://localhost:9000/upload', data=body)
+
+        # Assert only HTTPretty's latest request is still around
+        gc.collect()
+        self.assertEqual([ref() is None for ref in upload_server.request_refs], [True] * 4 + [False])
+
+        # Assert our captures still have our bodies
+        fixture = upload_server.upload
+        self.assertTrue(isinstance(fixture.first_request, httpretty_fixtures.CapturedRequest))
+        self.assertEqual(fixture.first_request.body, bodies[0])
+        self.assertEqual(fixture.last_request.body, bodies[-1])
+        self.assertEqual([request.body for request in fixture.requests], bodies)
+
+    def test_record_capture_spool(self):
+        """
+        A FixtureManager with a `RECORD_CAPTURE` mode and a `record_limit`
+            reclaims spooled files once their captures are evicted
+            closes its spool when it stops
+            keeps spilled bodies in snapshots
+        """
+        # Upload large bodies with a spool file per body
+        bodies = [str(i).encode('utf-8') * 10240 for i in range(6)]
+        with LimitedUploadServer.running(['upload']) as upload_server:
+            spool = upload_server.upload.spool
+            spool.segment_size = 10240
+            for body in bodies:
+                requests.post('http://localhost:9000/upload', data=body)
+
+            # Assert only the files of our first request and kept requests are open
+            gc.collect()
+            self.assertEqual(len(spool.live_counts), 3)
+            self.assertEqual([request.body for request in upload_server.upload.requests], bodies[-2:])
+            snapshot = upload_server.snapshot()
+
+        # Assert our spool was closed and spilled bodies can no longer be read
+        self.assertTrue(spool.closed)
+        self.assertEqual(spool.live_counts, {})
+        with self.assertRaises(RuntimeError):
+            upload_server.upload.last_request.body
+
+        # Assert our snapshot kept its own bodies
+        with LimitedUploadServer.running(snapshot) as upload_server:
+            self.assertEqual(upload_server.upload.first_request.body, bodies[0])
+            self.assertEqual([request.body for request in upload_server.upload.requests], bodies[-2:])
+            self.assertEqual(upload_server.request_log.last_matching(fixture='upload').body, bodies[-1])
+
+    @ScenarioServer.run(['hello', 'goodbye', 'create'])
+    def test_scenario(self, scenario_server):
+        """
+        A FixtureManager with a scenario
+            responds with sequences and Nth call responses
+            transitions state between fixtures
+            falls back to its fixture functions
+        """
+        # Verify our sequence and Nth call responses
+        self.assertEqual([requests.get('http://localhost:9000/').text for i in range(4)],
+                         ['page 1', 'page 2', 'world', 'flaky'])
+        self.assertEqual(requests.get('http://localhost:9000/').status_code, 500)
+
+        # Verify our state transitions
+        self.assertEqual(requests.get('http://localhost:9000/goodbye').status_code, 404)
+        self.assertEqual(scenario_server.scenario_state.state, 'empty')
+        self.assertEqual(requests.post('http://localhost:9000/goodbye').status_code, 201)
+        self.assertEqual(scenario_server.scenario_state.state, 'created')
+        res = requests.get('http://localhost:9000/goodbye')
+        self.assertEqual((res.status_code, res.headers['retry-after']), (503, '1'))
+        self.assertEqual(requests.get('http://localhost:9000/goodbye').text, 'moon')
+        self.assertEqual(scenario_server.scenario_state.state, 'indexed')
+
+        # Assert our requests were still recorded
+        self.assertEqual(scenario_server.hello.request_count, 5)
+
+    def test_snapshot(self):
+        """
+        A FixtureManager restored from a snapshot
+            starts with the state and recordings of its snapshot
+            doesn't leak changes into its snapshot or other restored instances
+        """
+        # Warm up our server and snapshot it
+        with AccountServer.running(['login', 'create_item']) as account_server:
+            requests.post('http://localhost:9000/login')
+            requests.post('http://localhost:9000/items', data='seed')
+            snapshot = account_server.snapshot()
+            requests.post('http://localhost:9000/items', data='unsaved')
+
+        # Restore our snapshot multiple times and verify each instance is independent
+        for i in range(2):
+            with AccountServer.running(snapshot) as account_server:
+                self.assertEqual(account_server.token, 'abc')
+                self.assertEqual(account_server.login.request_count, 1)
+                self.assertEqual(account_server.create_item.last_request.body, b'seed')
+                self.assertEqual(account_server.request_log.count(fixture='create_item'), 1)
+
+                res = requests.post('http://localhost:9000/items', data='test')
+                self.assertEqual(res.text, '2')
+                self.assertEqual(account_server.items, ['seed', 'test'])
+                self.assertEqual(account_server.create_item.request_count, 2)
+                self.assertEqual(len(account_server.create_item.requests), 2)
+                self.assertEqual(account_server.request_log.count(fixture='create_item'), 2)
+
+    @NegotiatingServer.run(['hello', 'goodbye'])
+    def test_negotiation(self, negotiating_server):
+        """
+        A FixtureManager with compressed and conditional fixtures
+            compresses bodies via Accept-Encoding
+            answers If-None-Match and If-Modified-Since with 304s
+            counts the bytes it saved
+        """
+        # Verify our bodies are compressed
+        res = requests.get('http://localhost:9000/')
+        self.assertEqual(res.headers['content-encoding'], 'gzip')
+        self.assertEqual(res.headers['vary'], 'Accept-Encoding')
+        self.assertEqual(res.text, 'hello world ' * 100)
+        res = requests.get('http://localhost:9000/', headers={'Accept-Encoding': 'gzip;q=0.5, deflate'})
+        self.assertEqual(res.headers['content-encoding'], 'deflate')
+        self.assertEqual(res.text, 'hello world ' * 100)
+        res = requests.get('http://localhost:9000/', headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('content-encoding', res.headers)
+        self.assertEqual(res.text, 'hello world ' * 100)
+
+        # Verify our entity tags are per encoding and answered with 304s
+        gzip_etag = requests.get('http://localhost:9000/').headers['etag']
+        res = requests.get('http://localhost:9000/', headers={'If-None-Match': gzip_etag})
+        self.assertEqual(res.status_code, 304)
+        res = requests.get('http://localhost:9000/', headers={'If-None-Match': gzip_etag, 'Accept-Encoding': 'deflate'})
+        self.assertEqual(res.status_code, 200)
+
+        # Verify `If-Modified-Since` is compared to our fixture's `Last-Modified`
+        res = requests.get('http://localhost:9000/goodbye',
+                           headers={'If-Modified-Since': 'Thu, 22 Oct 2015 00:00:00 GMT'})
+        self.assertEqual(res.status_code, 304)
+        res = requests.get('http://localhost:9000/goodbye',
+                           headers={'If-Modified-Since': 'Tue, 20 Oct 2015 00:00:00 GMT'})
+        self.assertEqual((res.status_code, res.text), (200, 'moon'))
+
+        # Assert our savings were counted
+        negotiation = negotiating_server.hello.negotiation
+        self.assertEqual(negotiation.counts['gzip'], 2)
+        self.assertEqual(negotiation.counts['deflate'], 2)
+        self.assertEqual(negotiation.counts['identity'], 1)
+        self.assertEqual(negotiation.counts['not_modified'], 1)
+        self.assertEqual(negotiation.body_bytes, 6 * 1200)
+        self.assertLess(negotiation.sent_bytes, 1200 * 2)
+
+        # Assert each compressed body was cached once on our fixture
+        self.assertEqual(len(negotiation.compression_cache), 2)
@@ -0,0 +1,79 @@
+# Load in our dependencies
+import functools
+import time
+from unittest import TestCase, skipIf
+
+import requests
+
+import httpretty_fixtures
+
+try:
+    import asyncio
+except ImportError:  # Python 2
+    asyncio = None
+
+
+# Set up our fixture manager
+# DEV: Our awaitables are built without `async def` so this file can be loaded on Python 2
+class SlowServer(httpretty_fixtures.FixtureManager):
+    @httpretty_fixtures.get('http://localhost:9000/')
+    def slow(self, request, uri, res_headers):
+        return asyncio.sleep(0.2, result=(200, res_headers, 'slow'))
+
+
+# Define our tests
+@skipIf(asyncio is None, 'asyncio is not available')
+class TestAsyncio(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def fetch(self, url):
+        """Request a URL from a thread without blocking our event loop"""
+        return self.loop.run_in_executor(None, functools.partial(requests.get, url))
+
+    @SlowServer.run(['slow'])
+    def test_awaitable_fixture(self, slow_server):
+        """
+        A fixture which returns an awaitable
+            responds with the awaitable's result
+        """
+        res = requests.get('http://localhost:9000/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.text, 'slow')
+        self.assertEqual(slow_server.slow.request_count, 1)
+
+    def test_run_async(self):
+        """
+        A function decorated by `run_async`
+            runs with our fixtures started
+            stops our fixtures once it completes
+        """
+        @SlowServer.run_async(['slow'])
+        def fetch_many(that_self, slow_server):
+            # Make many concurrent requests to our slow fixture
+            return asyncio.gather(*[that_self.fetch('http://localhost:9000/?{i}'.format(i=i)) for i in range(10)])
+
+        # Verify our requests ran concurrently rather than one after another
+        start = time.time()
+        responses = self.loop.run_until_complete(fetch_many(self))
+        self.assertLess(time.time() - start, 10 * 0.2)
+        self.assertEqual([res.text for res in responses], ['slow'] * 10)
+        self.assertEqual(httpretty_fixtures.FixtureManager.nested_count, 0)
+
+    def test_running_async(self):
+        """
+        An `async with` block via `running_async`
+            runs with our fixtures started
+        """
+        context = SlowServer.running_async(['slow'])
+        slow_server = self.loop.run_until_complete(context.__aenter__())
+        try:
+            res = self.loop.run_until_complete(self.fetch('http://localhost:9000/'))
+            self.assertEqual(res.text, 'slow')
+            self.assertEqual(slow_server.slow.request_count, 1)
+        finally:
+            self.loop.run_until_complete(context.__aexit__(None, None, None))
+        self.assertEqual(httpretty_fixtures.FixtureManager.nested_count, 0)
@@ -0,0 +1,110 @@
+# Load in our dependencies
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+import requests
+
+import httpretty_fixtures
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+
+# Set up a stand-in server to record from
+class StandInHandler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        StandInHandler.hits += 1
+        body = 'upstream {path}'.format(path=self.path).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('X-Stand-In', 'yes')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ExportServer(httpretty_fixtures.FixtureManager):
+    @httpretty_fixtures.get('http://localhost:9000/export')
+    def export(self, request, uri, res_headers):
+        return (200, res_headers, 'fallback')
+
+
+# Define our tests
+class TestCassette(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # DEV: We start our server before HTTPretty is enabled so it binds to a real socket
+        cls.stand_in = HTTPServer(('127.0.0.1', 0), StandInHandler)
+        cls.stand_in_thread = threading.Thread(target=cls.stand_in.serve_forever)
+        cls.stand_in_thread.daemon = True
+        cls.stand_in_thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stand_in.shutdown()
+        cls.stand_in.server_close()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cassette_path = os.path.join(self.tmp_dir, 'export.cassette')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_record_and_replay(self):
+        """
+        A FixtureManager with a `cassette` and `cassette_upstream`
+            records responses from the upstream server the first time
+            replays responses from disk afterwards
+        """
+        # Record our response from our stand-in server
+        RecordingServer = type('RecordingServer', (ExportServer,), {
+            'cassette': self.cassette_path,
+            'cassette_upstream': 'http://127.0.0.1:{port}'.format(port=self.stand_in.server_port),
+        })
+        hits = StandInHandler.hits
+        recording_server = RecordingServer.start(['export'])
+        try:
+            res = requests.get('http://localhost:9000/export?page=1')
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.text, 'upstream /export?page=1')
+            self.assertEqual(res.headers['X-Stand-In'], 'yes')
+            res = requests.get('http://localhost:9000/export?page=1')
+            self.assertEqual(res.text, 'upstream /export?page=1')
+        finally:
+            RecordingServer.stop()
+        self.assertEqual(StandInHandler.hits, hits + 1)
+        self.assertEqual(recording_server.export.request_count, 2)
+
+        # Load our cassette from disk and verify its contents
+        cassette = httpretty_fixtures.Cassette(self.cassette_path)
+        response = cassette.get('GET http://localhost:9000/export?page=1')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.body, b'upstream /export?page=1')
+        self.assertNotIn('content-length', response.headers)
+        cassette.close()
+
+        # Replay our response without an upstream server
+        ReplayingServer = type('ReplayingServer', (ExportServer,), {'cassette': self.cassette_path})
+        ReplayingServer.start(['export'])
+        try:
+            res = requests.get('http://localhost:9000/export?page=1')
+            self.assertEqual(res.text, 'upstream /export?page=1')
+
+            # Unrecorded requests without an upstream fallback to our fixture
+            res = requests.get('http://localhost:9000/export?page=2')
+            self.assertEqual(res.text, 'fallback')
+        finally:
+            ReplayingServer.stop()
+        self.assertEqual(StandInHandler.hits, hits + 1)
+        httpretty_fixtures.get_cassette(self.cassette_path).close()
@@ -0,0 +1,122 @@
+# Load in our dependencies
+import threading
+import time
+from unittest import TestCase
+
+import requests
+
+import httpretty_fixtures
+
+
+# Set up our fixture managers
+class FaultyServer(httpretty_fixtures.FixtureManager):
+    fault_policy = httpretty_fixtures.FaultPolicy(error_rate=0.3, throttle_rate=0.2, seed=42, schedule_size=100)
+
+    @httpretty_fixtures.get('http://localhost:9000/')
+    def hello(self, request, uri, res_headers):
+        return (200, res_headers, 'world')
+
+    @httpretty_fixtures.get('http://localhost:9000/healthy', faults=None)
+    def healthy(self, request, uri, res_headers):
+        return (200, res_headers, 'ok')
+
+    @httpretty_fixtures.get('http://localhost:9000/throttled', faults=httpretty_fixtures.FaultPolicy(
+        throttle_rate=1, throttle_status=503, retry_after=2))
+    def throttled(self, request, uri, res_headers):
+        return (200, res_headers, 'unreachable')
+
+    @httpretty_fixtures.get('http://localhost:9000/reset', faults=httpretty_fixtures.FaultPolicy(reset_rate=1))
+    def reset(self, request, uri, res_headers):
+        return (200, res_headers, 'unreachable')
+
+    @httpretty_fixtures.get('http://localhost:9000/truncated', faults=httpretty_fixtures.FaultPolicy(
+        truncate_rate=1))
+    def truncated(self, request, uri, res_headers):
+        return (200, res_headers, 'hello world')
+
+    @httpretty_fixtures.get('http://localhost:9000/slow', faults=httpretty_fixtures.FaultPolicy(
+        slow_first_byte_rate=1, slow_first_byte=0.05))
+    def slow(self, request, uri, res_headers):
+        return (200, res_headers, 'slow')
+
+
+# Define our tests
+class TestFaults(TestCase):
+    def get_statuses(self):
+        with FaultyServer.running(['hello', 'healthy']) as faulty_server:
+            statuses = [requests.get('http://localhost:9000/').status_code for i in range(50)]
+            self.assertEqual(requests.get('http://localhost:9000/healthy').status_code, 200)
+            return statuses, faulty_server.hello.faults.counts
+
+    def test_seeded_schedule(self):
+        """
+        A FixtureManager with a seeded fault policy
+            injects the same faults into every run
+            counts the faults it injected
+        """
+        statuses, counts = self.get_statuses()
+        self.assertEqual(statuses, self.get_statuses()[0])
+        self.assertEqual(statuses.count(500), counts['error'])
+        self.assertEqual(statuses.count(429), counts['throttle'])
+        self.assertTrue(0 < counts['error'] < 50)
+        self.assertTrue(0 < counts['throttle'] < 50)
+        self.assertEqual(counts['reset'], 0)
+
+    @FaultyServer.run(['throttled', 'reset', 'truncated', 'slow'])
+    def test_fault_kinds(self, faulty_server):
+        """
+        Fixtures with a fault policy
+            respond with throttles and a Retry-After header
+            reset their connection
+            truncate their bodies
+            delay their first byte
+        """
+        res = requests.get('http://localhost:9000/throttled')
+        self.assertEqual((res.status_code, res.headers['retry-after']), (503, '2'))
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            requests.get('http://localhost:9000/reset')
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            requests.get('http://localhost:9000/truncated')
+        start = time.time()
+        self.assertEqual(requests.get('http://localhost:9000/slow').text, 'slow')
+        self.assertGreaterEqual(time.time() - start, 0.05)
+
+    @FaultyServer.run(['reset'])
+    def test_quiet_reset(self, faulty_server):
+        """
+        A fixture resetting its connection through HTTPretty
+            doesn't leave an unhandled error in HTTPretty's worker thread
+        """
+        # DEV: `threading.excepthook` is only available in Python 3.8+
+        if not hasattr(threading, 'excepthook'):
+            self.skipTest('`threading.excepthook` is not available')
+        thread_errors = []
+        excepthook = threading.excepthook
+        threading.excepthook = thread_errors.append
+        try:
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                requests.get('http://localhost:9000/reset')
+        finally:
+            threading.excepthook = excepthook
+        self.assertEqual(thread_errors, [])
+        self.assertEqual(faulty_server.reset.faults.counts['reset'], 1)
+
+    def test_fault_server(self):
+        """
+        A FixtureServer with a fault policy
+            resets and truncates over real connections
+        """
+        with FaultyServer.serve(['reset', 'truncated'], origin='http://localhost:9000') as fixture_server:
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                requests.get(fixture_server.url + '/reset')
+            with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                requests.get(fixture_server.url + '/truncated')
+            self.assertEqual(fixture_server.manager.truncated.request_count, 1)
+
+    def test_invalid_rates(self):
+        """
+        A FaultPolicy with rates over 1
+            raises a helpful error
+        """
+        with self.assertRaises(RuntimeError):
+            httpretty_fixtures.FaultPolicy(error_rate=0.6, reset_rate=0.6)
@@ -0,0 +1,84 @@
+# Load in our dependencies
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+from httpretty_fixtures.lazy import LazyAttribute
+
+
+# Define our script to run in a fresh interpreter
+SCRIPT = """
+import json
+import sys
+
+import httpretty_fixtures
+loaded_at_import = sorted(name for name in ('httpretty', 'asyncio', 'yaml') if name in sys.modules)
+
+
+class FakeServer(httpretty_fixtures.FixtureManager):
+    @httpretty_fixtures.get('http://localhost:9000/')
+    def hello(self, request, uri, res_headers):
+        return (200, res_headers, 'world')
+loaded_at_definition = 'httpretty' in sys.modules
+
+with FakeServer.running(['hello']):
+    loaded_at_start = 'httpretty' in sys.modules
+sys.stdout.write(json.dumps([loaded_at_import, loaded_at_definition, loaded_at_start]))
+"""
+
+
+# Define our tests
+class TestStartupProfiling(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def run_script(self, profile=None):
+        env = dict(os.environ)
+        env.pop('HTTPRETTY_FIXTURES_PROFILE', None)
+        if profile is not None:
+            env['HTTPRETTY_FIXTURES_PROFILE'] = profile
+        output = subprocess.check_output([sys.executable, '-c', SCRIPT], env=env)
+        return json.loads(output.decode('utf-8'))
+
+    def test_lazy_import(self):
+        """
+        Importing httpretty_fixtures and defining a FixtureManager
+            doesn't import HTTPretty, asyncio, or PyYAML
+            imports HTTPretty on our first start
+        """
+        self.assertEqual(self.run_script(), [[], False, True])
+
+    def test_profile(self):
+        """
+        A process with HTTPRETTY_FIXTURES_PROFILE set to a JSON path
+            writes the time spent in each startup phase on exit
+        """
+        report_path = os.path.join(self.tmp_dir, 'profile.json')
+        self.run_script(report_path)
+        with open(report_path) as report_file:
+            report = json.load(report_file)
+        self.assertEqual(report['import']['count'], 1)
+        self.assertEqual(report['import_httpretty']['count'], 1)
+        self.assertEqual(report['mark_fixture']['count'], 1)
+        self.assertEqual(report['start_fixtures']['count'], 1)
+        self.assertEqual(report['teardown']['count'], 1)
+        self.assertNotIn('define_subclass', report)
+        self.assertTrue(all(phase['seconds'] >= 0 for phase in report.values()))
+
+    def test_lazy_attribute_call(self):
+        """
+        A LazyAttribute
+            loads its attribute on first call
+            forwards calls to its attribute
+        """
+        dumps = LazyAttribute('json', 'dumps')
+        self.assertFalse(dumps.is_loaded())
+        self.assertEqual(dumps([1]), '[1]')
+        self.assertTrue(dumps.is_loaded())
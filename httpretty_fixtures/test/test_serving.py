@@ -0,0 +1,83 @@
+# Load in our dependencies
+import subprocess
+import sys
+from unittest import TestCase
+
+import requests
+
+import httpretty_fixtures
+
+
+# Set up our fixture manager
+class FakeServer(httpretty_fixtures.FixtureManager):
+    @httpretty_fixtures.get('http://localhost:9000/')
+    def hello(self, request, uri, res_headers):
+        return (200, res_headers, 'world')
+
+    @httpretty_fixtures.post('http://localhost:9000/items', content_type='application/json')
+    def create(self, request, uri, res_headers):
+        return (201, res_headers, '{"id": 1}')
+
+
+# Define our tests
+class TestFixtureServer(TestCase):
+    def test_keep_alive(self):
+        """
+        A FixtureServer
+            serves our fixtures over real HTTP with keep-alive connections
+            records requests on its manager
+        """
+        with FakeServer.serve(['hello', 'create'], origin='http://localhost:9000') as fixture_server:
+            # Make our requests over a single connection
+            session = requests.Session()
+            res = session.get(fixture_server.url + '/?first')
+            self.assertEqual(res.text, 'world')
+            res = session.post(fixture_server.url + '/items', data='{"name": "foo"}')
+            self.assertEqual(res.status_code, 201)
+            self.assertEqual(res.headers['content-type'], 'application/json')
+            self.assertEqual(res.json(), {'id': 1})
+            self.assertEqual(session.get(fixture_server.url + '/missing').status_code, 404)
+            self.assertEqual(fixture_server.connection_count, 1)
+
+            # Assert our requests were recorded
+            manager = fixture_server.manager
+            self.assertEqual(manager.hello.request_count, 1)
+            self.assertEqual(manager.hello.last_request.path, '/?first')
+            self.assertEqual(manager.create.last_request.body, b'{"name": "foo"}')
+
+    def test_proxy_requests(self):
+        """
+        A FixtureServer used as an HTTP proxy
+            matches requests by their original URI
+        """
+        with FakeServer.serve(['hello']) as fixture_server:
+            proxies = {'http': fixture_server.url}
+            self.assertEqual(requests.get('http://localhost:9000/', proxies=proxies).text, 'world')
+            self.assertEqual(requests.get('http://localhost:9001/', proxies=proxies).status_code, 404)
+            self.assertEqual(fixture_server.manager.hello.last_request.path, '/')
+
+    def test_subprocess_requests(self):
+        """
+        A FixtureServer
+            serves requests from other processes
+            makes their recordings readable in our process
+        """
+        with FakeServer.serve(['hello'], origin='http://localhost:9000') as fixture_server:
+            script = ('import sys\n'
+                      'try:\n'
+                      '    from urllib.request import urlopen\n'
+                      'except ImportError:\n'
+                      '    from urllib2 import urlopen\n'
+                      'sys.stdout.write(urlopen(sys.argv[1]).read().decode("utf-8"))\n')
+            output = subprocess.check_output([sys.executable, '-c', script, fixture_server.url + '/?child'])
+            self.assertEqual(output, b'world')
+            self.assertEqual(fixture_server.manager.hello.last_request.path, '/?child')
+
+    def test_httpretty_enabled(self):
+        """
+        A FixtureServer started while HTTPretty is enabled
+            raises a helpful error
+        """
+        with FakeServer.running(['hello']):
+            with self.assertRaises(RuntimeError):
+                FakeServer.serve(['hello'])
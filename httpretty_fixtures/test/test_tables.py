@@ -0,0 +1,125 @@
+# Load in our dependencies
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import requests
+
+import httpretty_fixtures
+
+
+# Define our fixture managers
+class GreetingServer(httpretty_fixtures.FixtureManager):
+    @httpretty_fixtures.get('http://localhost:9000/')
+    def hello(self, request, uri, res_headers):
+        return (200, res_headers, 'world')
+
+
+# Define our tests
+class TestRouteTables(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_file(self, filename, content):
+        path = os.path.join(self.tmp_dir, filename)
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(type(u'')(content))
+        return path
+
+    def test_jsonl_route_table(self):
+        """
+        A FixtureManager loaded from a JSONL route table
+            serves each route as a fixture
+            only reads body files when their route is first requested
+            records requests per fixture
+        """
+        # Load our table before its body file exists
+        path = self.write_file('routes.jsonl', u'\n'.join([
+            json.dumps({'name': 'hello', 'uri': 'http://localhost:9000/', 'body': 'world'}),
+            json.dumps({'name': 'create', 'method': 'post', 'uri': 'http://localhost:9000/items', 'status': 201,
+                        'headers': {'content-type': 'application/json'}, 'body': {'id': 1}}),
+            json.dumps({'name': 'export', 'uri': 'http://localhost:9000/export', 'body_file': 'export.csv'}),
+        ]))
+        TableServer = httpretty_fixtures.FixtureManager.from_route_table(path, name='TableServer')
+        self.write_file('export.csv', u'a,b\n1,2\n')
+
+        # Make our requests and verify our responses
+        with TableServer.running(['hello', 'create', 'export']) as table_server:
+            self.assertEqual(requests.get('http://localhost:9000/').text, 'world')
+            res = requests.post('http://localhost:9000/items', data='{}')
+            self.assertEqual(res.status_code, 201)
+            self.assertEqual(res.json(), {'id': 1})
+            self.assertEqual(requests.get('http://localhost:9000/export').text, 'a,b\n1,2\n')
+
+            # Assert we recorded our requests
+            self.assertEqual(TableServer.__name__, 'TableServer')
+            self.assertEqual(table_server.hello.request_count, 1)
+            self.assertEqual(table_server.create.last_request.body, b'{}')
+
+    def test_json_route_table_options(self):
+        """
+        A FixtureManager loaded from a JSON route table
+            passes extra route keys through to `mark_fixture`
+        """
+        path = self.write_file('routes.json', json.dumps([
+            {'name': 'search', 'uri': 'http://localhost:9000/search?q=a', 'match_querystring': True, 'body': 'a'},
+        ]))
+        TableServer = httpretty_fixtures.FixtureManager.from_route_table(path)
+        with TableServer.running(['search']):
+            self.assertEqual(requests.get('http://localhost:9000/search?q=a').text, 'a')
+
+    def test_invalid_route_table(self):
+        """
+        A route table missing required keys
+            raises a helpful error
+        """
+        path = self.write_file('routes.json', json.dumps([{'name': 'hello'}]))
+        with self.assertRaises(RuntimeError) as context:
+            httpretty_fixtures.FixtureManager.from_route_table(path)
+        self.assertIn('"uri"', str(context.exception))
+
+    def test_conflicting_route_names(self):
+        """
+        A route table with a route named after a FixtureManager attribute or a duplicate name
+            raises a helpful error
+        """
+        # Verify a route can't replace our class' methods
+        path = self.write_file('routes.json', json.dumps([{'name': 'start', 'uri': 'http://localhost:9000/'}]))
+        with self.assertRaises(RuntimeError) as context:
+            httpretty_fixtures.FixtureManager.from_route_table(path)
+        self.assertIn('"start"', str(context.exception))
+
+        # Verify a route can't replace another route
+        path = self.write_file('routes.json', json.dumps([
+            {'name': 'dup', 'uri': 'http://localhost:9000/a'},
+            {'name': 'dup', 'uri': 'http://localhost:9000/b'},
+        ]))
+        with self.assertRaises(RuntimeError) as context:
+            httpretty_fixtures.FixtureManager.from_route_table(path)
+        self.assertIn('"dup"', str(context.exception))
+
+    def test_route_table_metrics(self):
+        """
+        A FixtureManager loaded from a route table with its parent's name
+            doesn't share aggregate metrics with its parent
+        """
+        # Make requests to our parent and our table's inherited fixture
+        path = self.write_file('routes.json', json.dumps([{'name': 'goodbye', 'uri': 'http://localhost:9000/bye'}]))
+        TableServer = GreetingServer.from_route_table(path)
+        with GreetingServer.running(['hello']):
+            requests.get('http://localhost:9000/')
+        with TableServer.running(['hello', 'goodbye']):
+            requests.get('http://localhost:9000/')
+            requests.get('http://localhost:9000/')
+
+        # Assert each class has its own metrics
+        report = httpretty_fixtures.metrics_report()
+        self.assertEqual(TableServer.__name__, 'GreetingServer')
+        self.assertEqual(report[__name__ + '.GreetingServer.hello']['call_count'], 1)
+        self.assertEqual(report['httpretty_fixtures.GreetingServer.hello']['call_count'], 2)
@@ -0,0 +1,77 @@
+# Load in our dependencies
+import threading
+from unittest import TestCase
+
+import httpretty
+import requests
+
+import httpretty_fixtures
+
+
+# Set up our fixture manager
+class FakeServer(httpretty_fixtures.FixtureManager):
+    @httpretty_fixtures.get('http://localhost:9000/')
+    def hello(self, request, uri, res_headers):
+        return (200, res_headers, 'world')
+
+
+def run_in_threads(fn, thread_count):
+    """Run `fn` in `thread_count` threads at once and collect any errors"""
+    errors = []
+    barrier = threading.Event()
+
+    def target():
+        barrier.wait()
+        try:
+            fn()
+        except Exception as err:
+            errors.append(err)
+    threads = [threading.Thread(target=target) for i in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    barrier.set()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+# Define our tests
+class TestThreading(TestCase):
+    @FakeServer.run(['hello'])
+    def test_concurrent_requests(self, fake_server):
+        """
+        Many concurrent requests to a single fixture
+            are all recorded without losing any
+        """
+        # Make our requests from many threads at once
+        def make_requests():
+            for i in range(64):
+                res = requests.get('http://localhost:9000/')
+                assert res.text == 'world'
+        errors = run_in_threads(make_requests, 16)
+        self.assertEqual(errors, [])
+
+        # Assert we recorded every request
+        fixture = fake_server.hello
+        self.assertEqual(fixture.request_count, 16 * 64)
+        self.assertEqual(len(fixture.requests), 16 * 64)
+        self.assertIsNotNone(fixture.first_request)
+        self.assertIs(fixture.last_request, fixture.requests[-1])
+
+    def test_concurrent_start_stop(self):
+        """
+        Starting and stopping FixtureManagers from many threads at once
+            keeps an accurate nesting count
+            disables HTTPretty once every FixtureManager is stopped
+        """
+        # Start and stop our managers from many threads at once
+        def start_stop():
+            for i in range(200):
+                FakeServer.start(['hello'])
+                FakeServer.stop()
+        errors = run_in_threads(start_stop, 8)
+        self.assertEqual(errors, [])
+
+        # Assert we cleaned up
+        self.assertEqual(httpretty_fixtures.FixtureManager.nested_count, 0)
+        self.assertFalse(httpretty.is_enabled())